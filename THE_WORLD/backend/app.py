@@ -8,6 +8,8 @@ from flask_cors import CORS
 import os
 from app.config import config
 from app.database import db, init_db
+from app.utils.compression import init_compression
+from app.utils.json_provider import init_json
 
 
 def create_app(config_name=None):
@@ -21,9 +23,11 @@ def create_app(config_name=None):
     # Initialize extensions
     CORS(app, origins=app.config['CORS_ORIGINS'])
     init_db(app)
+    init_compression(app)
+    init_json(app)
     
     # Register blueprints
-    from app.routes import disasters, aqi, cities, comparison, correlation, download, chatbot
+    from app.routes import disasters, aqi, cities, comparison, correlation, download, chatbot, jobs
     
     app.register_blueprint(disasters.bp, url_prefix='/api/disasters')
     app.register_blueprint(aqi.bp, url_prefix='/api/aqi')
@@ -32,6 +36,7 @@ def create_app(config_name=None):
     app.register_blueprint(correlation.bp, url_prefix='/api/correlation')
     app.register_blueprint(download.bp, url_prefix='/api/download')
     app.register_blueprint(chatbot.bp, url_prefix='/api/chatbot')
+    app.register_blueprint(jobs.bp, url_prefix='/api/jobs')
     
     # Root route
     @app.route('/')
@@ -48,7 +53,8 @@ def create_app(config_name=None):
                 'comparison': '/api/comparison',
                 'correlation': '/api/correlation',
                 'download': '/api/download',
-                'chatbot': '/api/chatbot'
+                'chatbot': '/api/chatbot',
+                'jobs': '/api/jobs'
             }
         })
     
@@ -62,10 +68,13 @@ def create_app(config_name=None):
         except Exception as e:
             db_status = f'error: {str(e)}'
         
+        from app.services.upstream import upstream_client
+        
         return jsonify({
             'status': 'healthy',
             'service': 'THE_WORLD API',
             'database': db_status,
+            'upstreams': upstream_client.status(),
             'version': '1.0.0'
         })
     
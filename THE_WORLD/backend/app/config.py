@@ -55,6 +55,125 @@ class Config:
     DISASTER_UPDATE_INTERVAL = 600  # 10 minutes in seconds
     AQI_UPDATE_INTERVAL = 900  # 15 minutes in seconds
 
+    # Upstream API Cache / Circuit Breaker Configuration
+    UPSTREAM_TIMEOUT = (5, 15)  # (connect, read) seconds
+    UPSTREAM_CACHE_TTLS = {
+        'openaq': 600,  # 10 minutes
+        'openweather': 3600,  # air pollution updates hourly
+        'usgs': 300  # 5 minutes
+    }
+    UPSTREAM_DEFAULT_TTL = 300
+    UPSTREAM_STALE_WHILE_REVALIDATE = 600  # serve stale this long past TTL while refreshing
+    UPSTREAM_MAX_STALE = 86400  # keep last good payload for outages up to a day
+    UPSTREAM_CACHE_SIZE = 2048
+    UPSTREAM_REFRESH_WORKERS = 2
+    UPSTREAM_MIN_INTERVALS = {'openweather': 0.2}  # seconds between network calls
+    UPSTREAM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('UPSTREAM_CIRCUIT_FAILURE_THRESHOLD', 3))
+    UPSTREAM_CIRCUIT_RESET_TIMEOUT = int(os.getenv('UPSTREAM_CIRCUIT_RESET_TIMEOUT', 60))
+
+    # Background Job Queue Configuration
+    JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', 2))  # threads per worker process
+    JOB_TYPE_CONCURRENCY = {'disasters': 1, 'aqi': 1}  # running jobs per type across all workers
+    JOB_POLL_INTERVAL = 2  # seconds between queue polls when idle
+    JOB_STALE_TIMEOUT = 900  # seconds without heartbeat before a running job is requeued
+    JOB_HEARTBEAT_INTERVAL = 60  # seconds between heartbeats of a running job
+    JOB_MAX_ATTEMPTS = 3
+    JOB_RETRY_DELAY = 60  # seconds, multiplied by attempt number
+
+    # List Endpoint Totals (?total=exact|estimate|none)
+    LIST_TOTAL_DEFAULTS = {'disasters': 'estimate', 'aqi': 'estimate', 'cities': 'estimate'}
+    COUNT_ESTIMATE_THRESHOLD = 50000  # below this planner estimate, run an exact count
+    COUNT_CACHE_TTL = 3600
+    COUNT_CACHE_SIZE = 4096
+
+    # Streaming / GeoJSON Configuration
+    STREAM_CHUNK_SIZE = 2000  # rows fetched per server-side cursor round trip
+    GEOJSON_MAX_FEATURES = int(os.getenv('GEOJSON_MAX_FEATURES', 100000))
+
+    # Vector Tile Configuration
+    TILE_MAX_ZOOM = 22
+    TILE_MAX_FEATURES = 50000  # per tile
+    TILE_CACHE_SIZE = 4096
+    TILE_CACHE_TTL = 3600
+    TILE_CACHE_MAX_BYTES = 256 * 1024 * 1024  # total size of cached tiles
+    TILE_CACHE_MAX_TILE_BYTES = 2 * 1024 * 1024  # larger tiles are rendered but not cached
+    TILE_CLIENT_MAX_AGE = 60  # seconds browsers may reuse a tile
+
+    # Server-side Clustering Configuration
+    CLUSTER_MAX_ZOOM = 12  # above this zoom individual features are returned
+    CLUSTER_MAX_PRECISION = 8  # longest geohash prefix used as a cell key
+    CLUSTER_MAX_CELLS = 5000
+    CLUSTER_MAX_POINTS = 5000
+
+    # Spatial Filter Configuration
+    POLYGON_MAX_VERTICES = 10000  # vertices accepted in a GeoJSON polygon filter
+    POLYGON_SIMPLIFY_TOLERANCE = 0.001  # degrees (~100 m) removed before ST_Intersects
+
+    # Nearest-neighbour Query Configuration
+    NEAR_DEFAULT_K = 10
+    NEAR_MAX_K = 100
+    NEAR_MAX_RADIUS_KM = 20038  # half the equatorial circumference
+
+    # Correlation Analysis Configuration
+    CORRELATION_MAX_DISASTERS = 1000  # disasters joined per request
+    # Windows of the precomputed disaster_aqi_impact table; after changing
+    # them, TRUNCATE disaster_aqi_impact so the next startup rebuilds it
+    IMPACT_PRE_DAYS = int(os.getenv('IMPACT_PRE_DAYS', 7))
+    IMPACT_POST_DAYS = int(os.getenv('IMPACT_POST_DAYS', 30))
+    IMPACT_DISTANCE_KM = float(os.getenv('IMPACT_DISTANCE_KM', 100))
+
+    # Lagged Correlation Analytics Configuration
+    ANALYTICS_MAX_CITIES = 200
+    ANALYTICS_MAX_HOURS = 24 * 366  # hourly series length
+    ANALYTICS_MAX_LAG_HOURS = 24 * 14
+    ANALYTICS_MIN_AQI_HOURS = 24  # observed hours needed before gaps are interpolated
+    ANALYTICS_DEFAULT_BOOTSTRAP = 1000
+    ANALYTICS_MAX_BOOTSTRAP = 10000
+    ANALYTICS_ALPHA = 0.05
+    ANALYTICS_CACHE_SIZE = 256
+    ANALYTICS_CACHE_TTL = 3600
+
+    # Historical Comparison Configuration
+    HISTORICAL_MAX_BUCKETS = 2000  # time buckets per city in /comparison/aqi/historical
+
+    # City Autocomplete Configuration
+    AUTOCOMPLETE_DEFAULT_LIMIT = 10
+    AUTOCOMPLETE_MAX_LIMIT = 50
+    AUTOCOMPLETE_MIN_LENGTH = 3  # characters; shorter queries are rejected
+    AUTOCOMPLETE_SIMILARITY = 0.5  # pg_trgm word_similarity threshold for fuzzy matches
+
+    # Gazetteer Import Configuration
+    GEONAMES_CHUNK_SIZE = 50000  # rows per COPY + upsert transaction
+
+    # Conditional GET Configuration
+    CONDITIONAL_CACHE_CONTROL = 'no-cache'  # cacheable, but revalidated with If-None-Match on every use
+
+    # Response Compression Configuration
+    COMPRESSION_MIN_SIZE = 1024  # bytes; smaller bodies are sent as-is
+    COMPRESSION_MIMETYPES = {
+        'application/json', 'application/geo+json', 'application/x-ndjson',
+        'text/csv', 'text/plain', 'text/html', 'application/vnd.mapbox-vector-tile'
+    }
+    GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+    BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))  # 4-6 suits dynamic responses
+    COMPRESSION_CACHE_SIZE = 256  # compressed bodies kept per encoding/ETag
+    COMPRESSION_CACHE_TTL = 600
+    COMPRESSION_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+    # Chatbot Conversation Store Configuration
+    CHATBOT_STORE = os.getenv('CHATBOT_STORE', 'postgres')  # 'postgres' (shared by workers) or 'memory'
+    CHATBOT_HISTORY_MESSAGES = 10  # messages sent to the model as context
+    CHATBOT_MAX_MESSAGES = 40  # kept per conversation
+    CHATBOT_MAX_CONVERSATION_CHARS = 32000  # kept per conversation
+    CHATBOT_MAX_MESSAGE_CHARS = 4000  # longer messages are truncated when stored
+    CHATBOT_MAX_CONVERSATIONS = int(os.getenv('CHATBOT_MAX_CONVERSATIONS', 10000))
+    CHATBOT_CONVERSATION_TTL = int(os.getenv('CHATBOT_CONVERSATION_TTL', 24 * 3600))  # seconds since last message
+    CHATBOT_PURGE_INTERVAL = 300  # seconds between expiry sweeps of the postgres store
+
+    # Export Configuration
+    EXPORT_ROW_GROUP_SIZE = 65536  # rows per Parquet row group / Arrow batch
+    EXPORT_FILE_CHUNK_SIZE = 1024 * 1024  # bytes per chunk when streaming spooled files
+
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -15,15 +15,36 @@ def init_db(app):
     
     with app.app_context():
         # Import all models here to ensure they're registered
-        from app.models import City, Disaster, AQIMeasurement
+        from app.models import City, Disaster, AQIMeasurement, FetchJob, DataVersion, LatestAQI, ChatMessage
         
         # Create all tables
         db.create_all()
         
-        # Create PostGIS extension if it doesn't exist
+        # Create PostGIS and pg_trgm (city search) extensions if they don't exist
+        for extension in ('postgis', 'pg_trgm'):
+            try:
+                db.session.execute(db.text(f"CREATE EXTENSION IF NOT EXISTS {extension}"))
+                db.session.commit()
+            except Exception as e:
+                print(f"Note: {extension} extension may already exist or require manual setup: {e}")
+                db.session.rollback()
+        
+        # Install triggers and functions that create_all() does not manage
+        try:
+            from app.schema import install_support_ddl
+            install_support_ddl(db.session)
+        except Exception as e:
+            print(f"Note: Could not install schema support objects: {e}")
+            db.session.rollback()
+        
+        # Trigram indexes need pg_trgm; a failure here must not roll back the
+        # triggers above (city search then falls back to unindexed LIKE scans
+        # and autocomplete to prefix matches)
+        app.config['TRIGRAM_SEARCH'] = False
         try:
-            db.session.execute(db.text("CREATE EXTENSION IF NOT EXISTS postgis"))
-            db.session.commit()
+            from app.schema import install_search_indexes
+            install_search_indexes(db.session)
+            app.config['TRIGRAM_SEARCH'] = True
         except Exception as e:
-            print(f"Note: PostGIS extension may already exist or require manual setup: {e}")
+            print(f"Note: Could not install city search indexes (is pg_trgm available?): {e}")
             db.session.rollback()
@@ -6,5 +6,11 @@ Import all models here for easy access
 from app.models.city import City
 from app.models.disaster import Disaster
 from app.models.aqi_measurement import AQIMeasurement
+from app.models.fetch_job import FetchJob
+from app.models.data_version import DataVersion
+from app.models.latest_aqi import LatestAQI
+from app.models.disaster_aqi_impact import DisasterAQIImpact
+from app.models.disaster_facet import DisasterFacet
+from app.models.chat_message import ChatMessage
 
-__all__ = ['City', 'Disaster', 'AQIMeasurement']
+__all__ = ['City', 'Disaster', 'AQIMeasurement', 'FetchJob', 'DataVersion', 'LatestAQI', 'DisasterAQIImpact', 'DisasterFacet', 'ChatMessage']
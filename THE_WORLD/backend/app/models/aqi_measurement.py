@@ -40,6 +40,8 @@ class AQIMeasurement(db.Model):
     __table_args__ = (
         Index('idx_aqi_city_time', 'city_id', 'measured_at'),
         Index('idx_aqi_city_date', 'city_id', 'measured_at'),
+        # Keyset pagination seeks on (measured_at, id) in descending order
+        Index('idx_aqi_measured_id', 'measured_at', 'id'),
     )
     
     def __init__(self, latitude, longitude, measured_at, **kwargs):
@@ -0,0 +1,30 @@
+"""
+THE_WORLD - Chat Message Model
+Chatbot conversation history shared by all API workers
+"""
+
+from app.database import db
+from sqlalchemy import Column, BigInteger, String, Text, Index, func
+from sqlalchemy.dialects.postgresql import TIMESTAMP
+
+
+class ChatMessage(db.Model):
+    """One user or assistant message of a chatbot conversation"""
+
+    __tablename__ = 'chat_messages'
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    conversation_id = Column(String(100), nullable=False)
+    role = Column(String(20), nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(TIMESTAMP, nullable=False, server_default=func.current_timestamp())
+
+    # History reads the newest messages of one conversation; expiry scans by age
+    __table_args__ = (
+        Index('idx_chat_messages_conversation', 'conversation_id', 'id'),
+        Index('idx_chat_messages_created_at', 'created_at'),
+    )
+
+    def to_dict(self):
+        """Message in the chat completion format"""
+        return {'role': self.role, 'content': self.content}
@@ -5,7 +5,7 @@ Database model for cities with spatial data
 
 from app.database import db
 from geoalchemy2 import Geometry
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, func
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Index, func
 from sqlalchemy.dialects.postgresql import TIMESTAMP
 
 
@@ -24,11 +24,16 @@ class City(db.Model):
     boundary = Column(Geometry('POLYGON', srid=4326), nullable=True)
     population = Column(Integer, nullable=True)
     timezone = Column(String(50), nullable=True)
+    geonames_id = Column(Integer, nullable=True)  # Stable id for gazetteer imports
     created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
     updated_at = Column(TIMESTAMP, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
     
     # Relationships
     aqi_measurements = db.relationship('AQIMeasurement', backref='city', lazy='dynamic')
+
+    __table_args__ = (
+        Index('idx_cities_geonames_id', 'geonames_id', unique=True),
+    )
     
     def __init__(self, name, country, latitude, longitude, **kwargs):
         """Initialize city with coordinates"""
@@ -0,0 +1,37 @@
+"""
+THE_WORLD - Data Version Model
+Per-table change counter bumped by triggers on every write
+"""
+
+from app.database import db
+from sqlalchemy import Column, String, BigInteger, text
+from sqlalchemy.dialects.postgresql import TIMESTAMP
+
+
+class DataVersion(db.Model):
+    """Monotonic version of a data table, used to key and invalidate caches"""
+
+    __tablename__ = 'data_versions'
+
+    table_name = Column(String(100), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0, server_default='0')
+    updated_at = Column(TIMESTAMP, nullable=False, server_default=text("timezone('utc', now())"))  # UTC
+
+    @classmethod
+    def current(cls, *table_names):
+        """Current versions for the given tables as {table_name: (version, updated_at)}"""
+        rows = db.session.query(cls).filter(cls.table_name.in_(table_names)).all()
+        versions = {name: (0, None) for name in table_names}
+        versions.update({row.table_name: (row.version, row.updated_at) for row in rows})
+        return versions
+
+    def to_dict(self):
+        """Convert data version to dictionary"""
+        return {
+            'table_name': self.table_name,
+            'version': self.version,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<DataVersion {self.table_name} v{self.version}>'
@@ -5,7 +5,7 @@ Database model for disaster events with spatial data
 
 from app.database import db
 from geoalchemy2 import Geometry
-from sqlalchemy import Column, Integer, String, Text, Numeric, DateTime, UniqueConstraint, func
+from sqlalchemy import Column, Integer, String, Text, Numeric, DateTime, UniqueConstraint, Index, Computed, func
 from sqlalchemy.dialects.postgresql import TIMESTAMP
 
 
@@ -29,6 +29,8 @@ class Disaster(db.Model):
     source_id = Column(String(255), nullable=True)
     url = Column(Text, nullable=True)
     affected_area = Column(Geometry('POLYGON', srid=4326), nullable=True)
+    # Cluster cell key, computed by Postgres on insert/update
+    geohash = Column(String(12), Computed('ST_GeoHash(geom, 12)', persisted=True), nullable=True)
     created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
     updated_at = Column(TIMESTAMP, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
     data_fetched_at = Column(TIMESTAMP, nullable=True)
@@ -36,6 +38,10 @@ class Disaster(db.Model):
     # Unique constraint to prevent duplicates
     __table_args__ = (
         UniqueConstraint('source', 'source_id', name='unique_disaster_source'),
+        # Keyset pagination seeks on (occurred_at, id) in descending order
+        Index('idx_disasters_occurred_id', 'occurred_at', 'id'),
+        # Cluster drill-down matches geohash prefixes (LIKE 'abc%')
+        Index('idx_disasters_geohash', 'geohash', postgresql_ops={'geohash': 'varchar_pattern_ops'}),
     )
     
     def __init__(self, disaster_type, latitude, longitude, occurred_at, **kwargs):
@@ -0,0 +1,63 @@
+"""
+THE_WORLD - Disaster AQI Impact Model
+Precomputed pre/post AQI statistics per disaster and nearby station
+"""
+
+from app.database import db
+from sqlalchemy import Column, Integer, BigInteger, String, Numeric, ForeignKey, Index, Computed, func
+from sqlalchemy.dialects.postgresql import TIMESTAMP
+
+PRE_AVG_SQL = 'CASE WHEN pre_count > 0 THEN pre_sum::numeric / pre_count END'
+POST_AVG_SQL = 'CASE WHEN post_count > 0 THEN post_sum::numeric / post_count END'
+CHANGE_PERCENT_SQL = (
+    'CASE WHEN pre_count > 0 AND pre_sum > 0 AND post_count > 0 THEN '
+    '(post_sum::numeric / post_count - pre_sum::numeric / pre_count) '
+    '/ (pre_sum::numeric / pre_count) * 100 END'
+)
+
+
+class DisasterAQIImpact(db.Model):
+    """AQI impact of one disaster on one station.
+
+    Maintained by triggers (see app/schema.py): rows are recomputed when a
+    disaster is inserted or moved, and measurements landing inside a
+    disaster's window are merged in by adding to the running sums and
+    counts. Averages and percent change are generated from those sums.
+    """
+
+    __tablename__ = 'disaster_aqi_impact'
+
+    disaster_id = Column(Integer, ForeignKey('disasters.id', ondelete='CASCADE'), primary_key=True)
+    station_key = Column(String(300), primary_key=True)
+    city_id = Column(Integer, ForeignKey('cities.id', ondelete='SET NULL'), nullable=True, index=True)
+    city_name = Column(String(255), nullable=True)
+    pre_sum = Column(BigInteger, nullable=False, server_default='0')
+    pre_count = Column(Integer, nullable=False, server_default='0')
+    post_sum = Column(BigInteger, nullable=False, server_default='0')
+    post_count = Column(Integer, nullable=False, server_default='0')
+    pre_avg = Column(Numeric, Computed(PRE_AVG_SQL, persisted=True))
+    post_avg = Column(Numeric, Computed(POST_AVG_SQL, persisted=True))
+    change_percent = Column(Numeric, Computed(CHANGE_PERCENT_SQL, persisted=True))
+    peak_aqi = Column(Integer, nullable=True)
+    peak_at = Column(TIMESTAMP, nullable=True)
+    updated_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+    __table_args__ = (
+        Index('idx_disaster_aqi_impact_change', 'change_percent'),
+        Index('idx_disaster_aqi_impact_peak', 'peak_aqi'),
+    )
+
+    def to_dict(self):
+        """Convert to an affected-city entry of the correlation response"""
+        return {
+            'city_id': self.city_id,
+            'city_name': self.city_name,
+            'pre_disaster_avg_aqi': round(float(self.pre_avg), 2) if self.pre_avg is not None else None,
+            'post_disaster_avg_aqi': round(float(self.post_avg), 2) if self.post_avg is not None else None,
+            'aqi_change_percent': round(float(self.change_percent), 2) if self.change_percent is not None else None,
+            'peak_aqi': self.peak_aqi,
+            'peak_aqi_date': self.peak_at.isoformat() if self.peak_at else None
+        }
+
+    def __repr__(self):
+        return f'<DisasterAQIImpact disaster={self.disaster_id} {self.station_key}>'
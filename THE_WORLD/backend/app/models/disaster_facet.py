@@ -0,0 +1,35 @@
+"""
+THE_WORLD - Disaster Facet Model
+Rollup of disaster counts and ranges per type/severity/status/source
+"""
+
+from app.database import db
+from sqlalchemy import Column, String, BigInteger, Numeric, func
+from sqlalchemy.dialects.postgresql import TIMESTAMP
+
+
+class DisasterFacet(db.Model):
+    """Counts, date range and magnitude range of one facet combination.
+
+    Maintained by triggers (see app/schema.py): inserts are merged into the
+    running counts and ranges; updates and deletes that change a facet value,
+    date or magnitude recompute the affected combinations. Missing values are
+    stored as '' so every combination has a key.
+    """
+
+    __tablename__ = 'disaster_facets'
+
+    facet_key = Column(String(500), primary_key=True)
+    disaster_type = Column(String(50), nullable=False, server_default='')
+    severity = Column(String(50), nullable=False, server_default='')
+    status = Column(String(50), nullable=False, server_default='')
+    source = Column(String(255), nullable=False, server_default='')
+    event_count = Column(BigInteger, nullable=False, server_default='0')
+    first_occurred_at = Column(TIMESTAMP, nullable=True)
+    last_occurred_at = Column(TIMESTAMP, nullable=True)
+    min_magnitude = Column(Numeric(10, 2), nullable=True)
+    max_magnitude = Column(Numeric(10, 2), nullable=True)
+    updated_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+    def __repr__(self):
+        return f'<DisasterFacet {self.facet_key} n={self.event_count}>'
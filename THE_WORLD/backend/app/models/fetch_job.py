@@ -0,0 +1,60 @@
+"""
+THE_WORLD - Fetch Job Model
+Database-backed queue of background data fetch jobs
+"""
+
+from app.database import db
+from sqlalchemy import Column, Integer, String, Text, Index, func
+from sqlalchemy.dialects.postgresql import TIMESTAMP, JSONB
+
+
+class FetchJob(db.Model):
+    """Queued fetch-and-save job, claimed by workers with FOR UPDATE SKIP LOCKED"""
+
+    __tablename__ = 'fetch_jobs'
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_type = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default=QUEUED, server_default=QUEUED)
+    params = Column(JSONB, nullable=False, default=dict, server_default='{}')
+    progress = Column(JSONB, nullable=True)
+    result = Column(JSONB, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    max_attempts = Column(Integer, nullable=False, default=3, server_default='3')
+    worker_id = Column(String(255), nullable=True)
+    run_after = Column(TIMESTAMP, nullable=False, server_default=func.current_timestamp())
+    created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+    started_at = Column(TIMESTAMP, nullable=True)
+    heartbeat_at = Column(TIMESTAMP, nullable=True)
+    finished_at = Column(TIMESTAMP, nullable=True)
+
+    # Workers poll for the oldest runnable job of a type
+    __table_args__ = (
+        Index('idx_fetch_jobs_queue', 'status', 'job_type', 'run_after'),
+    )
+
+    def to_dict(self):
+        """Convert job to dictionary"""
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'params': self.params,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<FetchJob {self.id} {self.job_type} {self.status}>'
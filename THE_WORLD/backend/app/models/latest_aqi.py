@@ -0,0 +1,76 @@
+"""
+THE_WORLD - Latest AQI Model
+Most recent AQI measurement per city/station, maintained by trigger
+"""
+
+from app.database import db
+from geoalchemy2 import Geometry
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, Text, Computed, Index, func
+from sqlalchemy.dialects.postgresql import TIMESTAMP
+
+
+class LatestAQI(db.Model):
+    """Latest AQI reading per station.
+
+    Rows are upserted by the ``upsert_latest_aqi`` trigger on
+    aqi_measurements whenever a newer measurement lands, so reads cost one
+    row per station regardless of how much history is stored. Deleting or
+    moving a station's newest measurement falls back to its previous one
+    (``latest_aqi_on_measurement_change``). The station key is
+    ``city:<city_id>`` for matched cities, otherwise the station name (or
+    coordinates when unnamed).
+    """
+
+    __tablename__ = 'latest_aqi'
+
+    station_key = Column(String(300), primary_key=True)
+    measurement_id = Column(Integer, ForeignKey('aqi_measurements.id', ondelete='CASCADE'), nullable=False)
+    city_id = Column(Integer, ForeignKey('cities.id', ondelete='SET NULL'), nullable=True, index=True)
+    city_name = Column(String(255), nullable=True, index=True)
+    latitude = Column(Numeric(10, 8), nullable=False)
+    longitude = Column(Numeric(11, 8), nullable=False)
+    geom = Column(Geometry('POINT', srid=4326), nullable=True)
+    geohash = Column(String(12), Computed('ST_GeoHash(geom, 12)', persisted=True), nullable=True)
+    measured_at = Column(TIMESTAMP, nullable=False)
+    aqi_value = Column(Integer, nullable=True)
+    aqi_category = Column(String(50), nullable=True)
+    pm25 = Column(Numeric(8, 2), nullable=True)
+    pm10 = Column(Numeric(8, 2), nullable=True)
+    o3 = Column(Numeric(8, 2), nullable=True)
+    no2 = Column(Numeric(8, 2), nullable=True)
+    co = Column(Numeric(8, 2), nullable=True)
+    so2 = Column(Numeric(8, 2), nullable=True)
+    source = Column(String(255), nullable=True)
+    url = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP, nullable=True)
+    updated_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+    __table_args__ = (
+        Index('idx_latest_aqi_geohash', 'geohash', postgresql_ops={'geohash': 'varchar_pattern_ops'}),
+    )
+
+    def to_dict(self):
+        """Convert to the same shape as AQIMeasurement.to_dict()"""
+        return {
+            'id': self.measurement_id,
+            'city_id': self.city_id,
+            'city_name': self.city_name,
+            'latitude': float(self.latitude) if self.latitude else None,
+            'longitude': float(self.longitude) if self.longitude else None,
+            'measured_at': self.measured_at.isoformat() if self.measured_at else None,
+            'aqi_value': self.aqi_value,
+            'aqi_category': self.aqi_category,
+            'pm25': float(self.pm25) if self.pm25 else None,
+            'pm10': float(self.pm10) if self.pm10 else None,
+            'o3': float(self.o3) if self.o3 else None,
+            'no2': float(self.no2) if self.no2 else None,
+            'co': float(self.co) if self.co else None,
+            'so2': float(self.so2) if self.so2 else None,
+            'source': self.source,
+            'url': self.url,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<LatestAQI {self.station_key} AQI: {self.aqi_value} at {self.measured_at}>'
@@ -11,5 +11,6 @@ from app.routes import comparison
 from app.routes import correlation
 from app.routes import download
 from app.routes import chatbot
+from app.routes import jobs
 
-__all__ = ['disasters', 'aqi', 'cities', 'comparison', 'correlation', 'download', 'chatbot']
+__all__ = ['disasters', 'aqi', 'cities', 'comparison', 'correlation', 'download', 'chatbot', 'jobs']
@@ -3,36 +3,78 @@ THE_WORLD - AQI Routes
 API endpoints for Air Quality Index data
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, url_for, stream_with_context
 from app.database import db
-from app.models import AQIMeasurement
-from sqlalchemy import and_, desc
-from datetime import datetime
-import json
+from app.config import Config
+from app.models import AQIMeasurement, LatestAQI
+from sqlalchemy import desc
 
-from app.services.aqi_api import aqi_service
+from app.services.job_queue import job_queue
+from app.utils.clustering import parse_cluster_args, is_clustered, cell_criteria, aqi_clusters
+from app.utils.conditional import register_conditional_get
+from app.utils.counting import parse_total_mode, resolve_total
+from app.utils.filters import FilterError, parse_limit, aqi_filters, polygon_criteria, latest_aqi_filters
+from app.utils.geojson import aqi_features, feature_collection_stream
+from app.utils.pagination import paginate_keyset
+from app.utils.proximity import parse_near_args, nearest, near_response_data
+from app.utils.serializers import aqi_rows, latest_aqi_rows
+from app.utils.tiles import render_tile, tile_response
 
 bp = Blueprint('aqi', __name__)
+register_conditional_get(bp, 'aqi_measurements')
+
+
+def _list_response(criteria, filters, total_mode):
+    """Paginated list response shared by the GET and polygon filter endpoints"""
+    limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+    offset = request.args.get('offset', 0, type=int)
+    cursor = request.args.get('cursor')  # Opaque keyset cursor from a previous page
+    
+    # Build query
+    query = db.session.query(*aqi_rows.columns).filter(*criteria)
+    
+    # Get total count (exact, cached/estimated, or skipped)
+    total_count, total_estimated = resolve_total(query, total_mode, 'aqi_measurements', filters)
+    
+    # Apply pagination, most recent first (id breaks timestamp ties)
+    try:
+        measurements, next_cursor = paginate_keyset(
+            query, AQIMeasurement.measured_at, AQIMeasurement.id, limit, cursor=cursor, offset=offset
+        )
+    except ValueError as e:
+        return jsonify({'error': 'Invalid cursor', 'message': str(e)}), 400
+    
+    # Serialize results
+    data = [aqi_rows(row) for row in measurements]
+    
+    return jsonify({
+        'success': True,
+        'count': len(data),
+        'total': total_count,
+        'total_estimated': total_estimated,
+        'offset': offset,
+        'limit': limit,
+        'next_cursor': next_cursor,
+        'data': data
+    })
 
 
 @bp.route('/fetch', methods=['POST'])
 def fetch_aqi():
-    """Trigger manual fetch of AQI data"""
+    """Queue a background fetch of AQI data"""
     try:
         cities = request.json.get('cities') if request.is_json else None
         limit = request.args.get('limit', 50, type=int)
         
-        # Fetch data
-        aqi_data = aqi_service.fetch_all_aqi(cities=cities, limit=limit)
-        
-        # Save to database
-        result = aqi_service.save_measurements_to_db(aqi_data)
+        job = job_queue.enqueue('aqi', {'cities': cities, 'limit': limit})
         
         return jsonify({
             'success': True,
-            'message': 'AQI data fetch completed',
-            'details': result
-        })
+            'message': 'AQI data fetch queued',
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('jobs.get_job', job_id=job.id)
+        }), 202
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -41,83 +83,32 @@ def fetch_aqi():
 def get_aqi():
     """Get AQI measurements with optional filtering"""
     try:
-        # Parse query parameters
-        city_id = request.args.get('city_id', type=int)
-        city_name = request.args.get('city_name')
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        min_aqi = request.args.get('min_aqi', type=int)
-        max_aqi = request.args.get('max_aqi', type=int)
-        bbox = request.args.get('bbox')
-        limit = min(request.args.get('limit', 100, type=int), 1000)
-        offset = request.args.get('offset', 0, type=int)
-        
-        # Build query
-        query = AQIMeasurement.query
-        
-        # Apply filters
-        if city_id:
-            query = query.filter(AQIMeasurement.city_id == city_id)
-        
-        if city_name:
-            query = query.filter(AQIMeasurement.city_name.ilike(f'%{city_name}%'))
-        
-        if start_date:
-            try:
-                start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                query = query.filter(AQIMeasurement.measured_at >= start_dt)
-            except ValueError:
-                return jsonify({'error': 'Invalid date format'}), 400
-        
-        if end_date:
-            try:
-                end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                query = query.filter(AQIMeasurement.measured_at <= end_dt)
-            except ValueError:
-                return jsonify({'error': 'Invalid date format'}), 400
-        
-        if min_aqi is not None:
-            query = query.filter(AQIMeasurement.aqi_value >= min_aqi)
-        
-        if max_aqi is not None:
-            query = query.filter(AQIMeasurement.aqi_value <= max_aqi)
-        
-        if bbox:
-            try:
-                coords = [float(x) for x in bbox.split(',')]
-                if len(coords) == 4:
-                    min_lon, min_lat, max_lon, max_lat = coords
-                    query = query.filter(
-                        and_(
-                            AQIMeasurement.longitude >= min_lon,
-                            AQIMeasurement.longitude <= max_lon,
-                            AQIMeasurement.latitude >= min_lat,
-                            AQIMeasurement.latitude <= max_lat
-                        )
-                    )
-            except (ValueError, IndexError):
-                return jsonify({'error': 'Invalid bbox format'}), 400
-        
-        # Order by measured_at (most recent first)
-        query = query.order_by(desc(AQIMeasurement.measured_at))
-        
-        # Get total count
-        total_count = query.count()
-        
-        # Apply pagination
-        measurements = query.limit(limit).offset(offset).all()
-        
-        # Serialize results
-        data = [measurement.to_dict() for measurement in measurements]
+        try:
+            criteria, filters = aqi_filters(request.args)
+            total_mode = parse_total_mode(request.args, 'aqi')
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
         
-        return jsonify({
-            'success': True,
-            'count': len(data),
-            'total': total_count,
-            'offset': offset,
-            'limit': limit,
-            'data': data
-        })
+        return _list_response(criteria, filters, total_mode)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/within', methods=['POST'])
+def get_aqi_within():
+    """Get AQI measurements inside a GeoJSON polygon (body: {"geometry": ...}), with the list filters"""
+    try:
+        body = request.get_json(silent=True) or {}
+        
+        try:
+            criteria, filters = aqi_filters(request.args)
+            polygon, filters['polygon'] = polygon_criteria(body.get('geometry'), AQIMeasurement)
+            total_mode = parse_total_mode(request.args, 'aqi')
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
+        
+        return _list_response(criteria + polygon, filters, total_mode)
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -130,33 +121,20 @@ def get_latest_aqi():
         city_ids = request.args.get('city_ids')  # Comma-separated
         city_names = request.args.get('city_names')  # Comma-separated
         
-        query = AQIMeasurement.query
+        # latest_aqi holds one row per city/station, maintained on ingest
+        query = db.session.query(*latest_aqi_rows.columns)
         
         if city_ids:
             ids = [int(x.strip()) for x in city_ids.split(',')]
-            query = query.filter(AQIMeasurement.city_id.in_(ids))
+            query = query.filter(LatestAQI.city_id.in_(ids))
         
         if city_names:
             names = [name.strip() for name in city_names.split(',')]
-            query = query.filter(AQIMeasurement.city_name.in_(names))
-        
-        # Get latest for each city
-        # This is a simplified approach - for production, use window functions
-        measurements = query.order_by(
-            desc(AQIMeasurement.city_name),
-            desc(AQIMeasurement.measured_at)
-        ).all()
-        
-        # Deduplicate by city (keep most recent)
-        seen_cities = set()
-        unique_measurements = []
-        for measurement in measurements:
-            city_key = measurement.city_id or measurement.city_name
-            if city_key not in seen_cities:
-                seen_cities.add(city_key)
-                unique_measurements.append(measurement)
-        
-        data = [m.to_dict() for m in unique_measurements]
+            query = query.filter(LatestAQI.city_name.in_(names))
+        
+        latest = query.order_by(desc(LatestAQI.city_name)).all()
+        
+        data = [latest_aqi_rows(row) for row in latest]
         
         return jsonify({
             'success': True,
@@ -170,31 +148,105 @@ def get_latest_aqi():
 
 @bp.route('/geojson', methods=['GET'])
 def get_aqi_geojson():
-    """Get AQI measurements as GeoJSON"""
+    """Get AQI measurements as GeoJSON, generated by PostGIS and streamed"""
+    try:
+        try:
+            criteria, _ = aqi_filters(request.args)
+            limit = min(
+                parse_limit(request.args) or Config.GEOJSON_MAX_FEATURES,
+                Config.GEOJSON_MAX_FEATURES
+            )
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
+        
+        # Each row is a complete Feature rendered by ST_AsGeoJSON
+        statement = aqi_features(criteria, limit)
+        
+        return Response(
+            stream_with_context(feature_collection_stream(statement)),
+            mimetype='application/json'
+        )
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/tiles/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+def get_aqi_tile(z, x, y):
+    """Get a Mapbox Vector Tile of the AQI layer (accepts the list filters)"""
+    try:
+        try:
+            criteria, filters = aqi_filters(request.args)
+            tile = render_tile('aqi', criteria, filters, z, x, y)
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
+        
+        return tile_response(tile)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/clusters', methods=['GET'])
+def get_aqi_clusters():
+    """Get latest-AQI station clusters for a bbox and zoom, or individual stations past the cluster zoom"""
     try:
-        # Reuse get_aqi logic
-        response = get_aqi()
-        data = response.get_json()
-        
-        if not data.get('success'):
-            return response
-        
-        # Convert to GeoJSON format
-        features = []
-        for aqi_data in data['data']:
-            features.append({
-                'type': 'Feature',
-                'geometry': {
-                    'type': 'Point',
-                    'coordinates': [aqi_data['longitude'], aqi_data['latitude']]
-                },
-                'properties': {k: v for k, v in aqi_data.items() 
-                             if k not in ['latitude', 'longitude']}
+        try:
+            zoom, cell = parse_cluster_args(request.args)
+            criteria, _ = latest_aqi_filters(request.args)
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
+        
+        if is_clustered(zoom):
+            precision, clusters = aqi_clusters(criteria, zoom, cell)
+            return jsonify({
+                'success': True,
+                'zoom': zoom,
+                'clustered': True,
+                'precision': precision,
+                'count': len(clusters),
+                'data': clusters
             })
         
+        # Past the cluster zoom, return the individual features in view
+        stations = LatestAQI.query.filter(
+            *criteria, *cell_criteria(LatestAQI, cell)
+        ).order_by(LatestAQI.aqi_value.desc().nullslast()).limit(Config.CLUSTER_MAX_POINTS).all()
+        
+        data = [item.to_dict() for item in stations]
+        
+        return jsonify({
+            'success': True,
+            'zoom': zoom,
+            'clustered': False,
+            'count': len(data),
+            'data': data
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/near', methods=['GET'])
+def get_aqi_near():
+    """Get the k AQI stations (latest reading) nearest a point, optionally within radius_km"""
+    try:
+        try:
+            lat, lon, radius_km, k = parse_near_args(request.args)
+            criteria, _ = latest_aqi_filters(request.args)
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
+        
+        # Nearest first; distance_km is included on every item
+        data = near_response_data(nearest(LatestAQI, criteria, lat, lon, radius_km, k))
+        
         return jsonify({
-            'type': 'FeatureCollection',
-            'features': features
+            'success': True,
+            'origin': {'lat': lat, 'lon': lon},
+            'radius_km': radius_km,
+            'k': k,
+            'count': len(data),
+            'data': data
         })
     
     except Exception as e:
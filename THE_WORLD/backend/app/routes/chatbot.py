@@ -5,14 +5,24 @@ API endpoints for AI-powered chatbot
 
 from flask import Blueprint, request, jsonify
 from app.config import Config
+from app.models import ChatMessage
+from app.services.conversation_store import conversation_store
 import requests
 import json
 
 bp = Blueprint('chatbot', __name__)
 
-# In-memory conversation storage (for development)
-# For production, use Redis or database
-conversations = {}
+MAX_CONVERSATION_ID_LENGTH = ChatMessage.conversation_id.type.length
+
+
+def invalid_conversation_id(conversation_id):
+    """400 response for a conversation id the store cannot hold, else None"""
+    if isinstance(conversation_id, str) and len(conversation_id) <= MAX_CONVERSATION_ID_LENGTH:
+        return None
+    return jsonify({
+        'success': False,
+        'error': f'conversation_id must be a string of at most {MAX_CONVERSATION_ID_LENGTH} characters'
+    }), 400
 
 
 @bp.route('/message', methods=['POST'])
@@ -29,9 +39,9 @@ def send_message():
                 'error': 'Message field is required'
             }), 400
         
-        # Get or create conversation history
-        if conversation_id not in conversations:
-            conversations[conversation_id] = []
+        invalid = invalid_conversation_id(conversation_id)
+        if invalid:
+            return invalid
         
         # Add system context about the application
         system_context = """You are a helpful assistant for THE_WORLD, a WebGIS system for monitoring disasters and Air Quality Index (AQI) data.
@@ -50,8 +60,8 @@ Always provide accurate, helpful information based on the system's capabilities.
             {"role": "system", "content": system_context}
         ]
         
-        # Add conversation history (last 10 messages)
-        history = conversations[conversation_id][-10:]
+        # Add recent conversation history
+        history = conversation_store.get_history(conversation_id, Config.CHATBOT_HISTORY_MESSAGES)
         messages.extend(history)
         
         # Add current user message
@@ -86,8 +96,10 @@ Always provide accurate, helpful information based on the system's capabilities.
         assistant_message = ai_response.get('choices', [{}])[0].get('message', {}).get('content', 'I apologize, I could not generate a response.')
         
         # Update conversation history
-        conversations[conversation_id].append({"role": "user", "content": message})
-        conversations[conversation_id].append({"role": "assistant", "content": assistant_message})
+        conversation_store.append(conversation_id, [
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": assistant_message}
+        ])
         
         # Generate suggested actions (simplified)
         suggested_actions = []
@@ -128,8 +140,11 @@ def clear_conversation():
         data = request.get_json()
         conversation_id = data.get('conversation_id', 'default')
         
-        if conversation_id in conversations:
-            conversations[conversation_id] = []
+        invalid = invalid_conversation_id(conversation_id)
+        if invalid:
+            return invalid
+        
+        conversation_store.clear(conversation_id)
         
         return jsonify({
             'success': True,
@@ -6,52 +6,48 @@ API endpoints for city data
 from flask import Blueprint, request, jsonify
 from app.database import db
 from app.models import City
-from sqlalchemy import or_
+
+from app.utils.autocomplete import parse_autocomplete_args, autocomplete_cities
+from app.utils.conditional import register_conditional_get
+from app.utils.counting import parse_total_mode, resolve_total
+from app.utils.filters import FilterError, city_filters
+from app.utils.proximity import parse_near_args, nearest, near_response_data
+from app.utils.serializers import city_rows
 
 bp = Blueprint('cities', __name__)
+register_conditional_get(bp, 'cities')
 
 
 @bp.route('', methods=['GET'])
 def get_cities():
     """Get list of cities with optional filtering"""
     try:
-        country = request.args.get('country')
-        country_code = request.args.get('country_code')
-        search = request.args.get('search')
         limit = min(request.args.get('limit', 100, type=int), 1000)
         offset = request.args.get('offset', 0, type=int)
         
-        # Build query
-        query = City.query
-        
-        # Apply filters
-        if country:
-            query = query.filter(City.country.ilike(f'%{country}%'))
-        
-        if country_code:
-            query = query.filter(City.country_code == country_code.upper())
+        try:
+            criteria, filters = city_filters(request.args)
+            total_mode = parse_total_mode(request.args, 'cities')
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
         
-        if search:
-            query = query.filter(
-                or_(
-                    City.name.ilike(f'%{search}%'),
-                    City.country.ilike(f'%{search}%')
-                )
-            )
+        # Build query
+        query = db.session.query(*city_rows.columns).filter(*criteria)
         
-        # Get total count
-        total_count = query.count()
+        # Get total count (exact, cached/estimated, or skipped)
+        total_count, total_estimated = resolve_total(query, total_mode, 'cities', filters)
         
         # Apply pagination
-        cities = query.limit(limit).offset(offset).all()
+        cities = query.order_by(City.id).limit(limit).offset(offset).all()
         
         # Serialize results
-        data = [city.to_dict() for city in cities]
+        data = [city_rows(row) for row in cities]
         
         return jsonify({
             'success': True,
             'count': len(data),
             'total': total_count,
+            'total_estimated': total_estimated,
             'offset': offset,
             'limit': limit,
             'data': data
@@ -61,6 +57,54 @@ def get_cities():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@bp.route('/near', methods=['GET'])
+def get_cities_near():
+    """Get the k cities nearest a point (k=1 reverse-geocodes to the nearest city)"""
+    try:
+        try:
+            lat, lon, radius_km, k = parse_near_args(request.args)
+            criteria, _ = city_filters(request.args)
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
+        
+        # Nearest first; distance_km is included on every item
+        data = near_response_data(nearest(City, criteria, lat, lon, radius_km, k))
+        
+        return jsonify({
+            'success': True,
+            'origin': {'lat': lat, 'lon': lon},
+            'radius_km': radius_km,
+            'k': k,
+            'count': len(data),
+            'data': data
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/autocomplete', methods=['GET'])
+def autocomplete():
+    """Typeahead city search (?q=, optional limit and country_code)"""
+    try:
+        try:
+            term, limit, country_code = parse_autocomplete_args(request.args)
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
+        
+        data = autocomplete_cities(term, limit, country_code)
+        
+        return jsonify({
+            'success': True,
+            'query': term,
+            'count': len(data),
+            'data': data
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @bp.route('/<int:city_id>', methods=['GET'])
 def get_city(city_id):
     """Get a specific city by ID"""
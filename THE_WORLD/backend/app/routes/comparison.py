@@ -5,11 +5,36 @@ API endpoints for comparing AQI data between cities
 
 from flask import Blueprint, request, jsonify
 from app.database import db
-from app.models import AQIMeasurement
-from sqlalchemy import func, desc
-from datetime import datetime
+from app.config import Config
+from app.models import AQIMeasurement, LatestAQI
+from sqlalchemy import func, select, true, literal_column, Integer
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.orm import aliased
+from datetime import timedelta
+
+from app.utils.conditional import register_conditional_get
+from app.utils.filters import FilterError, parse_utc_datetime
 
 bp = Blueprint('comparison', __name__)
+register_conditional_get(bp, 'cities', 'aqi_measurements')
+
+# date_trunc unit -> approximate bucket width, used to bound the response size
+HISTORICAL_INTERVALS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+    'month': timedelta(days=30)
+}
+
+
+def _with_statistics(model):
+    """Entity plus highest/lowest/average AQI over the whole result (window aggregates)"""
+    return (
+        model,
+        func.max(model.aqi_value).over().label('highest_aqi'),
+        func.min(model.aqi_value).over().label('lowest_aqi'),
+        func.avg(model.aqi_value).over().label('average_aqi')
+    )
 
 
 @bp.route('/aqi', methods=['GET'])
@@ -23,49 +48,56 @@ def compare_aqi():
             return jsonify({'error': 'city_ids parameter is required'}), 400
         
         # Parse city IDs
-        ids = [int(x.strip()) for x in city_ids.split(',')]
+        try:
+            ids = sorted({int(x.strip()) for x in city_ids.split(',')})
+        except ValueError:
+            return jsonify({'error': 'Invalid city_ids'}), 400
         
-        # Build query
-        query = AQIMeasurement.query.filter(AQIMeasurement.city_id.in_(ids))
-        
-        # Apply date filter if provided
         if date:
             try:
-                target_date = datetime.fromisoformat(date.replace('Z', '+00:00'))
-                query = query.filter(func.date(AQIMeasurement.measured_at) == func.date(target_date))
-            except ValueError:
+                target_date = parse_utc_datetime(date)
+            except FilterError:
                 return jsonify({'error': 'Invalid date format'}), 400
-        
-        # Get measurements (ordered by city and time)
-        measurements = query.order_by(
-            AQIMeasurement.city_id,
-            desc(AQIMeasurement.measured_at)
-        ).all()
-        
-        # Group by city and get most recent for each
-        city_data = {}
-        for measurement in measurements:
-            city_id = measurement.city_id
-            if city_id not in city_data:
-                city_data[city_id] = measurement
+            
+            # Half-open day range keeps the (city_id, measured_at) index usable
+            day_start = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
+            day_end = day_start + timedelta(days=1)
+            
+            # Per city: LATERAL (... ORDER BY measured_at DESC LIMIT 1), one index probe each
+            requested = func.unnest(array(ids, type_=Integer)).table_valued('city_id').render_derived(name='requested')
+            candidate = aliased(AQIMeasurement)
+            latest = (
+                select(candidate.id)
+                .where(
+                    candidate.city_id == requested.c.city_id,
+                    candidate.measured_at >= day_start,
+                    candidate.measured_at < day_end
+                )
+                .order_by(candidate.measured_at.desc(), candidate.id.desc())
+                .limit(1)
+                .lateral('latest')
+            )
+            rows = db.session.query(*_with_statistics(AQIMeasurement)).select_from(requested).join(
+                latest, true()
+            ).join(
+                AQIMeasurement, AQIMeasurement.id == latest.c.id
+            ).order_by(AQIMeasurement.city_id).all()
+        else:
+            # Latest reading per city comes straight from latest_aqi
+            rows = db.session.query(*_with_statistics(LatestAQI)).filter(
+                LatestAQI.city_id.in_(ids)
+            ).order_by(LatestAQI.city_id).all()
         
         # Build response
-        cities_list = []
-        aqi_values = []
-        
-        for city_id, measurement in city_data.items():
-            city_info = measurement.to_dict()
-            cities_list.append(city_info)
-            if measurement.aqi_value:
-                aqi_values.append(measurement.aqi_value)
+        cities_list = [row[0].to_dict() for row in rows]
         
-        # Calculate statistics
+        # Statistics were computed by the same statement
         statistics = {}
-        if aqi_values:
+        if rows and rows[0].highest_aqi is not None:
             statistics = {
-                'highest_aqi': max(aqi_values),
-                'lowest_aqi': min(aqi_values),
-                'average_aqi': round(sum(aqi_values) / len(aqi_values), 2)
+                'highest_aqi': rows[0].highest_aqi,
+                'lowest_aqi': rows[0].lowest_aqi,
+                'average_aqi': round(float(rows[0].average_aqi), 2)
             }
         
         comparison_date = date or (cities_list[0]['measured_at'] if cities_list else None)
@@ -79,3 +111,87 @@ def compare_aqi():
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/aqi/historical', methods=['GET'])
+def compare_aqi_historical():
+    """Compare bucketed AQI history (avg, min, max, count, p95) between cities"""
+    try:
+        city_ids = request.args.get('city_ids')  # Required, comma-separated
+        start_date = request.args.get('start_date')  # Required, inclusive
+        end_date = request.args.get('end_date')  # Required, exclusive
+        interval = request.args.get('interval', 'day')
+        
+        if not city_ids or not start_date or not end_date:
+            return jsonify({'error': 'city_ids, start_date and end_date parameters are required'}), 400
+        if interval not in HISTORICAL_INTERVALS:
+            return jsonify({
+                'error': 'Invalid interval',
+                'message': f"interval must be one of: {', '.join(HISTORICAL_INTERVALS)}"
+            }), 400
+        
+        try:
+            ids = sorted({int(x.strip()) for x in city_ids.split(',')})
+            start = parse_utc_datetime(start_date)
+            end = parse_utc_datetime(end_date)
+        except ValueError as e:
+            error = e.to_dict() if isinstance(e, FilterError) else {'error': 'Invalid city_ids'}
+            return jsonify(error), 400
+        
+        if end <= start:
+            return jsonify({'error': 'Invalid date range', 'message': 'end_date must be after start_date'}), 400
+        if (end - start) / HISTORICAL_INTERVALS[interval] > Config.HISTORICAL_MAX_BUCKETS:
+            return jsonify({
+                'error': 'Too many buckets',
+                'message': f'At most {Config.HISTORICAL_MAX_BUCKETS} {interval} buckets per request; use a coarser interval'
+            }), 400
+        
+        # One grouped statement; (city_id, measured_at) index drives the scan.
+        # The unit is inlined (it is whitelisted) so GROUP BY matches the select.
+        bucket = func.date_trunc(literal_column(f"'{interval}'"), AQIMeasurement.measured_at).label('bucket')
+        rows = db.session.query(
+            AQIMeasurement.city_id,
+            func.min(AQIMeasurement.city_name).label('city_name'),
+            bucket,
+            func.avg(AQIMeasurement.aqi_value).label('avg'),
+            func.min(AQIMeasurement.aqi_value).label('min'),
+            func.max(AQIMeasurement.aqi_value).label('max'),
+            func.count(AQIMeasurement.aqi_value).label('count'),
+            func.percentile_cont(0.95).within_group(AQIMeasurement.aqi_value).label('p95')
+        ).filter(
+            AQIMeasurement.city_id.in_(ids),
+            AQIMeasurement.measured_at >= start,
+            AQIMeasurement.measured_at < end,
+            AQIMeasurement.aqi_value.isnot(None)
+        ).group_by(AQIMeasurement.city_id, bucket).order_by(bucket).all()
+        
+        # Column-oriented: one shared bucket axis, per-city arrays aligned to it
+        buckets = sorted({row.bucket for row in rows})
+        position = {value: i for i, value in enumerate(buckets)}
+        series = {}
+        for row in rows:
+            city = series.get(row.city_id)
+            if city is None:
+                city = series[row.city_id] = {
+                    'city_id': row.city_id,
+                    'city_name': row.city_name,
+                    **{stat: [None] * len(buckets) for stat in ('avg', 'min', 'max', 'count', 'p95')}
+                }
+            i = position[row.bucket]
+            city['avg'][i] = round(float(row.avg), 2)
+            city['min'][i] = row.min
+            city['max'][i] = row.max
+            city['count'][i] = row.count
+            city['p95'][i] = round(float(row.p95), 2)
+        
+        return jsonify({
+            'success': True,
+            'interval': interval,
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat(),
+            'buckets': [value.isoformat() for value in buckets],
+            'cities': [series[city_id] for city_id in ids if city_id in series]
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
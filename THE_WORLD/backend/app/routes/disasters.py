@@ -3,35 +3,77 @@ THE_WORLD - Disaster Routes
 API endpoints for disaster data
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, url_for, stream_with_context
 from app.database import db
-from app.models import Disaster
-from sqlalchemy import and_, or_
-from datetime import datetime, timedelta
-import json
+from app.config import Config
+from app.models import Disaster, DisasterFacet
 
-from app.services.disaster_api import disaster_api_service
+from app.services.job_queue import job_queue
+from app.utils.clustering import parse_cluster_args, is_clustered, cell_criteria, disaster_clusters
+from app.utils.conditional import register_conditional_get
+from app.utils.counting import parse_total_mode, resolve_total
+from app.utils.facets import disaster_facets
+from app.utils.filters import FilterError, parse_limit, disaster_filters, polygon_criteria
+from app.utils.geojson import disaster_features, feature_collection_stream
+from app.utils.pagination import paginate_keyset
+from app.utils.proximity import parse_near_args, nearest, near_response_data
+from app.utils.serializers import disaster_rows
+from app.utils.tiles import render_tile, tile_response
 
 bp = Blueprint('disasters', __name__)
+register_conditional_get(bp, 'disasters')
+
+
+def _list_response(criteria, filters, total_mode):
+    """Paginated list response shared by the GET and polygon filter endpoints"""
+    limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+    offset = request.args.get('offset', 0, type=int)
+    cursor = request.args.get('cursor')  # Opaque keyset cursor from a previous page
+    
+    # Build query
+    query = db.session.query(*disaster_rows.columns).filter(*criteria)
+    
+    # Get total count (exact, cached/estimated, or skipped)
+    total_count, total_estimated = resolve_total(query, total_mode, 'disasters', filters)
+    
+    # Apply pagination, most recent first (id breaks timestamp ties)
+    try:
+        disasters, next_cursor = paginate_keyset(
+            query, Disaster.occurred_at, Disaster.id, limit, cursor=cursor, offset=offset
+        )
+    except ValueError as e:
+        return jsonify({'error': 'Invalid cursor', 'message': str(e)}), 400
+    
+    # Serialize results
+    data = [disaster_rows(row) for row in disasters]
+    
+    return jsonify({
+        'success': True,
+        'count': len(data),
+        'total': total_count,
+        'total_estimated': total_estimated,
+        'offset': offset,
+        'limit': limit,
+        'next_cursor': next_cursor,
+        'data': data
+    })
 
 
 @bp.route('/fetch', methods=['POST'])
 def fetch_disasters():
-    """Trigger manual fetch of disaster data"""
+    """Queue a background fetch of disaster data"""
     try:
         days = request.args.get('days', 7, type=int)
         
-        # Fetch data
-        disasters_data = disaster_api_service.fetch_all_disasters(days=days)
-        
-        # Save to database
-        result = disaster_api_service.save_disasters_to_db(disasters_data)
+        job = job_queue.enqueue('disasters', {'days': days})
         
         return jsonify({
             'success': True,
-            'message': 'Disaster data fetch completed',
-            'details': result
-        })
+            'message': 'Disaster data fetch queued',
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('jobs.get_job', job_id=job.id)
+        }), 202
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -40,79 +82,32 @@ def fetch_disasters():
 def get_disasters():
     """Get disaster events with optional filtering"""
     try:
-        # Parse query parameters
-        disaster_type = request.args.get('disaster_type')
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        min_magnitude = request.args.get('min_magnitude', type=float)
-        max_magnitude = request.args.get('max_magnitude', type=float)
-        bbox = request.args.get('bbox')  # min_lon,min_lat,max_lon,max_lat
-        limit = min(request.args.get('limit', 100, type=int), 1000)
-        offset = request.args.get('offset', 0, type=int)
-        
-        # Build query
-        query = Disaster.query
-        
-        # Apply filters
-        if disaster_type:
-            query = query.filter(Disaster.disaster_type == disaster_type)
-        
-        if start_date:
-            try:
-                start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                query = query.filter(Disaster.occurred_at >= start_dt)
-            except ValueError:
-                return jsonify({'error': 'Invalid date format', 'message': 'Date must be in ISO 8601 format'}), 400
-        
-        if end_date:
-            try:
-                end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                query = query.filter(Disaster.occurred_at <= end_dt)
-            except ValueError:
-                return jsonify({'error': 'Invalid date format', 'message': 'Date must be in ISO 8601 format'}), 400
-        
-        if min_magnitude is not None:
-            query = query.filter(Disaster.magnitude >= min_magnitude)
-        
-        if max_magnitude is not None:
-            query = query.filter(Disaster.magnitude <= max_magnitude)
-        
-        if bbox:
-            try:
-                coords = [float(x) for x in bbox.split(',')]
-                if len(coords) == 4:
-                    min_lon, min_lat, max_lon, max_lat = coords
-                    query = query.filter(
-                        and_(
-                            Disaster.longitude >= min_lon,
-                            Disaster.longitude <= max_lon,
-                            Disaster.latitude >= min_lat,
-                            Disaster.latitude <= max_lat
-                        )
-                    )
-            except (ValueError, IndexError):
-                return jsonify({'error': 'Invalid bbox format', 'message': 'Bbox must be: min_lon,min_lat,max_lon,max_lat'}), 400
-        
-        # Order by occurred_at (most recent first)
-        query = query.order_by(Disaster.occurred_at.desc())
+        try:
+            criteria, filters = disaster_filters(request.args)
+            total_mode = parse_total_mode(request.args, 'disasters')
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
         
-        # Get total count
-        total_count = query.count()
-        
-        # Apply pagination
-        disasters = query.limit(limit).offset(offset).all()
+        return _list_response(criteria, filters, total_mode)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/within', methods=['POST'])
+def get_disasters_within():
+    """Get disaster events inside a GeoJSON polygon (body: {"geometry": ...}), with the list filters"""
+    try:
+        body = request.get_json(silent=True) or {}
         
-        # Serialize results
-        data = [disaster.to_dict() for disaster in disasters]
+        try:
+            criteria, filters = disaster_filters(request.args)
+            polygon, filters['polygon'] = polygon_criteria(body.get('geometry'), Disaster)
+            total_mode = parse_total_mode(request.args, 'disasters')
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
         
-        return jsonify({
-            'success': True,
-            'count': len(data),
-            'total': total_count,
-            'offset': offset,
-            'limit': limit,
-            'data': data
-        })
+        return _list_response(criteria + polygon, filters, total_mode)
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -133,31 +128,105 @@ def get_disaster(disaster_id):
 
 @bp.route('/geojson', methods=['GET'])
 def get_disasters_geojson():
-    """Get disaster events as GeoJSON"""
+    """Get disaster events as GeoJSON, generated by PostGIS and streamed"""
+    try:
+        try:
+            criteria, _ = disaster_filters(request.args)
+            limit = min(
+                parse_limit(request.args) or Config.GEOJSON_MAX_FEATURES,
+                Config.GEOJSON_MAX_FEATURES
+            )
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
+        
+        # Each row is a complete Feature rendered by ST_AsGeoJSON
+        statement = disaster_features(criteria, limit)
+        
+        return Response(
+            stream_with_context(feature_collection_stream(statement)),
+            mimetype='application/json'
+        )
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/tiles/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+def get_disasters_tile(z, x, y):
+    """Get a Mapbox Vector Tile of the Disaster layer (accepts the list filters)"""
     try:
-        # Reuse get_disasters logic
-        response = get_disasters()
-        data = response.get_json()
+        try:
+            criteria, filters = disaster_filters(request.args)
+            tile = render_tile('disasters', criteria, filters, z, x, y)
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
         
-        if not data.get('success'):
-            return response
+        return tile_response(tile)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/clusters', methods=['GET'])
+def get_disaster_clusters():
+    """Get disaster clusters for a bbox and zoom, or individual events past the cluster zoom"""
+    try:
+        try:
+            zoom, cell = parse_cluster_args(request.args)
+            criteria, _ = disaster_filters(request.args)
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
         
-        # Convert to GeoJSON format
-        features = []
-        for disaster_data in data['data']:
-            features.append({
-                'type': 'Feature',
-                'geometry': {
-                    'type': 'Point',
-                    'coordinates': [disaster_data['longitude'], disaster_data['latitude']]
-                },
-                'properties': {k: v for k, v in disaster_data.items() 
-                             if k not in ['latitude', 'longitude']}
+        if is_clustered(zoom):
+            precision, clusters = disaster_clusters(criteria, zoom, cell)
+            return jsonify({
+                'success': True,
+                'zoom': zoom,
+                'clustered': True,
+                'precision': precision,
+                'count': len(clusters),
+                'data': clusters
             })
         
+        # Past the cluster zoom, return the individual features in view
+        disasters = Disaster.query.filter(
+            *criteria, *cell_criteria(Disaster, cell)
+        ).order_by(Disaster.occurred_at.desc()).limit(Config.CLUSTER_MAX_POINTS).all()
+        
+        data = [item.to_dict() for item in disasters]
+        
         return jsonify({
-            'type': 'FeatureCollection',
-            'features': features
+            'success': True,
+            'zoom': zoom,
+            'clustered': False,
+            'count': len(data),
+            'data': data
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/near', methods=['GET'])
+def get_disasters_near():
+    """Get the k disaster events nearest a point, optionally within radius_km"""
+    try:
+        try:
+            lat, lon, radius_km, k = parse_near_args(request.args)
+            criteria, _ = disaster_filters(request.args)
+        except FilterError as e:
+            return jsonify(e.to_dict()), 400
+        
+        # Nearest first; distance_km is included on every item
+        data = near_response_data(nearest(Disaster, criteria, lat, lon, radius_km, k))
+        
+        return jsonify({
+            'success': True,
+            'origin': {'lat': lat, 'lon': lon},
+            'radius_km': radius_km,
+            'k': k,
+            'count': len(data),
+            'data': data
         })
     
     except Exception as e:
@@ -168,7 +237,8 @@ def get_disasters_geojson():
 def get_disaster_types():
     """Get list of available disaster types"""
     try:
-        types = db.session.query(Disaster.disaster_type).distinct().all()
+        # The facet rollup has a handful of rows per type, unlike disasters
+        types = db.session.query(DisasterFacet.disaster_type).distinct().all()
         disaster_types = [t[0] for t in types if t[0]]
         
         return jsonify({
@@ -177,3 +247,15 @@ def get_disaster_types():
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/facets', methods=['GET'])
+def get_disaster_facets():
+    """Get counts per type, severity, status and source plus date and magnitude ranges"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': disaster_facets()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
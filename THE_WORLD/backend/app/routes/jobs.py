@@ -0,0 +1,55 @@
+"""
+THE_WORLD - Job Routes
+API endpoints for background fetch job status
+"""
+
+from flask import Blueprint, request, jsonify
+from app.models import FetchJob
+
+from app.services.job_queue import job_queue
+
+bp = Blueprint('jobs', __name__)
+
+
+@bp.route('', methods=['GET'])
+def get_jobs():
+    """List recent fetch jobs, optionally filtered by type and status"""
+    try:
+        job_type = request.args.get('job_type')
+        status = request.args.get('status')
+        limit = min(request.args.get('limit', 20, type=int), 100)
+
+        query = FetchJob.query
+
+        if job_type:
+            query = query.filter(FetchJob.job_type == job_type)
+
+        if status:
+            query = query.filter(FetchJob.status == status)
+
+        jobs = query.order_by(FetchJob.id.desc()).limit(limit).all()
+        data = [job.to_dict() for job in jobs]
+
+        return jsonify({
+            'success': True,
+            'count': len(data),
+            'data': data
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get status, progress and result of a fetch job"""
+    try:
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+        return jsonify({
+            'success': True,
+            'data': job.to_dict()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,741 @@
+"""
+THE_WORLD - Schema Support Objects
+Functions, triggers and indexes that db.create_all() does not manage.
+Every statement is idempotent so it can run on each startup; the same
+objects are declared in database_schema.sql for manual setups. Data
+backfills are one-time migrations recorded in schema_migrations.
+"""
+
+from app.config import Config
+
+# Tables whose writes bump data_versions (cache invalidation, ETags)
+VERSIONED_TABLES = ['cities', 'disasters', 'aqi_measurements']
+
+SCHEMA_MIGRATIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        name VARCHAR(100) PRIMARY KEY,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# (name, statements) applied once per database, in order. Backfills live here
+# rather than in SUPPORT_DDL: an UPDATE fires the data_versions triggers even
+# when it changes no rows, which would invalidate every version-keyed cache
+# on each process start.
+MIGRATIONS = []
+
+SUPPORT_DDL = [
+    # ---- Data versions --------------------------------------------------
+    # updated_at is UTC whatever the session timezone (Last-Modified headers)
+    """
+    CREATE OR REPLACE FUNCTION bump_data_version()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        INSERT INTO data_versions (table_name, version, updated_at)
+        VALUES (TG_TABLE_NAME, 1, timezone('utc', now()))
+        ON CONFLICT (table_name) DO UPDATE
+        SET version = data_versions.version + 1,
+            updated_at = timezone('utc', now());
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+] + [
+    statement
+    for table in VERSIONED_TABLES
+    for statement in (
+        f"DROP TRIGGER IF EXISTS bump_{table}_version ON {table}",
+        f"""
+        CREATE TRIGGER bump_{table}_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()
+        """,
+    )
+] + [
+    # ---- Latest AQI per station ------------------------------------------
+    """
+    CREATE OR REPLACE FUNCTION latest_aqi_station_key(
+        p_city_id INTEGER, p_city_name TEXT, p_latitude NUMERIC, p_longitude NUMERIC
+    )
+    RETURNS TEXT AS $$
+        SELECT COALESCE(
+            'city:' || p_city_id,
+            'name:' || p_city_name,
+            'point:' || p_latitude || ',' || p_longitude
+        )
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION upsert_latest_aqi()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        INSERT INTO latest_aqi (
+            station_key, measurement_id, city_id, city_name, latitude, longitude, geom,
+            measured_at, aqi_value, aqi_category, pm25, pm10, o3, no2, co, so2,
+            source, url, created_at, updated_at
+        )
+        VALUES (
+            latest_aqi_station_key(NEW.city_id, NEW.city_name, NEW.latitude, NEW.longitude),
+            NEW.id, NEW.city_id, NEW.city_name, NEW.latitude, NEW.longitude, NEW.geom,
+            NEW.measured_at, NEW.aqi_value, NEW.aqi_category,
+            NEW.pm25, NEW.pm10, NEW.o3, NEW.no2, NEW.co, NEW.so2,
+            NEW.source, NEW.url, NEW.created_at, CURRENT_TIMESTAMP
+        )
+        ON CONFLICT (station_key) DO UPDATE SET
+            measurement_id = EXCLUDED.measurement_id,
+            city_id = EXCLUDED.city_id,
+            city_name = EXCLUDED.city_name,
+            latitude = EXCLUDED.latitude,
+            longitude = EXCLUDED.longitude,
+            geom = EXCLUDED.geom,
+            measured_at = EXCLUDED.measured_at,
+            aqi_value = EXCLUDED.aqi_value,
+            aqi_category = EXCLUDED.aqi_category,
+            pm25 = EXCLUDED.pm25,
+            pm10 = EXCLUDED.pm10,
+            o3 = EXCLUDED.o3,
+            no2 = EXCLUDED.no2,
+            co = EXCLUDED.co,
+            so2 = EXCLUDED.so2,
+            source = EXCLUDED.source,
+            url = EXCLUDED.url,
+            created_at = EXCLUDED.created_at,
+            updated_at = CURRENT_TIMESTAMP
+        -- Only move forward in time (or refresh the row we already point at)
+        WHERE latest_aqi.measured_at < EXCLUDED.measured_at
+           OR latest_aqi.measurement_id = EXCLUDED.measurement_id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS upsert_latest_aqi ON aqi_measurements",
+    """
+    CREATE TRIGGER upsert_latest_aqi
+    AFTER INSERT OR UPDATE ON aqi_measurements
+    FOR EACH ROW EXECUTE FUNCTION upsert_latest_aqi()
+    """,
+] + [
+    # ---- Point geometry from coordinates -----------------------------------
+    # Spatial filters test geom (GIST-indexed), so it must never lag the coordinates
+    """
+    CREATE OR REPLACE FUNCTION fill_point_geom()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+           AND (NEW.geom IS NULL OR TG_OP = 'UPDATE') THEN
+            NEW.geom := ST_SetSRID(ST_MakePoint(NEW.longitude, NEW.latitude), 4326);
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+] + [
+    statement
+    for table in VERSIONED_TABLES
+    for statement in (
+        f"DROP TRIGGER IF EXISTS fill_{table}_geom ON {table}",
+        f"""
+        CREATE TRIGGER fill_{table}_geom
+        BEFORE INSERT OR UPDATE OF latitude, longitude ON {table}
+        FOR EACH ROW EXECUTE FUNCTION fill_point_geom()
+        """,
+    )
+] + [
+    # create_all builds the other GIST indexes; latest_aqi may predate it
+    "CREATE INDEX IF NOT EXISTS idx_latest_aqi_geom ON latest_aqi USING GIST (geom)",
+] + [
+    # ---- Geography indexes for ST_DWithin / <-> nearest-neighbour queries --
+    f"CREATE INDEX IF NOT EXISTS idx_{table}_geog ON {table} USING GIST (geography(geom))"
+    for table in ('cities', 'disasters', 'aqi_measurements', 'latest_aqi')
+] + [
+    # ---- Geohash cluster cell keys ----------------------------------------
+    statement
+    for table in ('disasters', 'latest_aqi')
+    for statement in (
+        f"""
+        ALTER TABLE {table} ADD COLUMN IF NOT EXISTS geohash VARCHAR(12)
+        GENERATED ALWAYS AS (ST_GeoHash(geom, 12)) STORED
+        """,
+        f"CREATE INDEX IF NOT EXISTS idx_{table}_geohash ON {table} (geohash varchar_pattern_ops)",
+    )
+]
+
+
+# ---- Latest AQI fallback ------------------------------------------------------
+LATEST_AQI_COLUMNS = """
+    station_key, measurement_id, city_id, city_name, latitude, longitude, geom,
+    measured_at, aqi_value, aqi_category, pm25, pm10, o3, no2, co, so2,
+    source, url, created_at, updated_at
+"""
+
+# Old row "o" and new row "n" of a measurement differ in its station key or time
+LATEST_AQI_TRACKED = ('city_id', 'city_name', 'latitude', 'longitude', 'measured_at')
+LATEST_AQI_CHANGED = (
+    f"({', '.join(f'n.{c}' for c in LATEST_AQI_TRACKED)}) "
+    f"IS DISTINCT FROM ({', '.join(f'o.{c}' for c in LATEST_AQI_TRACKED)})"
+)
+
+SUPPORT_DDL += [
+    # Newest measurement per station key for refresh_latest_aqi
+    """
+    CREATE INDEX IF NOT EXISTS idx_aqi_measurements_station_key
+    ON aqi_measurements (latest_aqi_station_key(city_id, city_name, latitude, longitude), measured_at DESC, id DESC)
+    """,
+    # Point the given stations at their newest remaining measurement (moving
+    # back in time if needed) and drop stations with none left
+    f"""
+    CREATE OR REPLACE FUNCTION refresh_latest_aqi(p_station_keys TEXT[])
+    RETURNS VOID AS $$
+    BEGIN
+        WITH fresh AS (
+            INSERT INTO latest_aqi ({LATEST_AQI_COLUMNS})
+            SELECT DISTINCT ON (station_key)
+                station_key, id, city_id, city_name, latitude, longitude, geom,
+                measured_at, aqi_value, aqi_category, pm25, pm10, o3, no2, co, so2,
+                source, url, created_at, CURRENT_TIMESTAMP
+            FROM (
+                SELECT latest_aqi_station_key(city_id, city_name, latitude, longitude) AS station_key, m.*
+                FROM aqi_measurements m
+            ) keyed
+            WHERE station_key = ANY(p_station_keys)
+            ORDER BY station_key, measured_at DESC, id DESC
+            ON CONFLICT (station_key) DO UPDATE SET
+                measurement_id = EXCLUDED.measurement_id,
+                city_id = EXCLUDED.city_id,
+                city_name = EXCLUDED.city_name,
+                latitude = EXCLUDED.latitude,
+                longitude = EXCLUDED.longitude,
+                geom = EXCLUDED.geom,
+                measured_at = EXCLUDED.measured_at,
+                aqi_value = EXCLUDED.aqi_value,
+                aqi_category = EXCLUDED.aqi_category,
+                pm25 = EXCLUDED.pm25,
+                pm10 = EXCLUDED.pm10,
+                o3 = EXCLUDED.o3,
+                no2 = EXCLUDED.no2,
+                co = EXCLUDED.co,
+                so2 = EXCLUDED.so2,
+                source = EXCLUDED.source,
+                url = EXCLUDED.url,
+                created_at = EXCLUDED.created_at,
+                updated_at = EXCLUDED.updated_at
+            RETURNING station_key
+        )
+        DELETE FROM latest_aqi
+        WHERE station_key = ANY(p_station_keys)
+          AND station_key NOT IN (SELECT station_key FROM fresh);
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Deleting a station's newest measurement (its latest_aqi row goes with
+    # it through the FK cascade) falls back to the previous one; moving a
+    # measurement to another station or time recomputes both stations
+    f"""
+    CREATE OR REPLACE FUNCTION latest_aqi_on_measurement_change()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM refresh_latest_aqi(ARRAY(
+                SELECT DISTINCT keyed.station_key
+                FROM (
+                    SELECT id, latest_aqi_station_key(city_id, city_name, latitude, longitude) AS station_key
+                    FROM old_rows
+                ) keyed
+                LEFT JOIN latest_aqi l ON l.station_key = keyed.station_key
+                WHERE l.station_key IS NULL OR l.measurement_id IN (SELECT id FROM old_rows)
+            ));
+        ELSE
+            PERFORM refresh_latest_aqi(ARRAY(
+                SELECT latest_aqi_station_key(o.city_id, o.city_name, o.latitude, o.longitude)
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE {LATEST_AQI_CHANGED}
+                UNION
+                SELECT latest_aqi_station_key(n.city_id, n.city_name, n.latitude, n.longitude)
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE {LATEST_AQI_CHANGED}
+            ));
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+] + [
+    statement
+    for name, event, referencing in (
+        ('latest_aqi_measurements_update', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+        ('latest_aqi_measurements_delete', 'DELETE', 'OLD TABLE AS old_rows'),
+    )
+    for statement in (
+        f"DROP TRIGGER IF EXISTS {name} ON aqi_measurements",
+        f"""
+        CREATE TRIGGER {name}
+        AFTER {event} ON aqi_measurements
+        REFERENCING {referencing}
+        FOR EACH STATEMENT EXECUTE FUNCTION latest_aqi_on_measurement_change()
+        """,
+    )
+]
+
+
+# Rows written before fill_point_geom existed; the trigger covers later writes
+MIGRATIONS += [
+    ('backfill_point_geom', [
+        f"""
+        UPDATE {table} SET geom = ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
+        WHERE geom IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+        """
+        for table in VERSIONED_TABLES
+    ]),
+]
+
+# Measurements recorded before upsert_latest_aqi existed
+MIGRATIONS += [
+    ('backfill_latest_aqi', [
+        """
+        INSERT INTO latest_aqi (
+            station_key, measurement_id, city_id, city_name, latitude, longitude, geom,
+            measured_at, aqi_value, aqi_category, pm25, pm10, o3, no2, co, so2,
+            source, url, created_at, updated_at
+        )
+        SELECT DISTINCT ON (station_key)
+            station_key, id, city_id, city_name, latitude, longitude, geom,
+            measured_at, aqi_value, aqi_category, pm25, pm10, o3, no2, co, so2,
+            source, url, created_at, CURRENT_TIMESTAMP
+        FROM (
+            SELECT latest_aqi_station_key(city_id, city_name, latitude, longitude) AS station_key, m.*
+            FROM aqi_measurements m
+        ) keyed
+        WHERE NOT EXISTS (SELECT 1 FROM latest_aqi)
+        ORDER BY station_key, measured_at DESC, id DESC
+        ON CONFLICT (station_key) DO NOTHING
+        """,
+    ]),
+]
+
+
+# data_versions.updated_at was written in the session timezone before
+# bump_data_version switched to UTC
+MIGRATIONS += [
+    ('data_versions_updated_at_utc', [
+        "UPDATE data_versions SET updated_at = timezone('utc', updated_at::timestamptz)",
+        "ALTER TABLE data_versions ALTER COLUMN updated_at SET DEFAULT timezone('utc', now())",
+    ]),
+]
+
+
+# ---- Disaster -> AQI impact --------------------------------------------------
+# Measurement alias "a" matched to disaster "d": inside the pre/post window
+# and within the impact distance (geography GIST indexes on both tables).
+# The window and distance are IMMUTABLE functions generated from Config, so
+# the planner folds them into constants
+IMPACT_MATCH = """
+    a.measured_at >= d.occurred_at - impact_pre_window()
+    AND a.measured_at <= d.occurred_at + impact_post_window()
+    AND ST_DWithin(geography(a.geom), geography(d.geom), impact_distance_m())
+    AND a.aqi_value IS NOT NULL
+"""
+
+# Per (disaster, station) aggregates over matched measurements
+IMPACT_AGGREGATES = """
+    d.id,
+    latest_aqi_station_key(a.city_id, a.city_name, a.latitude, a.longitude),
+    MIN(a.city_id),
+    MIN(a.city_name),
+    COALESCE(SUM(a.aqi_value) FILTER (WHERE a.measured_at < d.occurred_at), 0),
+    COUNT(*) FILTER (WHERE a.measured_at < d.occurred_at),
+    COALESCE(SUM(a.aqi_value) FILTER (WHERE a.measured_at >= d.occurred_at), 0),
+    COUNT(*) FILTER (WHERE a.measured_at >= d.occurred_at),
+    MAX(a.aqi_value) FILTER (WHERE a.measured_at >= d.occurred_at),
+    (ARRAY_AGG(a.measured_at ORDER BY a.aqi_value DESC, a.measured_at)
+        FILTER (WHERE a.measured_at >= d.occurred_at))[1],
+    CURRENT_TIMESTAMP
+"""
+
+IMPACT_COLUMNS = """
+    disaster_id, station_key, city_id, city_name,
+    pre_sum, pre_count, post_sum, post_count, peak_aqi, peak_at, updated_at
+"""
+
+# Old row "o" and new row "n" of a measurement differ in a column the impact
+# rows depend on (window, value, location or station key)
+IMPACT_TRACKED = ('measured_at', 'aqi_value', 'geom', 'city_id', 'city_name', 'latitude', 'longitude')
+IMPACT_CHANGED = (
+    f"({', '.join(f'n.{c}' for c in IMPACT_TRACKED)}) "
+    f"IS DISTINCT FROM ({', '.join(f'o.{c}' for c in IMPACT_TRACKED)})"
+)
+
+SUPPORT_DDL += [
+    f"""
+    CREATE OR REPLACE FUNCTION impact_pre_window()
+    RETURNS INTERVAL AS $$ SELECT interval '{Config.IMPACT_PRE_DAYS} days' $$ LANGUAGE sql IMMUTABLE
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION impact_post_window()
+    RETURNS INTERVAL AS $$ SELECT interval '{Config.IMPACT_POST_DAYS} days' $$ LANGUAGE sql IMMUTABLE
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION impact_distance_m()
+    RETURNS DOUBLE PRECISION AS $$ SELECT {Config.IMPACT_DISTANCE_KM * 1000.0}::double precision $$ LANGUAGE sql IMMUTABLE
+    """,
+    # Recompute every impact row of the given disasters. Upserting (then
+    # deleting stations that no longer match) instead of delete + insert
+    # keeps a concurrent impact_merge_measurements upsert of the same rows
+    # from failing with a unique violation
+    f"""
+    CREATE OR REPLACE FUNCTION refresh_disaster_aqi_impact(p_disaster_ids INTEGER[])
+    RETURNS VOID AS $$
+    BEGIN
+        WITH fresh AS (
+            INSERT INTO disaster_aqi_impact ({IMPACT_COLUMNS})
+            SELECT {IMPACT_AGGREGATES}
+            FROM disasters d
+            JOIN aqi_measurements a ON {IMPACT_MATCH}
+            WHERE d.id = ANY(p_disaster_ids)
+            GROUP BY 1, 2
+            ON CONFLICT (disaster_id, station_key) DO UPDATE SET
+                city_id = EXCLUDED.city_id,
+                city_name = EXCLUDED.city_name,
+                pre_sum = EXCLUDED.pre_sum,
+                pre_count = EXCLUDED.pre_count,
+                post_sum = EXCLUDED.post_sum,
+                post_count = EXCLUDED.post_count,
+                peak_aqi = EXCLUDED.peak_aqi,
+                peak_at = EXCLUDED.peak_at,
+                updated_at = EXCLUDED.updated_at
+            RETURNING disaster_id, station_key
+        )
+        DELETE FROM disaster_aqi_impact i
+        WHERE i.disaster_id = ANY(p_disaster_ids)
+          AND NOT EXISTS (
+              SELECT 1 FROM fresh f
+              WHERE f.disaster_id = i.disaster_id AND f.station_key = i.station_key
+          );
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # New or moved disasters are recomputed from the measurement history
+    """
+    CREATE OR REPLACE FUNCTION impact_on_disaster_change()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM refresh_disaster_aqi_impact(ARRAY(SELECT id FROM new_rows));
+        ELSE
+            PERFORM refresh_disaster_aqi_impact(ARRAY(
+                SELECT n.id FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE n.occurred_at IS DISTINCT FROM o.occurred_at
+                   OR n.geom IS DISTINCT FROM o.geom
+            ));
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # New measurements are merged into the running sums of every disaster
+    # whose window they fall in; the peak only moves up (earliest wins ties)
+    f"""
+    CREATE OR REPLACE FUNCTION impact_merge_measurements()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        INSERT INTO disaster_aqi_impact AS i ({IMPACT_COLUMNS})
+        SELECT {IMPACT_AGGREGATES}
+        FROM new_rows a
+        JOIN disasters d ON {IMPACT_MATCH}
+        GROUP BY 1, 2
+        ON CONFLICT (disaster_id, station_key) DO UPDATE SET
+            city_id = COALESCE(i.city_id, EXCLUDED.city_id),
+            city_name = COALESCE(i.city_name, EXCLUDED.city_name),
+            pre_sum = i.pre_sum + EXCLUDED.pre_sum,
+            pre_count = i.pre_count + EXCLUDED.pre_count,
+            post_sum = i.post_sum + EXCLUDED.post_sum,
+            post_count = i.post_count + EXCLUDED.post_count,
+            peak_at = CASE
+                WHEN EXCLUDED.peak_aqi IS NOT NULL AND (
+                    i.peak_aqi IS NULL
+                    OR EXCLUDED.peak_aqi > i.peak_aqi
+                    OR (EXCLUDED.peak_aqi = i.peak_aqi AND EXCLUDED.peak_at < i.peak_at)
+                ) THEN EXCLUDED.peak_at
+                ELSE i.peak_at
+            END,
+            peak_aqi = GREATEST(i.peak_aqi, EXCLUDED.peak_aqi),
+            updated_at = CURRENT_TIMESTAMP;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Edited or deleted measurements cannot be subtracted from a peak, so the
+    # disasters they touched are recomputed instead (updates that leave the
+    # tracked columns alone, such as data_fetched_at refreshes, change nothing)
+    f"""
+    CREATE OR REPLACE FUNCTION impact_on_measurement_change()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM refresh_disaster_aqi_impact(ARRAY(
+                SELECT DISTINCT d.id FROM old_rows a JOIN disasters d ON {IMPACT_MATCH}
+            ));
+        ELSE
+            PERFORM refresh_disaster_aqi_impact(ARRAY(
+                WITH changed AS (
+                    SELECT n.id FROM new_rows n JOIN old_rows o ON o.id = n.id
+                    WHERE {IMPACT_CHANGED}
+                )
+                SELECT d.id FROM old_rows a JOIN changed c ON c.id = a.id JOIN disasters d ON {IMPACT_MATCH}
+                UNION
+                SELECT d.id FROM new_rows a JOIN changed c ON c.id = a.id JOIN disasters d ON {IMPACT_MATCH}
+            ));
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+] + [
+    statement
+    for name, table, event, referencing, function in (
+        ('impact_disasters_insert', 'disasters', 'INSERT', 'NEW TABLE AS new_rows', 'impact_on_disaster_change'),
+        ('impact_disasters_update', 'disasters', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows', 'impact_on_disaster_change'),
+        ('impact_aqi_insert', 'aqi_measurements', 'INSERT', 'NEW TABLE AS new_rows', 'impact_merge_measurements'),
+        ('impact_aqi_update', 'aqi_measurements', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows', 'impact_on_measurement_change'),
+        ('impact_aqi_delete', 'aqi_measurements', 'DELETE', 'OLD TABLE AS old_rows', 'impact_on_measurement_change'),
+    )
+    for statement in (
+        f"DROP TRIGGER IF EXISTS {name} ON {table}",
+        f"""
+        CREATE TRIGGER {name}
+        AFTER {event} ON {table}
+        REFERENCING {referencing}
+        FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+        """,
+    )
+]
+
+# History recorded before the impact triggers existed
+MIGRATIONS += [
+    ('backfill_disaster_aqi_impact', [
+        """
+        SELECT refresh_disaster_aqi_impact(ARRAY(SELECT id FROM disasters))
+        WHERE NOT EXISTS (SELECT 1 FROM disaster_aqi_impact)
+        """,
+    ]),
+]
+
+
+# ---- Disaster facets ----------------------------------------------------------
+# Per facet combination aggregates over disaster alias "d"
+FACET_AGGREGATES = """
+    disaster_facet_key(d.disaster_type, d.severity, d.status, d.source),
+    COALESCE(d.disaster_type, ''),
+    COALESCE(d.severity, ''),
+    COALESCE(d.status, ''),
+    COALESCE(d.source, ''),
+    COUNT(*),
+    MIN(d.occurred_at),
+    MAX(d.occurred_at),
+    MIN(d.magnitude),
+    MAX(d.magnitude),
+    CURRENT_TIMESTAMP
+"""
+
+FACET_COLUMNS = """
+    facet_key, disaster_type, severity, status, source, event_count,
+    first_occurred_at, last_occurred_at, min_magnitude, max_magnitude, updated_at
+"""
+
+# Old row "o" and new row "n" differ in a column the facets depend on
+FACET_TRACKED = ('disaster_type', 'severity', 'status', 'source', 'occurred_at', 'magnitude')
+FACET_CHANGED = (
+    f"({', '.join(f'n.{c}' for c in FACET_TRACKED)}) "
+    f"IS DISTINCT FROM ({', '.join(f'o.{c}' for c in FACET_TRACKED)})"
+)
+
+SUPPORT_DDL += [
+    # Text key of a facet combination (unit separator between the parts)
+    """
+    CREATE OR REPLACE FUNCTION disaster_facet_key(
+        p_disaster_type TEXT, p_severity TEXT, p_status TEXT, p_source TEXT
+    )
+    RETURNS TEXT AS $$
+        SELECT COALESCE(p_disaster_type, '') || E'\\x1f' || COALESCE(p_severity, '') || E'\\x1f'
+            || COALESCE(p_status, '') || E'\\x1f' || COALESCE(p_source, '')
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_disasters_facet_key
+    ON disasters (disaster_facet_key(disaster_type, severity, status, source))
+    """,
+    # Serialize merges and recomputes of the same combinations until commit,
+    # so a recompute never aggregates around another transaction's pending
+    # merge and then overwrites it (keys locked in order to avoid deadlocks)
+    """
+    CREATE OR REPLACE FUNCTION lock_disaster_facets(p_keys TEXT[])
+    RETURNS VOID AS $$
+    BEGIN
+        PERFORM pg_advisory_xact_lock(hashtext('disaster_facets:' || facet_key))
+        FROM (SELECT DISTINCT facet_key FROM unnest(p_keys) AS facet_key ORDER BY facet_key) sorted;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Recompute the given facet combinations from the disasters table.
+    # Upserting (then deleting combinations with no disasters left) keeps a
+    # concurrent facets_merge_disasters upsert of the same key from failing
+    # with a unique violation
+    f"""
+    CREATE OR REPLACE FUNCTION refresh_disaster_facets(p_keys TEXT[])
+    RETURNS VOID AS $$
+    BEGIN
+        PERFORM lock_disaster_facets(p_keys);
+        WITH fresh AS (
+            INSERT INTO disaster_facets ({FACET_COLUMNS})
+            SELECT {FACET_AGGREGATES}
+            FROM disasters d
+            WHERE disaster_facet_key(d.disaster_type, d.severity, d.status, d.source) = ANY(p_keys)
+            GROUP BY 1, 2, 3, 4, 5
+            ON CONFLICT (facet_key) DO UPDATE SET
+                event_count = EXCLUDED.event_count,
+                first_occurred_at = EXCLUDED.first_occurred_at,
+                last_occurred_at = EXCLUDED.last_occurred_at,
+                min_magnitude = EXCLUDED.min_magnitude,
+                max_magnitude = EXCLUDED.max_magnitude,
+                updated_at = EXCLUDED.updated_at
+            RETURNING facet_key
+        )
+        DELETE FROM disaster_facets
+        WHERE facet_key = ANY(p_keys)
+          AND facet_key NOT IN (SELECT facet_key FROM fresh);
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # New disasters are added to the running counts and ranges
+    f"""
+    CREATE OR REPLACE FUNCTION facets_merge_disasters()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        PERFORM lock_disaster_facets(ARRAY(
+            SELECT disaster_facet_key(disaster_type, severity, status, source) FROM new_rows
+        ));
+        INSERT INTO disaster_facets AS f ({FACET_COLUMNS})
+        SELECT {FACET_AGGREGATES}
+        FROM new_rows d
+        GROUP BY 1, 2, 3, 4, 5
+        ON CONFLICT (facet_key) DO UPDATE SET
+            event_count = f.event_count + EXCLUDED.event_count,
+            first_occurred_at = LEAST(f.first_occurred_at, EXCLUDED.first_occurred_at),
+            last_occurred_at = GREATEST(f.last_occurred_at, EXCLUDED.last_occurred_at),
+            min_magnitude = LEAST(f.min_magnitude, EXCLUDED.min_magnitude),
+            max_magnitude = GREATEST(f.max_magnitude, EXCLUDED.max_magnitude),
+            updated_at = CURRENT_TIMESTAMP;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Ranges cannot be shrunk incrementally, so combinations touched by a
+    # delete or by an update of a tracked column are recomputed (ingest
+    # refreshes that only bump data_fetched_at change nothing here)
+    f"""
+    CREATE OR REPLACE FUNCTION facets_on_disaster_change()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM refresh_disaster_facets(ARRAY(
+                SELECT DISTINCT disaster_facet_key(disaster_type, severity, status, source) FROM old_rows
+            ));
+        ELSE
+            PERFORM refresh_disaster_facets(ARRAY(
+                SELECT disaster_facet_key(o.disaster_type, o.severity, o.status, o.source)
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE {FACET_CHANGED}
+                UNION
+                SELECT disaster_facet_key(n.disaster_type, n.severity, n.status, n.source)
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE {FACET_CHANGED}
+            ));
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+] + [
+    statement
+    for name, event, referencing, function in (
+        ('facets_disasters_insert', 'INSERT', 'NEW TABLE AS new_rows', 'facets_merge_disasters'),
+        ('facets_disasters_update', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows', 'facets_on_disaster_change'),
+        ('facets_disasters_delete', 'DELETE', 'OLD TABLE AS old_rows', 'facets_on_disaster_change'),
+    )
+    for statement in (
+        f"DROP TRIGGER IF EXISTS {name} ON disasters",
+        f"""
+        CREATE TRIGGER {name}
+        AFTER {event} ON disasters
+        REFERENCING {referencing}
+        FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+        """,
+    )
+]
+
+# History recorded before the facet triggers existed
+MIGRATIONS += [
+    ('backfill_disaster_facets', [
+        f"""
+        INSERT INTO disaster_facets ({FACET_COLUMNS})
+        SELECT {FACET_AGGREGATES}
+        FROM disasters d
+        WHERE NOT EXISTS (SELECT 1 FROM disaster_facets)
+        GROUP BY 1, 2, 3, 4, 5
+        """,
+    ]),
+]
+
+
+# ---- City search ----------------------------------------------------------------
+SUPPORT_DDL += [
+    # Prefix matches for typeahead
+    "CREATE INDEX IF NOT EXISTS idx_cities_name_prefix ON cities (lower(name) text_pattern_ops)",
+]
+
+# Substring and fuzzy matches on lower(name) / lower(country). pg_trgm is a
+# contrib module that may be missing, so these are installed in their own
+# transaction (install_search_indexes) rather than with SUPPORT_DDL
+SEARCH_DDL = [
+    "CREATE INDEX IF NOT EXISTS idx_cities_name_trgm ON cities USING GIN (lower(name) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_cities_country_trgm ON cities USING GIN (lower(country) gin_trgm_ops)",
+]
+
+
+# ---- GeoNames gazetteer import ------------------------------------------------
+SUPPORT_DDL += [
+    # Upsert key for import_geonames.py (NULL for hand-entered cities)
+    "ALTER TABLE cities ADD COLUMN IF NOT EXISTS geonames_id INTEGER",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_cities_geonames_id ON cities (geonames_id)",
+]
+
+
+def apply_migrations(connection):
+    """Run the migrations not yet recorded in schema_migrations"""
+    connection.exec_driver_sql(SCHEMA_MIGRATIONS_DDL)
+    applied = {name for name, in connection.exec_driver_sql("SELECT name FROM schema_migrations")}
+    for name, statements in MIGRATIONS:
+        if name in applied:
+            continue
+        for statement in statements:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+
+
+def install_support_ddl(session):
+    """Create or replace all support objects and apply pending migrations in a single transaction"""
+    connection = session.connection()
+    # Serialize concurrent startups (API and worker processes) replacing triggers
+    connection.exec_driver_sql("SELECT pg_advisory_xact_lock(hashtext('the_world_support_ddl'))")
+    for statement in SUPPORT_DDL:
+        # exec_driver_sql so plpgsql bodies are not parsed for bind parameters
+        connection.exec_driver_sql(statement)
+    apply_migrations(connection)
+    session.commit()
+
+
+def install_search_indexes(session):
+    """Create the pg_trgm city search indexes in their own transaction"""
+    connection = session.connection()
+    for statement in SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+    session.commit()
@@ -5,5 +5,6 @@ External API service integrations
 
 from app.services.disaster_api import disaster_api_service
 from app.services.aqi_api import aqi_service
+from app.services.conversation_store import conversation_store
 
-__all__ = ['disaster_api_service', 'aqi_service']
+__all__ = ['disaster_api_service', 'aqi_service', 'conversation_store']
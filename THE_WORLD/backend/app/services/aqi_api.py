@@ -3,11 +3,11 @@ THE_WORLD - AQI API Service
 Fetch AQI data from multiple external APIs
 """
 
-import requests
 from datetime import datetime
 from app.database import db
 from app.models import AQIMeasurement, City
 from app.config import Config
+from app.services.upstream import upstream_client, CircuitOpenError
 import logging
 
 logger = logging.getLogger(__name__)
@@ -58,10 +58,7 @@ class AQIService:
             # Remove None headers
             headers = {k: v for k, v in headers.items() if v is not None}
             
-            response = requests.get(url, headers=headers, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = upstream_client.get_json('openaq', url, params=params, headers=headers)
             
             if 'results' in data:
                 for result in data['results']:
@@ -153,48 +150,45 @@ class AQIService:
                         'appid': Config.OPENWEATHER_API_KEY
                     }
                     
-                    response = requests.get(url, params=params, timeout=30)
+                    data = upstream_client.get_json('openweather', url, params=params)
                     
-                    if response.status_code == 200:
-                        data = response.json()
+                    if 'list' in data and len(data['list']) > 0:
+                        air_data = data['list'][0]
+                        components = air_data.get('components', {})
+                        main = air_data.get('main', {})
+                        dt = air_data.get('dt', 0)
                         
-                        if 'list' in data and len(data['list']) > 0:
-                            air_data = data['list'][0]
-                            components = air_data.get('components', {})
-                            main = air_data.get('main', {})
-                            dt = air_data.get('dt', 0)
-                            
-                            # OpenWeather provides AQI (1-5 scale), convert to 0-500
-                            aqi_ow = main.get('aqi', 1)  # 1=good, 5=hazardous
-                            aqi_value = self._convert_openweather_aqi(aqi_ow)
-                            
-                            measurement = {
-                                'city_name': city.get('name', 'Unknown'),
-                                'latitude': city.get('lat') or city['latitude'],
-                                'longitude': city.get('lon') or city['longitude'],
-                                'measured_at': datetime.fromtimestamp(dt),
-                                'aqi_value': aqi_value,
-                                'pm25': components.get('pm2_5'),
-                                'pm10': components.get('pm10'),
-                                'o3': components.get('o3'),
-                                'no2': components.get('no2'),
-                                'co': components.get('co') / 1000 if components.get('co') else None,  # Convert to ppm
-                                'so2': components.get('so2'),
-                                'source': 'OpenWeather',
-                                'source_id': f"{city.get('name', '')}_{dt}",
-                                'data_fetched_at': datetime.utcnow()
-                            }
-                            
-                            # Try to match with city in database
-                            city_db = City.query.filter_by(name=measurement['city_name']).first()
-                            if city_db:
-                                measurement['city_id'] = city_db.id
-                            
-                            measurements.append(measurement)
-                    
-                    # Small delay to respect rate limits
-                    import time
-                    time.sleep(0.2)
+                        # OpenWeather provides AQI (1-5 scale), convert to 0-500
+                        aqi_ow = main.get('aqi', 1)  # 1=good, 5=hazardous
+                        aqi_value = self._convert_openweather_aqi(aqi_ow)
+                        
+                        measurement = {
+                            'city_name': city.get('name', 'Unknown'),
+                            'latitude': city.get('lat') or city['latitude'],
+                            'longitude': city.get('lon') or city['longitude'],
+                            'measured_at': datetime.fromtimestamp(dt),
+                            'aqi_value': aqi_value,
+                            'pm25': components.get('pm2_5'),
+                            'pm10': components.get('pm10'),
+                            'o3': components.get('o3'),
+                            'no2': components.get('no2'),
+                            'co': components.get('co') / 1000 if components.get('co') else None,  # Convert to ppm
+                            'so2': components.get('so2'),
+                            'source': 'OpenWeather',
+                            'source_id': f"{city.get('name', '')}_{dt}",
+                            'data_fetched_at': datetime.utcnow()
+                        }
+                        
+                        # Try to match with city in database
+                        city_db = City.query.filter_by(name=measurement['city_name']).first()
+                        if city_db:
+                            measurement['city_id'] = city_db.id
+                        
+                        measurements.append(measurement)
+                
+                except CircuitOpenError as e:
+                    logger.warning(f"Skipping OpenWeather for {city.get('name', 'city')}: {e}")
+                    continue
                 
                 except Exception as e:
                     logger.error(f"Error fetching OpenWeather data for {city.get('name', 'city')}: {e}")
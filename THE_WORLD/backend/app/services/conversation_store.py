@@ -0,0 +1,224 @@
+"""
+THE_WORLD - Conversation Store Service
+Bounded chatbot conversation history: an in-process LRU/TTL store for single
+process setups and a Postgres store shared by all API workers
+"""
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from app.config import Config
+from app.database import db
+from app.models import ChatMessage
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Newest messages of a conversation, unless its last message is older than the TTL
+HISTORY_SQL = """
+    SELECT role, content FROM (
+        SELECT id, role, content, max(created_at) OVER () AS last_at
+        FROM chat_messages
+        WHERE conversation_id = :conversation_id
+        ORDER BY id DESC
+        LIMIT :limit
+    ) recent
+    WHERE last_at > CURRENT_TIMESTAMP - make_interval(secs => :ttl)
+    ORDER BY id
+"""
+
+# Keep the newest messages within the per-conversation message and size caps
+TRIM_SQL = """
+    DELETE FROM chat_messages WHERE id IN (
+        SELECT id FROM (
+            SELECT id,
+                   row_number() OVER newest AS position,
+                   sum(length(content)) OVER newest AS chars
+            FROM chat_messages
+            WHERE conversation_id = :conversation_id
+            WINDOW newest AS (ORDER BY id DESC)
+        ) ranked
+        WHERE position > :max_messages OR chars > :max_chars
+    )
+"""
+
+# Drop idle conversations and the least recently active ones beyond the cap
+PURGE_SQL = """
+    DELETE FROM chat_messages WHERE conversation_id IN (
+        SELECT conversation_id FROM (
+            SELECT conversation_id,
+                   max(created_at) AS last_at,
+                   row_number() OVER (ORDER BY max(id) DESC) AS recency
+            FROM chat_messages
+            GROUP BY conversation_id
+        ) conversations
+        WHERE last_at < CURRENT_TIMESTAMP - make_interval(secs => :ttl)
+           OR recency > :max_conversations
+    )
+"""
+
+
+def make_message(role, content):
+    """Chat message with its content capped at CHATBOT_MAX_MESSAGE_CHARS"""
+    return {'role': role, 'content': (content or '')[:Config.CHATBOT_MAX_MESSAGE_CHARS]}
+
+
+def trim_messages(messages, max_messages, max_chars):
+    """Newest messages that fit both per-conversation caps, oldest first"""
+    kept = []
+    chars = 0
+    for message in reversed(messages[-max_messages:]):
+        chars += len(message['content'])
+        if chars > max_chars:
+            break
+        kept.append(message)
+    kept.reverse()
+    return kept
+
+
+class ConversationStore(ABC):
+    """Interface shared by the conversation stores"""
+
+    def __init__(self, max_messages=None, max_chars=None, max_conversations=None, ttl=None):
+        self.max_messages = max_messages or Config.CHATBOT_MAX_MESSAGES
+        self.max_chars = max_chars or Config.CHATBOT_MAX_CONVERSATION_CHARS
+        self.max_conversations = max_conversations or Config.CHATBOT_MAX_CONVERSATIONS
+        self.ttl = ttl or Config.CHATBOT_CONVERSATION_TTL
+        self._last_purge = time.monotonic()
+        self._purge_lock = threading.Lock()
+
+    @abstractmethod
+    def get_history(self, conversation_id, limit=None):
+        """Last ``limit`` messages of a conversation, oldest first"""
+
+    @abstractmethod
+    def append(self, conversation_id, messages):
+        """Add messages to a conversation, trimming it to the caps"""
+
+    @abstractmethod
+    def clear(self, conversation_id):
+        """Forget a conversation"""
+
+    @abstractmethod
+    def purge(self):
+        """Drop expired conversations"""
+
+    def _maybe_purge(self):
+        """Run purge() at most once per CHATBOT_PURGE_INTERVAL in this process"""
+        with self._purge_lock:
+            if time.monotonic() - self._last_purge < Config.CHATBOT_PURGE_INTERVAL:
+                return
+            self._last_purge = time.monotonic()
+        try:
+            self.purge()
+        except Exception as e:
+            logger.warning(f"Conversation purge failed: {e}")
+
+
+class MemoryConversationStore(ConversationStore):
+    """Per-process store: LRU over conversations, each expiring after the TTL.
+
+    Memory is bounded by max_conversations * max_chars; history is not
+    shared between workers.
+    """
+
+    def __init__(self, **caps):
+        super().__init__(**caps)
+        self._conversations = TTLCache(maxsize=self.max_conversations, ttl=self.ttl)
+        self._lock = threading.Lock()
+
+    def get_history(self, conversation_id, limit=None):
+        messages = self._conversations.get(conversation_id, ())
+        limit = limit or Config.CHATBOT_HISTORY_MESSAGES
+        return [dict(message) for message in messages[-limit:]]
+
+    def append(self, conversation_id, messages):
+        with self._lock:
+            current = list(self._conversations.get(conversation_id, ()))
+            current.extend(make_message(m['role'], m['content']) for m in messages)
+            # set() refreshes the TTL, so it counts from the last message
+            self._conversations.set(conversation_id, tuple(trim_messages(current, self.max_messages, self.max_chars)))
+        self._maybe_purge()
+
+    def clear(self, conversation_id):
+        self._conversations.delete(conversation_id)
+
+    def purge(self):
+        return self._conversations.expire()
+
+
+class PostgresConversationStore(ConversationStore):
+    """Store backed by the chat_messages table, consistent across workers"""
+
+    def get_history(self, conversation_id, limit=None):
+        try:
+            rows = db.session.execute(db.text(HISTORY_SQL), {
+                'conversation_id': conversation_id,
+                'limit': limit or Config.CHATBOT_HISTORY_MESSAGES,
+                'ttl': self.ttl
+            }).all()
+            # End the read transaction so the connection is not held
+            # idle-in-transaction while the model call is in flight
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return [{'role': role, 'content': content} for role, content in rows]
+
+    def append(self, conversation_id, messages):
+        try:
+            db.session.add_all(
+                ChatMessage(conversation_id=conversation_id, **make_message(m['role'], m['content']))
+                for m in messages
+            )
+            db.session.flush()
+            db.session.execute(db.text(TRIM_SQL), {
+                'conversation_id': conversation_id,
+                'max_messages': self.max_messages,
+                'max_chars': self.max_chars
+            })
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self._maybe_purge()
+
+    def clear(self, conversation_id):
+        try:
+            ChatMessage.query.filter_by(conversation_id=conversation_id).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def purge(self):
+        try:
+            deleted = db.session.execute(db.text(PURGE_SQL), {
+                'ttl': self.ttl,
+                'max_conversations': self.max_conversations
+            }).rowcount
+            db.session.commit()
+            return deleted
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+STORES = {
+    'memory': MemoryConversationStore,
+    'postgres': PostgresConversationStore
+}
+
+
+def create_conversation_store(kind=None):
+    """Conversation store selected by CHATBOT_STORE"""
+    kind = kind or Config.CHATBOT_STORE
+    if kind not in STORES:
+        raise ValueError(f"Unknown CHATBOT_STORE '{kind}'. Available: {', '.join(STORES)}")
+    return STORES[kind]()
+
+
+# Singleton instance
+conversation_store = create_conversation_store()
@@ -3,12 +3,13 @@ THE_WORLD - Disaster API Service
 Fetch disaster data from multiple external APIs
 """
 
-import requests
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from app.database import db
 from app.models import Disaster
 from app.config import Config
+from app.services.upstream import upstream_client
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -56,7 +57,10 @@ class DisasterAPIService:
         
         try:
             # USGS Earthquake API - last N days
-            end_time = datetime.utcnow()
+            # Align the window to the cache TTL so repeated fetches share a cache key
+            ttl = Config.UPSTREAM_CACHE_TTLS['usgs']
+            now = time.time()
+            end_time = datetime.fromtimestamp(int(now - now % ttl), timezone.utc)
             start_time = end_time - timedelta(days=days)
             
             url = "https://earthquake.usgs.gov/fdsnws/event/1/query"
@@ -68,10 +72,7 @@ class DisasterAPIService:
                 'orderby': 'time'
             }
             
-            response = requests.get(url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = upstream_client.get_json('usgs', url, params=params)
             
             if 'features' in data:
                 for feature in data['features']:
@@ -139,29 +140,27 @@ class DisasterAPIService:
                 'exclude': 'current,minutely,hourly'
             }
             
-            response = requests.get(url, params=params, timeout=30)
+            # Alerts change faster than air pollution readings, so use the shorter default TTL
+            data = upstream_client.get_json('openweather', url, params=params, ttl=Config.UPSTREAM_DEFAULT_TTL)
             
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Check for alerts
-                alerts = data.get('alerts', [])
-                for alert in alerts:
-                    disaster = {
-                        'disaster_type': self._map_alert_to_disaster_type(alert.get('event', '')),
-                        'title': alert.get('event', 'Weather Alert'),
-                        'description': alert.get('description', ''),
-                        'latitude': lat,
-                        'longitude': lon,
-                        'occurred_at': datetime.fromtimestamp(alert.get('start', 0)),
-                        'severity': 'medium',
-                        'status': 'active',
-                        'source': 'OpenWeather',
-                        'source_id': f"{alert.get('sender_name', '')}_{alert.get('start', 0)}",
-                        'data_fetched_at': datetime.utcnow()
-                    }
-                    disasters.append(disaster)
-        
+            # Check for alerts
+            alerts = data.get('alerts', [])
+            for alert in alerts:
+                disaster = {
+                    'disaster_type': self._map_alert_to_disaster_type(alert.get('event', '')),
+                    'title': alert.get('event', 'Weather Alert'),
+                    'description': alert.get('description', ''),
+                    'latitude': lat,
+                    'longitude': lon,
+                    'occurred_at': datetime.fromtimestamp(alert.get('start', 0)),
+                    'severity': 'medium',
+                    'status': 'active',
+                    'source': 'OpenWeather',
+                    'source_id': f"{alert.get('sender_name', '')}_{alert.get('start', 0)}",
+                    'data_fetched_at': datetime.utcnow()
+                }
+                disasters.append(disaster)
+    
         except Exception as e:
             logger.error(f"OpenWeather API error: {e}")
         
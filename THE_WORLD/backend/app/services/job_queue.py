@@ -0,0 +1,231 @@
+"""
+THE_WORLD - Job Queue Service
+Postgres-backed background job queue (FOR UPDATE SKIP LOCKED, no external broker)
+"""
+
+import threading
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import func, update, case
+from app.database import db
+from app.models import FetchJob
+from app.config import Config
+from app.services.disaster_api import disaster_api_service
+from app.services.aqi_api import aqi_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def run_disaster_fetch(params, report):
+    """Fetch disasters from all sources and save them"""
+    report(stage='fetching')
+    disasters_data = disaster_api_service.fetch_all_disasters(days=params.get('days', 7))
+    report(stage='saving', fetched=len(disasters_data))
+    return disaster_api_service.save_disasters_to_db(disasters_data)
+
+
+def run_aqi_fetch(params, report):
+    """Fetch AQI measurements from all sources and save them"""
+    report(stage='fetching')
+    aqi_data = aqi_service.fetch_all_aqi(cities=params.get('cities'), limit=params.get('limit', 50))
+    report(stage='saving', fetched=len(aqi_data))
+    return aqi_service.save_measurements_to_db(aqi_data)
+
+
+class JobQueue:
+    """Enqueue, claim and complete fetch jobs stored in the fetch_jobs table"""
+
+    def __init__(self):
+        self.handlers = {
+            'disasters': run_disaster_fetch,
+            'aqi': run_aqi_fetch
+        }
+
+    def enqueue(self, job_type, params=None):
+        """Queue a job, reusing an identical queued or running job if there is one"""
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        params = params or {}
+
+        # Same lock as claim(), so two requests cannot both miss and insert
+        self._lock_type(job_type)
+        existing = FetchJob.query.filter(
+            FetchJob.job_type == job_type,
+            FetchJob.status.in_([FetchJob.QUEUED, FetchJob.RUNNING]),
+            FetchJob.params == params
+        ).order_by(FetchJob.id).first()
+        if existing:
+            db.session.commit()  # Releases the advisory lock
+            return existing
+
+        job = FetchJob(job_type=job_type, params=params, max_attempts=Config.JOB_MAX_ATTEMPTS)
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    def get(self, job_id):
+        return db.session.get(FetchJob, job_id)
+
+    def _lock_type(self, job_type):
+        """Serialize queue changes for one job type until the transaction ends"""
+        db.session.execute(
+            db.text("SELECT pg_advisory_xact_lock(hashtext('fetch_jobs:' || :job_type))"),
+            {'job_type': job_type}
+        )
+
+    def claim(self, worker_id, job_types=None):
+        """Atomically claim the oldest runnable job, or return None.
+
+        Concurrent workers skip rows another worker has locked instead of
+        blocking on them. Claims of one job type are serialized with a
+        transaction-level advisory lock, so the running count checked against
+        the type's concurrency limit includes every other worker's claims.
+        """
+        job_types = list(job_types or self.handlers)
+        # Types with runnable jobs, oldest first
+        ready = db.session.execute(db.text("""
+            SELECT job_type FROM fetch_jobs
+            WHERE status = 'queued' AND run_after <= now() AND job_type = ANY(:job_types)
+            GROUP BY job_type
+            ORDER BY min(run_after)
+        """), {'job_types': job_types}).scalars().all()
+        db.session.commit()
+
+        for job_type in ready:
+            self._lock_type(job_type)
+            # A new statement after the lock sees every claim committed before it
+            row = db.session.execute(db.text("""
+                UPDATE fetch_jobs
+                SET status = 'running',
+                    attempts = attempts + 1,
+                    worker_id = :worker_id,
+                    started_at = now(),
+                    heartbeat_at = now(),
+                    progress = NULL,
+                    error = NULL
+                WHERE id = (
+                    SELECT j.id FROM fetch_jobs j
+                    WHERE j.status = 'queued'
+                      AND j.run_after <= now()
+                      AND j.job_type = :job_type
+                      AND (
+                          SELECT count(*) FROM fetch_jobs r
+                          WHERE r.status = 'running' AND r.job_type = :job_type
+                      ) < :limit
+                    ORDER BY j.run_after, j.id
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING id
+            """), {
+                'worker_id': worker_id,
+                'job_type': job_type,
+                'limit': Config.JOB_TYPE_CONCURRENCY.get(job_type, Config.JOB_WORKER_CONCURRENCY)
+            }).first()
+            db.session.commit()  # Releases the advisory lock
+            if row:
+                return self.get(row[0])
+        return None
+
+    def _update_claim(self, claim, **values):
+        """Update a job only while this claim still owns it; False if it was lost.
+
+        A claim is (job id, worker id, attempt). requeue_stale() may hand a
+        slow job to another worker, after which the old run must not touch it.
+        """
+        job_id, worker_id, attempt = claim
+        result = db.session.execute(
+            update(FetchJob)
+            .where(
+                FetchJob.id == job_id,
+                FetchJob.status == FetchJob.RUNNING,
+                FetchJob.worker_id == worker_id,
+                FetchJob.attempts == attempt
+            )
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _heartbeat(self, app, claim, stop):
+        """Keep a running job's heartbeat fresh until stop is set"""
+        with app.app_context():  # Own session, separate from the handler's
+            while not stop.wait(Config.JOB_HEARTBEAT_INTERVAL):
+                try:
+                    if not self._update_claim(claim, heartbeat_at=func.now()):
+                        logger.warning(f"Job {claim[0]} was reclaimed while running")
+                        return
+                except Exception as e:
+                    db.session.rollback()
+                    logger.warning(f"Heartbeat for job {claim[0]} failed: {e}")
+
+    def run(self, job, worker_id):
+        """Execute a job claimed by worker_id and record its outcome"""
+        job_id, job_type = job.id, job.job_type
+        handler = self.handlers[job_type]
+        claim = (job_id, worker_id, job.attempts)
+
+        def report(**progress):
+            self._update_claim(claim, progress=progress, heartbeat_at=func.now())
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat,
+            args=(current_app._get_current_object(), claim, stop),
+            name=f"heartbeat-{job_id}",
+            daemon=True
+        )
+        heartbeat.start()
+        error = None
+        try:
+            result = handler(job.params or {}, report)
+        except Exception as e:
+            logger.error(f"Job {job_id} ({job_type}) failed: {e}", exc_info=True)
+            db.session.rollback()
+            error = e
+        finally:
+            # Stopped first, so a late beat cannot mistake our own update for a lost claim
+            stop.set()
+            heartbeat.join()
+
+        if error is not None:
+            retry = FetchJob.attempts < FetchJob.max_attempts
+            outcome = self._update_claim(
+                claim,
+                error=str(error),
+                status=case((retry, FetchJob.QUEUED), else_=FetchJob.FAILED),
+                run_after=case(
+                    (retry, func.now() + timedelta(seconds=Config.JOB_RETRY_DELAY) * FetchJob.attempts),
+                    else_=FetchJob.run_after
+                ),
+                finished_at=case((retry, None), else_=func.now())
+            )
+        else:
+            outcome = self._update_claim(
+                claim, status=FetchJob.SUCCEEDED, result=result, finished_at=func.now()
+            )
+            if outcome:
+                logger.info(f"Job {job_id} ({job_type}) succeeded: {result}")
+
+        if not outcome:
+            logger.warning(f"Job {job_id} was reclaimed; outcome of this run discarded")
+        return self.get(job_id)
+
+    def requeue_stale(self):
+        """Return jobs whose worker stopped heartbeating to the queue (or fail them)"""
+        result = db.session.execute(db.text("""
+            UPDATE fetch_jobs
+            SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+                finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE now() END,
+                error = 'Worker stopped responding'
+            WHERE status = 'running'
+              AND heartbeat_at < now() - make_interval(secs => :timeout)
+        """), {'timeout': Config.JOB_STALE_TIMEOUT})
+        db.session.commit()
+        return result.rowcount
+
+
+# Singleton instance
+job_queue = JobQueue()
@@ -0,0 +1,235 @@
+"""
+THE_WORLD - Upstream HTTP Client
+Cached, circuit-broken access to external data APIs
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from app.config import Config
+from app.utils.cache import TTLCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that carry credentials and must not end up in cache keys
+SECRET_PARAMS = {'appid', 'api_key', 'apikey', 'key'}
+
+
+class CircuitOpenError(Exception):
+    """Raised when an upstream is failing and no cached payload is available"""
+
+    def __init__(self, source, retry_in):
+        self.source = source
+        self.retry_in = retry_in
+        super().__init__(f"{source} circuit is open, retry in {retry_in:.0f}s")
+
+
+class CircuitBreaker:
+    """Per-upstream circuit breaker (closed -> open -> half-open -> closed)"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def retry_in(self):
+        """Seconds until the breaker lets a probe request through"""
+        if self.opened_at is None:
+            return 0
+        return max(0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow_request(self):
+        """Whether a call may go to the upstream right now"""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                # Let exactly one probe through to test recovery
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"Upstream {self.name} recovered, closing circuit")
+            self.failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Upstream {self.name} failed {self.failures} times, opening circuit")
+                self.opened_at = time.monotonic()
+
+    def to_dict(self):
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'retry_in': round(self.retry_in(), 1)
+        }
+
+
+class UpstreamClient:
+    """HTTP client with a keyed response cache, stale-while-revalidate and circuit breakers.
+
+    - Fresh cache hits (age <= source TTL) never touch the network.
+    - Stale hits within the revalidate window are served immediately while a
+      bounded background pool refreshes the entry.
+    - When an upstream fails or its circuit is open, the last good payload is
+      served (up to ``UPSTREAM_MAX_STALE`` seconds old) instead of waiting on
+      timeouts; with nothing cached the call fails fast.
+    """
+
+    def __init__(self):
+        self.ttls = Config.UPSTREAM_CACHE_TTLS
+        self.default_ttl = Config.UPSTREAM_DEFAULT_TTL
+        self.revalidate_window = Config.UPSTREAM_STALE_WHILE_REVALIDATE
+        self.min_intervals = Config.UPSTREAM_MIN_INTERVALS
+        self.timeout = Config.UPSTREAM_TIMEOUT
+        self.cache = TTLCache(
+            maxsize=Config.UPSTREAM_CACHE_SIZE,
+            ttl=self.default_ttl,
+            max_stale=Config.UPSTREAM_MAX_STALE
+        )
+        self.breakers = {}
+        self._session = requests.Session()
+        self._refresh_pool = ThreadPoolExecutor(
+            max_workers=Config.UPSTREAM_REFRESH_WORKERS,
+            thread_name_prefix='upstream-refresh'
+        )
+        self._refreshing = set()
+        self._last_call = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, source):
+        """Get (or create) the circuit breaker for a source"""
+        with self._lock:
+            if source not in self.breakers:
+                self.breakers[source] = CircuitBreaker(
+                    source,
+                    failure_threshold=Config.UPSTREAM_CIRCUIT_FAILURE_THRESHOLD,
+                    reset_timeout=Config.UPSTREAM_CIRCUIT_RESET_TIMEOUT
+                )
+            return self.breakers[source]
+
+    def get_json(self, source, url, params=None, headers=None, ttl=None):
+        """GET a JSON document from an upstream, going through cache and breaker"""
+        params = params or {}
+        ttl = self.ttls.get(source, self.default_ttl) if ttl is None else ttl
+        key = self._cache_key(source, url, params)
+
+        entry = self.cache.get_entry(key)
+        if entry:
+            payload, age, fresh = entry
+            if fresh:
+                return payload
+            if age <= ttl + self.revalidate_window:
+                self._schedule_refresh(source, key, url, params, headers, ttl)
+                return payload
+
+        breaker = self.breaker(source)
+        if not breaker.allow_request():
+            if entry:
+                logger.info(f"{source} circuit open, serving cached payload ({entry[1]:.0f}s old)")
+                return entry[0]
+            raise CircuitOpenError(source, breaker.retry_in())
+
+        try:
+            return self._fetch(source, key, url, params, headers, ttl)
+        except requests.RequestException:
+            if entry:
+                logger.warning(f"{source} request failed, serving cached payload ({entry[1]:.0f}s old)")
+                return entry[0]
+            raise
+
+    def status(self):
+        """Breaker state and cache size, for health reporting"""
+        return {
+            'cached_responses': len(self.cache),
+            'circuits': {name: b.to_dict() for name, b in self.breakers.items()}
+        }
+
+    def _fetch(self, source, key, url, params, headers, ttl):
+        breaker = self.breaker(source)
+        self._respect_min_interval(source)
+        try:
+            response = self._session.get(url, params=params, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+            payload = response.json()
+        except requests.RequestException as e:
+            # Client errors (bad key, bad params) say nothing about upstream health
+            status_code = getattr(e.response, 'status_code', None)
+            if status_code is None or status_code >= 500 or status_code == 429:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        self.cache.set(key, payload, ttl=ttl)
+        return payload
+
+    def _schedule_refresh(self, source, key, url, params, headers, ttl):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                if self.breaker(source).allow_request():
+                    self._fetch(source, key, url, params, headers, ttl)
+            except Exception as e:
+                logger.warning(f"Background refresh of {source} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresh_pool.submit(refresh)
+
+    def _respect_min_interval(self, source):
+        """Space out real network calls to rate-limited sources"""
+        interval = self.min_intervals.get(source)
+        if not interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._last_call.get(source, 0) + interval - now
+            self._last_call[source] = now + max(0, wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    @staticmethod
+    def _cache_key(source, url, params):
+        items = tuple(sorted(
+            (k, str(v)) for k, v in params.items() if k.lower() not in SECRET_PARAMS
+        ))
+        return (source, url, items)
+
+
+# Singleton instance
+upstream_client = UpstreamClient()
@@ -0,0 +1,241 @@
+"""
+THE_WORLD - Correlation Analytics
+Lagged cross-correlation between hourly AQI and nearby disaster intensity
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import text
+
+from app.database import db
+from app.config import Config
+from app.models import DataVersion
+from app.utils.cache import TTLCache
+from app.utils.filters import FilterError, parse_utc_datetime
+
+HOUR = timedelta(hours=1)
+INTENSITY_WEIGHTS = ('count', 'magnitude')
+
+# Keyed by parameters and data versions, so an ingest invalidates results
+_analytics_cache = TTLCache(maxsize=Config.ANALYTICS_CACHE_SIZE, ttl=Config.ANALYTICS_CACHE_TTL)
+
+AQI_HOURLY_SQL = text("""
+    SELECT c.id AS city_id, c.name AS city_name,
+           date_trunc('hour', a.measured_at) AS hour, AVG(a.aqi_value) AS aqi
+    FROM cities c
+    JOIN aqi_measurements a ON a.city_id = c.id
+    WHERE c.id = ANY(:city_ids)
+      AND a.measured_at >= :start AND a.measured_at < :end
+      AND a.aqi_value IS NOT NULL
+    GROUP BY 1, 2, 3
+""")
+
+# Disasters near each city (its region), bucketed by hour
+DISASTER_HOURLY_SQL = text("""
+    SELECT c.id AS city_id, date_trunc('hour', d.occurred_at) AS hour,
+           SUM(CASE WHEN :weight = 'magnitude' THEN COALESCE(d.magnitude, 1) ELSE 1 END) AS intensity,
+           COUNT(*) AS events
+    FROM cities c
+    JOIN disasters d
+      ON d.occurred_at >= :start AND d.occurred_at < :end
+     AND ST_DWithin(geography(d.geom), geography(c.geom), :distance_m)
+    WHERE c.id = ANY(:city_ids)
+      AND (CAST(:disaster_type AS TEXT) IS NULL OR d.disaster_type = :disaster_type)
+    GROUP BY 1, 2
+""")
+
+
+def parse_lagged_args(args):
+    """Validate and normalize the lagged correlation parameters"""
+    city_ids = args.get('city_ids')
+    if not city_ids:
+        raise FilterError('Missing city_ids', 'city_ids parameter is required')
+    try:
+        ids = sorted({int(x.strip()) for x in city_ids.split(',')})
+    except ValueError:
+        raise FilterError('Invalid city_ids', 'city_ids must be comma-separated integers')
+    if len(ids) > Config.ANALYTICS_MAX_CITIES:
+        raise FilterError('Too many cities', f'At most {Config.ANALYTICS_MAX_CITIES} cities per request')
+
+    end_date = args.get('end_date')
+    end = parse_utc_datetime(end_date) if end_date else datetime.utcnow()
+    end = end.replace(minute=0, second=0, microsecond=0)
+    start_date = args.get('start_date')
+    start = parse_utc_datetime(start_date) if start_date else end - timedelta(days=30)
+    start = start.replace(minute=0, second=0, microsecond=0)
+    hours = int((end - start) / HOUR)
+    if not 0 < hours <= Config.ANALYTICS_MAX_HOURS:
+        raise FilterError('Invalid window', f'The window must span 1 to {Config.ANALYTICS_MAX_HOURS} hours')
+
+    max_lag = args.get('max_lag_hours', 72, type=int)
+    if not 0 <= max_lag <= min(Config.ANALYTICS_MAX_LAG_HOURS, hours // 4):
+        raise FilterError('Invalid max_lag_hours', 'max_lag_hours must be between 0 and a quarter of the window')
+
+    bootstrap = args.get('bootstrap', Config.ANALYTICS_DEFAULT_BOOTSTRAP, type=int)
+    if not 0 <= bootstrap <= Config.ANALYTICS_MAX_BOOTSTRAP:
+        raise FilterError('Invalid bootstrap', f'bootstrap must be between 0 and {Config.ANALYTICS_MAX_BOOTSTRAP}')
+
+    weight = args.get('weight', 'count')
+    if weight not in INTENSITY_WEIGHTS:
+        raise FilterError('Invalid weight', f"weight must be one of: {', '.join(INTENSITY_WEIGHTS)}")
+
+    distance_km = args.get('distance_km', 300, type=float)
+    if not 0 < distance_km <= Config.NEAR_MAX_RADIUS_KM:
+        raise FilterError('Invalid distance_km', f'distance_km must be between 0 and {Config.NEAR_MAX_RADIUS_KM}')
+
+    return {
+        'city_ids': ids,
+        'start': start,
+        'end': end,
+        'max_lag': max_lag,
+        'bootstrap': bootstrap,
+        'weight': weight,
+        'distance_km': distance_km,
+        'disaster_type': args.get('disaster_type') or None
+    }
+
+
+def _load_series(params):
+    """Hourly AQI (NaN where missing) and disaster intensity as city x hour arrays"""
+    hours = int((params['end'] - params['start']) / HOUR)
+    index = {city_id: row for row, city_id in enumerate(params['city_ids'])}
+    aqi = np.full((len(index), hours), np.nan)
+    intensity = np.zeros((len(index), hours))
+    events = np.zeros(len(index), dtype=np.int64)
+    names = {}
+
+    bind = {
+        'city_ids': params['city_ids'],
+        'start': params['start'],
+        'end': params['end'],
+        'weight': params['weight'],
+        'distance_m': params['distance_km'] * 1000.0,
+        'disaster_type': params['disaster_type']
+    }
+    for city_id, city_name, hour, value in db.session.execute(AQI_HOURLY_SQL, bind):
+        names[city_id] = city_name
+        aqi[index[city_id], int((hour - params['start']) / HOUR)] = float(value)
+    for city_id, hour, value, count in db.session.execute(DISASTER_HOURLY_SQL, bind):
+        intensity[index[city_id], int((hour - params['start']) / HOUR)] = float(value)
+        events[index[city_id]] += count
+    return aqi, intensity, events, names
+
+
+def _interpolate_gaps(aqi):
+    """Linearly fill missing hours per city; returns the filled array and observed counts"""
+    observed = np.sum(~np.isnan(aqi), axis=1)
+    filled = aqi.copy()
+    positions = np.arange(aqi.shape[1])
+    for row in np.flatnonzero(observed >= 2):
+        mask = np.isnan(filled[row])
+        filled[row, mask] = np.interp(positions[mask], positions[~mask], filled[row, ~mask])
+    return filled, observed
+
+
+def _zscore(values):
+    std = values.std(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (values - values.mean(axis=1, keepdims=True)) / std, std[:, 0] > 0
+
+
+def lagged_cross_correlation(aqi, intensity, max_lag, bootstrap, seed):
+    """Cross-correlation of intensity leading AQI for lags 0..max_lag, for all cities at once.
+
+    Uses circular cross-correlation via FFT: ``xc[c, k]`` is the correlation
+    of intensity at hour t with AQI at hour t + k. Significance comes from a
+    circular-shift bootstrap: shifting the intensity series by s rolls xc by
+    s, so every resample's best |r| over the lag range is a gather from xc
+    rather than a new correlation. The null maxima are accumulated one lag
+    at a time, so memory stays O(cities x bootstrap) whatever max_lag is.
+    Returns (r, p_values), r shaped (cities, max_lag + 1), p_values None
+    when bootstrap is 0.
+    """
+    hours = aqi.shape[1]
+    za, _ = _zscore(aqi)
+    zi, _ = _zscore(intensity)
+    xc = np.fft.irfft(np.conj(np.fft.rfft(zi, axis=1)) * np.fft.rfft(za, axis=1), n=hours, axis=1) / hours
+
+    lags = np.arange(max_lag + 1)
+    r = xc[:, lags]
+    if not bootstrap:
+        return r, None
+
+    observed = np.abs(r).max(axis=1)
+    # Shifts whose lag window would overlap the observed one are excluded,
+    # otherwise a real effect would leak into its own null distribution
+    shifts = np.random.default_rng(seed).integers(max_lag + 1, hours - max_lag, size=bootstrap)
+    null = np.zeros((xc.shape[0], bootstrap))  # best |r| per (city, resample)
+    for lag in lags:
+        np.maximum(null, np.abs(xc[:, (shifts + lag) % hours]), out=null)
+    p_values = (1 + np.sum(null >= observed[:, None], axis=1)) / (bootstrap + 1)
+    return r, p_values
+
+
+def _cache_key(params):
+    versions = DataVersion.current('aqi_measurements', 'disasters')
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest(), tuple(v[0] for v in versions.values())
+
+
+def lagged_correlations(params):
+    """Per-city lagged correlation results, cached per parameter set and data version"""
+    key = _cache_key(params)
+    cached = _analytics_cache.get(key)
+    if cached is not None:
+        return cached
+
+    aqi, intensity, events, names = _load_series(params)
+    filled, observed = _interpolate_gaps(aqi)
+    with np.errstate(invalid='ignore'):
+        varying = filled.std(axis=1) > 0
+    usable = (observed >= Config.ANALYTICS_MIN_AQI_HOURS) & varying & (intensity.std(axis=1) > 0)
+
+    r = p_values = None
+    if usable.any():
+        seed = int(key[0][:8], 16)
+        r, p_values = lagged_cross_correlation(
+            filled[usable], intensity[usable], params['max_lag'], params['bootstrap'], seed
+        )
+
+    cities = []
+    rows = iter(range(int(usable.sum())))
+    for position, city_id in enumerate(params['city_ids']):
+        entry = {
+            'city_id': city_id,
+            'city_name': names.get(city_id),
+            'observed_hours': int(observed[position]),
+            'disaster_events': int(events[position])
+        }
+        if not usable[position]:
+            entry['correlations'] = None
+            if observed[position] < Config.ANALYTICS_MIN_AQI_HOURS or not varying[position]:
+                entry['reason'] = 'insufficient AQI data'
+            else:
+                entry['reason'] = 'no disasters in region'
+            cities.append(entry)
+            continue
+
+        row = next(rows)
+        best = int(np.abs(r[row]).argmax())
+        entry.update({
+            'correlations': np.round(r[row], 4).tolist(),
+            'best_lag_hours': best,
+            'best_correlation': round(float(r[row, best]), 4),
+            'p_value': round(float(p_values[row]), 4) if p_values is not None else None,
+            'significant': bool(p_values[row] < Config.ANALYTICS_ALPHA) if p_values is not None else None
+        })
+        cities.append(entry)
+
+    result = {
+        'start_date': params['start'].isoformat(),
+        'end_date': params['end'].isoformat(),
+        'hours': aqi.shape[1],
+        'lags': list(range(params['max_lag'] + 1)),
+        'alpha': Config.ANALYTICS_ALPHA,
+        'cities': cities
+    }
+    _analytics_cache.set(key, result)
+    return result
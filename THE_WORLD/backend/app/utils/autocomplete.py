@@ -0,0 +1,105 @@
+"""
+THE_WORLD - City Autocomplete
+Typeahead over city names using the prefix index (plus pg_trgm fuzzy matches
+when the extension is installed), ranked by match quality and population
+"""
+
+from flask import current_app
+from sqlalchemy import text
+from app.database import db
+from app.config import Config
+from app.utils.filters import FilterError
+
+# Exact name, then prefix, then fuzzy word matches (q <% name uses the GIN
+# trigram index); population breaks ties within each tier
+TRIGRAM_SQL = text("""
+    SELECT
+        id, name, country, country_code, latitude, longitude, population,
+        CASE
+            WHEN lower(name) = :term THEN 'exact'
+            WHEN lower(name) LIKE :prefix THEN 'prefix'
+            ELSE 'fuzzy'
+        END AS match,
+        word_similarity(:term, lower(name)) AS score
+    FROM cities
+    WHERE (lower(name) LIKE :prefix OR :term <% lower(name))
+      AND (CAST(:country_code AS TEXT) IS NULL OR country_code = :country_code)
+    ORDER BY
+        (lower(name) = :term) DESC,
+        (lower(name) LIKE :prefix) DESC,
+        score DESC,
+        population DESC NULLS LAST,
+        id
+    LIMIT :limit
+""")
+
+# Without pg_trgm: exact and prefix matches only (text_pattern_ops index)
+PREFIX_SQL = text("""
+    SELECT
+        id, name, country, country_code, latitude, longitude, population,
+        CASE WHEN lower(name) = :term THEN 'exact' ELSE 'prefix' END AS match,
+        NULL AS score
+    FROM cities
+    WHERE lower(name) LIKE :prefix
+      AND (CAST(:country_code AS TEXT) IS NULL OR country_code = :country_code)
+    ORDER BY
+        (lower(name) = :term) DESC,
+        population DESC NULLS LAST,
+        id
+    LIMIT :limit
+""")
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def parse_autocomplete_args(args):
+    """Validate ?q=&limit=&country_code= for the autocomplete endpoint"""
+    term = ' '.join((args.get('q') or '').split()).lower()
+    if not term:
+        raise FilterError('Missing q', 'q parameter is required')
+    # Shorter prefixes match a large share of a gazetteer, all of which is ranked
+    if len(term) < Config.AUTOCOMPLETE_MIN_LENGTH:
+        raise FilterError('Query too short', f'q must be at least {Config.AUTOCOMPLETE_MIN_LENGTH} characters')
+
+    limit = args.get('limit', Config.AUTOCOMPLETE_DEFAULT_LIMIT, type=int)
+    if not 0 < limit <= Config.AUTOCOMPLETE_MAX_LIMIT:
+        raise FilterError('Invalid limit', f'limit must be between 1 and {Config.AUTOCOMPLETE_MAX_LIMIT}')
+
+    country_code = args.get('country_code')
+    return term, limit, country_code.upper() if country_code else None
+
+
+def autocomplete_cities(term, limit, country_code=None):
+    """Top cities for a typed prefix or approximate name"""
+    params = {
+        'term': term,
+        'prefix': _escape_like(term) + '%',
+        'country_code': country_code,
+        'limit': limit
+    }
+    if not current_app.config.get('TRIGRAM_SEARCH'):
+        rows = db.session.execute(PREFIX_SQL, params).mappings()
+    else:
+        # Threshold for <% in this transaction only
+        db.session.execute(
+            text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+            {'threshold': str(Config.AUTOCOMPLETE_SIMILARITY)}
+        )
+        rows = db.session.execute(TRIGRAM_SQL, params).mappings()
+
+    return [
+        {
+            'id': row['id'],
+            'name': row['name'],
+            'country': row['country'],
+            'country_code': row['country_code'],
+            'latitude': float(row['latitude']) if row['latitude'] is not None else None,
+            'longitude': float(row['longitude']) if row['longitude'] is not None else None,
+            'population': row['population'],
+            'match': row['match'],
+            'score': round(float(row['score']), 3) if row['score'] is not None else None
+        }
+        for row in rows
+    ]
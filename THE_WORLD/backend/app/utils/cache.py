@@ -0,0 +1,104 @@
+"""
+THE_WORLD - Cache Utilities
+In-process LRU cache with per-entry time-to-live
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a time-to-live.
+
+    Expired entries are kept for an extra ``max_stale`` seconds so callers can
+    still fall back to them (stale-while-revalidate, last known good payload).
+    With ``max_bytes`` the total len() of the cached values (bytes payloads)
+    is also bounded.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, max_stale=0, max_bytes=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _size(self, value):
+        return len(value) if self.max_bytes is not None else 0
+
+    def _remove(self, key):
+        value = self._data.pop(key)[0]
+        self._bytes -= self._size(value)
+
+    def _lookup(self, key, allow_stale):
+        """Return (value, age, ttl) for key, or None if missing or too old"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, stored_at, ttl = entry
+        age = time.monotonic() - stored_at
+        if age > ttl + self.max_stale:
+            self._remove(key)
+            return None
+        if age > ttl and not allow_stale:
+            return None
+        self._data.move_to_end(key)
+        return value, age, ttl
+
+    def get(self, key, default=None):
+        """Get a fresh value, or default if the entry is missing or expired"""
+        with self._lock:
+            found = self._lookup(key, allow_stale=False)
+        return found[0] if found else default
+
+    def get_entry(self, key):
+        """Get (value, age_seconds, is_fresh) including stale entries, or None"""
+        with self._lock:
+            found = self._lookup(key, allow_stale=True)
+        if not found:
+            return None
+        value, age, ttl = found
+        return value, age, age <= ttl
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entries if full"""
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, time.monotonic(), self.ttl if ttl is None else ttl)
+            self._bytes += self._size(value)
+            while len(self._data) > self.maxsize or (
+                self.max_bytes is not None and self._bytes > self.max_bytes and len(self._data) > 1
+            ):
+                self._remove(next(iter(self._data)))
+
+    def delete(self, key):
+        """Remove a single entry if present"""
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def expire(self):
+        """Drop entries past their time-to-live (and max_stale); returns how many"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, stored_at, ttl) in self._data.items()
+                       if now - stored_at > ttl + self.max_stale]
+            for key in expired:
+                self._remove(key)
+        return len(expired)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
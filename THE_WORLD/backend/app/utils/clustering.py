@@ -0,0 +1,113 @@
+"""
+THE_WORLD - Clustering Utilities
+Zoom-aware server-side point clustering on precomputed geohash cell keys
+"""
+
+from sqlalchemy import select, func, case
+from app.database import db
+from app.config import Config
+from app.models import Disaster, LatestAQI
+from app.utils.filters import FilterError
+
+# Ordered severity labels used by the ingest services and scripts
+SEVERITY_RANKS = {
+    'low': 1,
+    'moderate': 2,
+    'medium': 2,
+    'high': 3,
+    'very_high': 4,
+    'critical': 4
+}
+RANKED_SEVERITIES = {1: 'low', 2: 'medium', 3: 'high', 4: 'critical'}
+
+
+def parse_cluster_args(args):
+    """Read the required zoom and bbox and the optional cell drill-down"""
+    zoom = args.get('zoom', type=int)
+    if zoom is None or not 0 <= zoom <= Config.TILE_MAX_ZOOM:
+        raise FilterError('Invalid zoom', f'zoom is required and must be between 0 and {Config.TILE_MAX_ZOOM}')
+    if not args.get('bbox'):
+        raise FilterError('Missing bbox', 'bbox is required: min_lon,min_lat,max_lon,max_lat')
+    cell = args.get('cell')
+    if cell and not cell.isalnum():
+        raise FilterError('Invalid cell', 'cell must be a geohash prefix')
+    return zoom, cell
+
+
+def geohash_precision(zoom):
+    """Geohash length whose cells are a small fraction of a tile at this zoom"""
+    return max(1, min(Config.CLUSTER_MAX_PRECISION, (zoom + 2) // 2))
+
+
+def is_clustered(zoom):
+    return zoom <= Config.CLUSTER_MAX_ZOOM
+
+
+def _cluster_rows(model, criteria, zoom, cell, aggregates):
+    """Group rows in the viewport by geohash prefix.
+
+    The prefix is taken from the stored geohash column (computed at insert
+    time), so no per-row geometry work happens beyond the GIST bbox probe.
+    """
+    precision = geohash_precision(zoom)
+    key = func.left(model.geohash, precision).label('cell')
+    if cell:
+        # LIKE 'prefix%' is answered by the varchar_pattern_ops index
+        criteria = criteria + [model.geohash.startswith(cell.lower())]
+
+    statement = (
+        select(
+            key,
+            func.count().label('count'),
+            func.avg(func.ST_Y(model.geom)).label('latitude'),
+            func.avg(func.ST_X(model.geom)).label('longitude'),
+            *aggregates
+        )
+        .where(model.geohash.isnot(None), *criteria)
+        .group_by(key)
+        .order_by(func.count().desc())
+        .limit(Config.CLUSTER_MAX_CELLS)
+    )
+    return precision, db.session.execute(statement).mappings().all()
+
+
+def disaster_clusters(criteria, zoom, cell=None):
+    """Disaster clusters with count, centroid, max severity and magnitude"""
+    severity_rank = case(SEVERITY_RANKS, value=Disaster.severity, else_=0)
+    precision, rows = _cluster_rows(Disaster, criteria, zoom, cell, [
+        func.max(severity_rank).label('severity_rank'),
+        func.max(Disaster.magnitude).label('max_magnitude'),
+        func.max(Disaster.occurred_at).label('latest_at')
+    ])
+    return precision, [{
+        'cell': row['cell'],
+        'count': row['count'],
+        'latitude': float(row['latitude']),
+        'longitude': float(row['longitude']),
+        'max_severity': RANKED_SEVERITIES.get(row['severity_rank']),
+        'max_magnitude': float(row['max_magnitude']) if row['max_magnitude'] is not None else None,
+        'latest_at': row['latest_at'].isoformat() if row['latest_at'] else None
+    } for row in rows]
+
+
+def aqi_clusters(criteria, zoom, cell=None):
+    """Latest-AQI station clusters with count, centroid, max and mean AQI"""
+    precision, rows = _cluster_rows(LatestAQI, criteria, zoom, cell, [
+        func.max(LatestAQI.aqi_value).label('max_aqi'),
+        func.avg(LatestAQI.aqi_value).label('avg_aqi'),
+        func.max(LatestAQI.measured_at).label('latest_at')
+    ])
+    return precision, [{
+        'cell': row['cell'],
+        'count': row['count'],
+        'latitude': float(row['latitude']),
+        'longitude': float(row['longitude']),
+        'max_aqi': row['max_aqi'],
+        'avg_aqi': round(float(row['avg_aqi']), 1) if row['avg_aqi'] is not None else None,
+        'latest_at': row['latest_at'].isoformat() if row['latest_at'] else None
+    } for row in rows]
+
+
+def cell_criteria(model, cell):
+    """Restrict individual features to a cluster cell when drilling down"""
+    return [model.geohash.startswith(cell.lower())] if cell else []
@@ -0,0 +1,110 @@
+"""
+THE_WORLD - Response Compression
+Negotiated brotli/gzip compression for JSON, GeoJSON, CSV and tile
+responses, including streamed downloads
+"""
+
+import zlib
+
+from flask import request
+
+from app.config import Config
+from app.utils.cache import TTLCache
+
+# Optional: brotli is preferred when installed and accepted by the client
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compressed bodies of responses carrying an ETag, keyed by (ETag, encoding)
+_compressed_cache = TTLCache(maxsize=Config.COMPRESSION_CACHE_SIZE, ttl=Config.COMPRESSION_CACHE_TTL)
+
+
+def _encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def _compressor(encoding):
+    """(compress(chunk), flush(), finish()) callables for one stream"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=Config.BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(Config.GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def compress_bytes(data, encoding):
+    """Compress a complete body"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=Config.BROTLI_QUALITY)
+    compressor = zlib.compressobj(Config.GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    """Compress a streamed body chunk by chunk.
+
+    Each chunk is flushed so the client can start decoding (and rendering)
+    before the generator finishes.
+    """
+    compress, flush, finish = _compressor(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield compress(chunk) + flush()
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def _compressible(response):
+    return (
+        response.status_code == 200
+        and response.mimetype in Config.COMPRESSION_MIMETYPES
+        and 'Content-Encoding' not in response.headers
+        and not response.direct_passthrough
+    )
+
+
+def compress_response(response):
+    """after_request hook: compress the body when the client accepts it"""
+    if request.method == 'HEAD' or not _compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(_encodings())
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < Config.COMPRESSION_MIN_SIZE:
+            return response
+
+        etag, weak = response.get_etag()
+        key = (etag, encoding) if etag and not weak else None
+        body = _compressed_cache.get(key) if key else None
+        if body is None:
+            body = compress_bytes(data, encoding)
+            if key and len(body) <= Config.COMPRESSION_CACHE_MAX_BYTES:
+                _compressed_cache.set(key, body)
+        response.set_data(body)
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # The encoded body is a different byte sequence; like nginx, keep the
+        # validator but mark it weak (If-None-Match uses weak comparison)
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Register response compression on the application"""
+    app.after_request(compress_response)
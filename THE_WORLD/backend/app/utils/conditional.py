@@ -0,0 +1,85 @@
+"""
+THE_WORLD - Conditional GET Utilities
+ETag / Last-Modified validators derived from data_versions, answering
+unchanged polls with 304 before the view runs any query
+"""
+
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Response, g, request
+
+from app.config import Config
+from app.database import db
+from app.models import DataVersion
+
+
+def _normalized_args(args):
+    """Query parameters in a canonical order, empty values dropped"""
+    return sorted((key, value) for key, values in args.lists() for value in values if value != '')
+
+
+def data_validators(tables, hourly=False):
+    """(etag, last_modified) for the current request and the tables it reads"""
+    versions = DataVersion.current(*tables)
+    parts = [request.path, repr(_normalized_args(request.args))]
+    parts.extend(f'{name}:{versions[name][0]}' for name in sorted(versions))
+    if hourly:
+        # Endpoints whose default window ends at the current hour
+        parts.append(datetime.utcnow().strftime('%Y%m%d%H'))
+    etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    # data_versions.updated_at is stored in UTC (see bump_data_version)
+    updated = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+    last_modified = max(updated).replace(tzinfo=timezone.utc) if updated else None
+    return etag, last_modified
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    if 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = Config.CONDITIONAL_CACHE_CONTROL
+
+
+def register_conditional_get(bp, *tables, hourly=False):
+    """Add ETag/Last-Modified to a blueprint's GET responses and answer matches with 304.
+
+    ``tables`` are the versioned tables the blueprint's endpoints read
+    (derived tables such as latest_aqi change with their source table).
+    """
+
+    @bp.before_request
+    def check_not_modified():
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        try:
+            etag, last_modified = data_validators(tables, hourly)
+        except Exception:
+            db.session.rollback()
+            return None  # Serve the full response; the view reports database errors
+        g.data_validators = (etag, last_modified)
+        if not _not_modified(etag, last_modified):
+            return None
+
+        response = Response(status=304)
+        _set_validators(response, etag, last_modified)
+        # Same Vary as the (compressed) 200 it stands in for
+        response.vary.add('Accept-Encoding')
+        return response
+
+    @bp.after_request
+    def add_validators(response):
+        validators = g.pop('data_validators', None)
+        if validators and response.status_code == 200:
+            _set_validators(response, *validators)
+        return response
@@ -0,0 +1,210 @@
+"""
+THE_WORLD - Correlation Utilities
+Disaster/AQI correlation from the precomputed impact table, or a live
+set-based spatio-temporal join for non-default windows
+"""
+
+from sqlalchemy import select, func, text
+from app.database import db
+from app.config import Config
+from app.models import Disaster, DisasterAQIImpact
+from app.utils.filters import FilterError
+
+# Disaster orderings: by date, or by the largest impact per disaster
+IMPACT_SORTS = ('occurred_at', 'max_change', 'max_peak', 'affected_cities')
+
+# One statement for all matching disasters: each disaster is joined
+# (LATERAL) to the AQI measurements within distance_m of it and inside its
+# pre/post window, grouped per station. Pre window is [occurred - pre_days,
+# occurred), post window is [occurred, occurred + post_days].
+DISASTER_AQI_SQL = text("""
+    SELECT
+        d.id AS disaster_id,
+        d.disaster_type,
+        d.title,
+        d.occurred_at,
+        d.latitude,
+        d.longitude,
+        s.city_id,
+        s.city_name,
+        s.pre_avg,
+        s.post_avg,
+        s.peak_aqi,
+        s.peak_at
+    FROM (
+        SELECT id, disaster_type, title, occurred_at, latitude, longitude, geom
+        FROM disasters
+        WHERE occurred_at IS NOT NULL
+          AND geom IS NOT NULL
+          AND (CAST(:disaster_id AS INTEGER) IS NULL OR id = :disaster_id)
+          AND (CAST(:disaster_type AS TEXT) IS NULL OR disaster_type = :disaster_type)
+        ORDER BY occurred_at DESC, id DESC
+        LIMIT :limit
+    ) d
+    LEFT JOIN LATERAL (
+        SELECT
+            MIN(a.city_id) AS city_id,
+            MIN(a.city_name) AS city_name,
+            AVG(a.aqi_value) FILTER (WHERE a.measured_at < d.occurred_at) AS pre_avg,
+            AVG(a.aqi_value) FILTER (WHERE a.measured_at >= d.occurred_at) AS post_avg,
+            MAX(a.aqi_value) FILTER (WHERE a.measured_at >= d.occurred_at) AS peak_aqi,
+            (ARRAY_AGG(a.measured_at ORDER BY a.aqi_value DESC, a.measured_at)
+                FILTER (WHERE a.measured_at >= d.occurred_at))[1] AS peak_at
+        FROM aqi_measurements a
+        WHERE a.measured_at >= d.occurred_at - make_interval(days => :pre_days)
+          AND a.measured_at <= d.occurred_at + make_interval(days => :post_days)
+          AND a.aqi_value IS NOT NULL
+          AND (CAST(:city_id AS INTEGER) IS NULL OR a.city_id = :city_id)
+          AND ST_DWithin(geography(a.geom), geography(d.geom), :distance_m)
+        GROUP BY latest_aqi_station_key(a.city_id, a.city_name, a.latitude, a.longitude)
+        HAVING COUNT(*) FILTER (WHERE a.measured_at >= d.occurred_at) > 0
+    ) s ON TRUE
+    ORDER BY d.occurred_at DESC, d.id DESC, s.post_avg DESC NULLS LAST
+""")
+
+
+def _percent_change(pre_avg, post_avg):
+    if not pre_avg:
+        return None
+    return ((post_avg - pre_avg) / pre_avg) * 100
+
+
+def _summary(cities_affected):
+    changes = [c['aqi_change_percent'] for c in cities_affected if c['aqi_change_percent'] is not None]
+    return {
+        'total_affected_cities': len(cities_affected),
+        'avg_aqi_increase': round(sum(changes) / len(changes), 2) if changes else None,
+        'max_aqi_increase': round(max(changes), 2) if changes else None
+    }
+
+
+def disaster_aqi_correlations(disaster_id=None, disaster_type=None, city_id=None,
+                              pre_days=7, post_days=30, distance_km=100, limit=100):
+    """Per-disaster affected cities with pre/post average, peak and peak time"""
+    rows = db.session.execute(DISASTER_AQI_SQL, {
+        'disaster_id': disaster_id,
+        'disaster_type': disaster_type,
+        'city_id': city_id,
+        'pre_days': pre_days,
+        'post_days': post_days,
+        'distance_m': distance_km * 1000.0,
+        'limit': limit
+    }).mappings()
+
+    correlations = {}
+    for row in rows:
+        entry = correlations.get(row['disaster_id'])
+        if entry is None:
+            entry = correlations[row['disaster_id']] = {
+                'disaster_id': row['disaster_id'],
+                'disaster_type': row['disaster_type'],
+                'disaster_title': row['title'],
+                'disaster_date': row['occurred_at'].isoformat(),
+                'location': {
+                    'latitude': float(row['latitude']),
+                    'longitude': float(row['longitude'])
+                },
+                'affected_cities': []
+            }
+        if row['post_avg'] is None:
+            continue  # LEFT JOIN row for a disaster with no nearby measurements
+
+        pre_avg = float(row['pre_avg']) if row['pre_avg'] is not None else None
+        post_avg = float(row['post_avg'])
+        change = _percent_change(pre_avg, post_avg)
+        entry['affected_cities'].append({
+            'city_id': row['city_id'],
+            'city_name': row['city_name'],
+            'pre_disaster_avg_aqi': round(pre_avg, 2) if pre_avg is not None else None,
+            'post_disaster_avg_aqi': round(post_avg, 2),
+            'aqi_change_percent': round(change, 2) if change is not None else None,
+            'peak_aqi': int(row['peak_aqi']),
+            'peak_aqi_date': row['peak_at'].isoformat() if row['peak_at'] else None
+        })
+
+    for entry in correlations.values():
+        entry['summary'] = _summary(entry['affected_cities'])
+    return list(correlations.values())
+
+
+def uses_impact_table(pre_days, post_days, distance_km):
+    """Whether the requested windows match the precomputed disaster_aqi_impact table"""
+    return (pre_days, post_days, distance_km) == (
+        Config.IMPACT_PRE_DAYS, Config.IMPACT_POST_DAYS, Config.IMPACT_DISTANCE_KM
+    )
+
+
+def _disaster_entry(disaster):
+    return {
+        'disaster_id': disaster.id,
+        'disaster_type': disaster.disaster_type,
+        'disaster_title': disaster.title,
+        'disaster_date': disaster.occurred_at.isoformat() if disaster.occurred_at else None,
+        'location': {
+            'latitude': float(disaster.latitude),
+            'longitude': float(disaster.longitude)
+        },
+        'affected_cities': []
+    }
+
+
+def precomputed_correlations(disaster_id=None, disaster_type=None, city_id=None,
+                             min_change=None, min_peak=None, sort='occurred_at', limit=100):
+    """Correlations read from disaster_aqi_impact (two indexed queries).
+
+    Impact filters (city_id, min_change, min_peak) restrict both the affected
+    cities and the disasters returned; sort orders disasters by date or by
+    their largest impact.
+    """
+    if sort not in IMPACT_SORTS:
+        raise FilterError('Invalid sort', f"sort must be one of: {', '.join(IMPACT_SORTS)}")
+
+    impact = DisasterAQIImpact
+    impact_criteria = [impact.post_count > 0]
+    if city_id:
+        impact_criteria.append(impact.city_id == city_id)
+    if min_change is not None:
+        impact_criteria.append(impact.change_percent >= min_change)
+    if min_peak is not None:
+        impact_criteria.append(impact.peak_aqi >= min_peak)
+
+    rollup = (
+        select(
+            impact.disaster_id,
+            func.max(impact.change_percent).label('max_change'),
+            func.max(impact.peak_aqi).label('max_peak'),
+            func.count().label('affected_cities')
+        )
+        .where(*impact_criteria)
+        .group_by(impact.disaster_id)
+        .subquery('impact_rollup')
+    )
+
+    disaster_criteria = []
+    if disaster_id:
+        disaster_criteria.append(Disaster.id == disaster_id)
+    if disaster_type:
+        disaster_criteria.append(Disaster.disaster_type == disaster_type)
+
+    query = db.session.query(Disaster).filter(*disaster_criteria)
+    impact_filtered = len(impact_criteria) > 1
+    if impact_filtered or sort != 'occurred_at':
+        # Without impact filters, disasters with no affected cities are kept
+        query = query.join(rollup, rollup.c.disaster_id == Disaster.id, isouter=not impact_filtered)
+    if sort == 'occurred_at':
+        query = query.order_by(Disaster.occurred_at.desc(), Disaster.id.desc())
+    else:
+        query = query.order_by(rollup.c[sort].desc().nulls_last(), Disaster.id.desc())
+    disasters = query.limit(limit).all()
+
+    correlations = {disaster.id: _disaster_entry(disaster) for disaster in disasters}
+    if correlations:
+        impacts = impact.query.filter(
+            impact.disaster_id.in_(list(correlations)), *impact_criteria
+        ).order_by(impact.disaster_id, impact.post_avg.desc()).all()
+        for row in impacts:
+            correlations[row.disaster_id]['affected_cities'].append(row.to_dict())
+
+    for entry in correlations.values():
+        entry['summary'] = _summary(entry['affected_cities'])
+    return list(correlations.values())
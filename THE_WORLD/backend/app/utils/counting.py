@@ -0,0 +1,66 @@
+"""
+THE_WORLD - Row Count Utilities
+Exact, cached and planner-estimated totals for list endpoints
+"""
+
+import json
+from app.database import db
+from app.config import Config
+from app.models import DataVersion
+from app.utils.cache import TTLCache
+from app.utils.filters import FilterError
+
+TOTAL_MODES = ('exact', 'estimate', 'none')
+
+# Keyed by (table, data version, normalized filters): a write bumps the
+# version, so counts computed before an ingest are never served after it.
+_count_cache = TTLCache(maxsize=Config.COUNT_CACHE_SIZE, ttl=Config.COUNT_CACHE_TTL)
+
+
+def parse_total_mode(args, endpoint):
+    """Read ?total=exact|estimate|none, falling back to the endpoint default"""
+    mode = (args.get('total') or Config.LIST_TOTAL_DEFAULTS.get(endpoint, 'exact')).lower()
+    if mode not in TOTAL_MODES:
+        raise FilterError('Invalid total mode', f"total must be one of: {', '.join(TOTAL_MODES)}")
+    return mode
+
+
+def resolve_total(query, mode, table, filters):
+    """Compute the total for a filtered query according to mode.
+
+    Returns (total, is_estimate). ``exact`` always returns a true count
+    (served from the count cache when the table has not changed).
+    ``estimate`` returns a cached exact count if there is one, otherwise
+    the planner's row estimate; small estimates are cheap enough to be
+    replaced by an exact count. ``none`` skips counting entirely.
+    """
+    if mode == 'none':
+        return None, False
+
+    version = DataVersion.current(table)[table][0]
+    key = (table, version, tuple(sorted((k, str(v)) for k, v in filters.items())))
+
+    cached = _count_cache.get(key)
+    if cached is not None:
+        return cached, False
+
+    if mode == 'estimate':
+        estimate = planner_estimate(query)
+        if estimate > Config.COUNT_ESTIMATE_THRESHOLD:
+            return estimate, True
+
+    total = query.count()
+    _count_cache.set(key, total)
+    return total, False
+
+
+def planner_estimate(query):
+    """Row estimate for a query from EXPLAIN, without executing it"""
+    statement = getattr(query, 'statement', query)
+    compiled = statement.compile(dialect=db.engine.dialect)
+    plan = db.session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled.string}", compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
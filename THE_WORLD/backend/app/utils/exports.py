@@ -0,0 +1,382 @@
+"""
+THE_WORLD - Export Utilities
+Streaming file exports written chunk by chunk from a server-side cursor
+"""
+
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, date
+from decimal import Decimal
+
+from flask import Response, stream_with_context
+from sqlalchemy import select, func, Integer, Numeric, DateTime
+
+from app.config import Config
+from app.models import City, Disaster, AQIMeasurement
+from app.utils.filters import FilterError, parse_limit, disaster_filters, aqi_filters, city_filters
+from app.utils.geojson import disaster_features, aqi_features, city_features, feature_collection_stream
+from app.utils.streaming import Snapshot, stream_rows
+
+# Optional dependencies for the columnar formats
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:
+    import fiona
+except ImportError:
+    fiona = None
+
+# Measurements stored as NUMERIC(8, 2)/(10, 2) that are exported as float32
+FLOAT32_COLUMNS = {'pm25', 'pm10', 'o3', 'no2', 'co', 'so2', 'magnitude'}
+
+
+def _disaster_columns():
+    return [
+        Disaster.id, Disaster.disaster_type, Disaster.title, Disaster.description,
+        Disaster.latitude, Disaster.longitude, Disaster.occurred_at, Disaster.magnitude,
+        Disaster.severity, Disaster.status, Disaster.source, Disaster.source_id, Disaster.url,
+        Disaster.created_at, Disaster.updated_at, Disaster.data_fetched_at
+    ]
+
+
+def _aqi_columns():
+    return [
+        AQIMeasurement.id, AQIMeasurement.city_id, AQIMeasurement.city_name,
+        AQIMeasurement.latitude, AQIMeasurement.longitude, AQIMeasurement.measured_at,
+        AQIMeasurement.aqi_value, AQIMeasurement.aqi_category,
+        AQIMeasurement.pm25, AQIMeasurement.pm10, AQIMeasurement.o3,
+        AQIMeasurement.no2, AQIMeasurement.co, AQIMeasurement.so2,
+        AQIMeasurement.source, AQIMeasurement.url,
+        AQIMeasurement.created_at, AQIMeasurement.updated_at
+    ]
+
+
+def _city_columns():
+    return [
+        City.id, City.name, City.country, City.country_code, City.latitude, City.longitude,
+        City.population, City.timezone, City.created_at, City.updated_at
+    ]
+
+
+# dataset -> (model, time column, export columns, filter builder, feature statement)
+EXPORT_DATASETS = {
+    'disasters': (Disaster, Disaster.occurred_at, _disaster_columns, disaster_filters, disaster_features),
+    'aqi': (AQIMeasurement, AQIMeasurement.measured_at, _aqi_columns, aqi_filters, aqi_features),
+    'cities': (City, City.created_at, _city_columns, city_filters, city_features)
+}
+
+
+def _plain(value):
+    """Convert DB values to JSON/CSV-friendly scalars"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def export_statement(dataset, criteria, limit=None):
+    """Rows to export, newest first (served by the (time, id) keyset index)"""
+    model, time_column, columns, _, _ = EXPORT_DATASETS[dataset]
+    statement = select(*columns()).where(*criteria).order_by(time_column.desc(), model.id.desc())
+    if limit:
+        statement = statement.limit(limit)
+    return statement
+
+
+def csv_stream(statement, snapshot=None):
+    """Yield a header line, then one CSV block per fetched chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in statement.selected_columns])
+    yield buffer.getvalue()
+    for rows in stream_rows(statement, snapshot=snapshot):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_plain(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+
+
+def ndjson_stream(statement, snapshot=None):
+    """Yield one JSON object per line"""
+    keys = [column.key for column in statement.selected_columns]
+    for rows in stream_rows(statement, snapshot=snapshot):
+        yield ''.join(
+            json.dumps({key: _plain(value) for key, value in zip(keys, row)}) + '\n'
+            for row in rows
+        )
+
+
+def json_array_stream(statement, snapshot=None):
+    """Yield a JSON array of objects without holding it in memory"""
+    keys = [column.key for column in statement.selected_columns]
+    yield '['
+    separator = ''
+    for rows in stream_rows(statement, snapshot=snapshot):
+        yield separator + ','.join(
+            json.dumps({key: _plain(value) for key, value in zip(keys, row)})
+            for row in rows
+        )
+        separator = ','
+    yield ']'
+
+
+def geojson_stream(dataset, criteria, limit=None, snapshot=None):
+    """FeatureCollection rendered by PostGIS, with export metadata"""
+    features = EXPORT_DATASETS[dataset][4](criteria, limit)
+    metadata = {'export_date': datetime.now().isoformat(), 'source': 'THE_WORLD API'}
+    return feature_collection_stream(features, metadata, snapshot)
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are drained after each batch"""
+
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def _arrow_field(column):
+    """Arrow field for an export column"""
+    if column.key in FLOAT32_COLUMNS:
+        return pa.field(column.key, pa.float32())
+    if isinstance(column.type, Numeric):
+        return pa.field(column.key, pa.float64())
+    if isinstance(column.type, Integer):
+        return pa.field(column.key, pa.int32())
+    if isinstance(column.type, DateTime):
+        return pa.field(column.key, pa.timestamp('us'))
+    return pa.field(column.key, pa.string())
+
+
+def _arrow_batches(dataset, criteria, limit, snapshot=None):
+    """(schema, record batch iterator) with a WKB geometry column, one batch per row group"""
+    model = EXPORT_DATASETS[dataset][0]
+    statement = export_statement(dataset, criteria, limit).add_columns(
+        func.ST_AsBinary(model.geom).label('geometry')
+    )
+    columns = list(statement.selected_columns)
+    fields = [_arrow_field(column) for column in columns[:-1]] + [pa.field('geometry', pa.binary())]
+    # GeoParquet metadata so GIS tools recognise the WKB column (CRS defaults to OGC:CRS84)
+    geo = {
+        'version': '1.0.0',
+        'primary_column': 'geometry',
+        'columns': {'geometry': {'encoding': 'WKB', 'geometry_types': ['Point']}}
+    }
+    schema = pa.schema(fields, metadata={'geo': json.dumps(geo)})
+    decimal_positions = [i for i, field in enumerate(fields) if pa.types.is_floating(field.type)]
+
+    def batches():
+        for rows in stream_rows(statement, Config.EXPORT_ROW_GROUP_SIZE, snapshot):
+            values = [list(column) for column in zip(*rows)]
+            for i in decimal_positions:
+                values[i] = [float(v) if v is not None else None for v in values[i]]
+            values[-1] = [bytes(v) if v is not None else None for v in values[-1]]
+            yield pa.record_batch([pa.array(v, type=f.type) for v, f in zip(values, fields)], schema=schema)
+
+    return schema, batches()
+
+
+def parquet_stream(dataset, criteria, limit=None, snapshot=None):
+    """Yield a Parquet file row group by row group"""
+    schema, batches = _arrow_batches(dataset, criteria, limit, snapshot)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema, compression='zstd')
+    for batch in batches:
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def arrow_stream(dataset, criteria, limit=None, snapshot=None):
+    """Yield an Arrow IPC stream batch by batch"""
+    schema, batches = _arrow_batches(dataset, criteria, limit, snapshot)
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), schema)
+    for batch in batches:
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _fiona_type(column):
+    if column.key in FLOAT32_COLUMNS or isinstance(column.type, Numeric):
+        return 'float'
+    if isinstance(column.type, Integer):
+        return 'int'
+    if isinstance(column.type, DateTime):
+        return 'datetime'
+    return 'str'
+
+
+def flatgeobuf_stream(dataset, criteria, limit=None, snapshot=None):
+    """Yield a FlatGeobuf file.
+
+    FlatGeobuf puts the feature count and spatial index ahead of the
+    features, so chunks are written to a temporary file as the cursor
+    produces them and the finished file is then streamed back.
+    """
+    statement = export_statement(dataset, criteria, limit)
+    columns = list(statement.selected_columns)
+    schema = {'geometry': 'Point', 'properties': {column.key: _fiona_type(column) for column in columns}}
+    keys = [column.key for column in columns]
+
+    # The driver refuses to overwrite, so the file lives in a fresh directory
+    directory = tempfile.mkdtemp(prefix='export_')
+    path = os.path.join(directory, f'{dataset}.fgb')
+    try:
+        with fiona.open(path, 'w', driver='FlatGeobuf', schema=schema, crs='EPSG:4326') as layer:
+            for rows in stream_rows(statement, snapshot=snapshot):
+                records = []
+                for row in rows:
+                    properties = {key: _plain(value) for key, value in zip(keys, row)}
+                    if properties['longitude'] is None or properties['latitude'] is None:
+                        continue
+                    records.append({
+                        'geometry': {'type': 'Point', 'coordinates': (properties['longitude'], properties['latitude'])},
+                        'properties': properties
+                    })
+                layer.writerecords(records)
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(Config.EXPORT_FILE_CHUNK_SIZE)
+                if not data:
+                    break
+                yield data
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+# format -> (mimetype, file extension, generator factory(dataset, criteria, limit, snapshot))
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv', lambda d, c, l, s=None: csv_stream(export_statement(d, c, l), s)),
+    'json': ('application/json', 'json', lambda d, c, l, s=None: json_array_stream(export_statement(d, c, l), s)),
+    'ndjson': ('application/x-ndjson', 'ndjson', lambda d, c, l, s=None: ndjson_stream(export_statement(d, c, l), s)),
+    'geojson': ('application/geo+json', 'geojson', geojson_stream),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', parquet_stream),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows', arrow_stream),
+    'fgb': ('application/flatgeobuf', 'fgb', flatgeobuf_stream)
+}
+
+# format -> (module, package name) for formats backed by optional dependencies
+OPTIONAL_FORMATS = {
+    'parquet': (lambda: pq, 'pyarrow'),
+    'arrow': (lambda: pa, 'pyarrow'),
+    'fgb': (lambda: fiona, 'fiona')
+}
+
+# Formats that are already compressed and are stored in bundles as-is
+PRECOMPRESSED_FORMATS = {'parquet'}
+
+
+def _check_format(format_type):
+    if format_type not in EXPORT_FORMATS:
+        raise FilterError('Unsupported format', f"Use one of: {', '.join(EXPORT_FORMATS)}")
+    if format_type in OPTIONAL_FORMATS:
+        module, package = OPTIONAL_FORMATS[format_type]
+        if module() is None:
+            raise FilterError('Format unavailable', f'format={format_type} requires the {package} package')
+
+
+def export_response(dataset, format_type, args):
+    """Streaming attachment response for a dataset export (raises FilterError)"""
+    _check_format(format_type)
+    criteria, _ = EXPORT_DATASETS[dataset][3](args)
+    limit = parse_limit(args)  # Optional; exports are unbounded by default
+
+    mimetype, extension, generate = EXPORT_FORMATS[format_type]
+    response = Response(stream_with_context(generate(dataset, criteria, limit)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename={dataset}_{datetime.now().strftime("%Y%m%d")}.{extension}'
+    )
+    return response
+
+
+def _bundle_stream(members, format_type, limit, manifest):
+    """Yield a ZIP64 archive, one member per dataset, as the cursors produce rows.
+
+    All members are read in one snapshot so the datasets are consistent
+    with each other; the manifest is written last with the row counts.
+    """
+    mimetype, extension, generate = EXPORT_FORMATS[format_type]
+    compression = zipfile.ZIP_STORED if format_type in PRECOMPRESSED_FORMATS else zipfile.ZIP_DEFLATED
+    sink = _ChunkSink()
+    with Snapshot() as snapshot:
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            for dataset, criteria in members:
+                info = zipfile.ZipInfo(f'{dataset}.{extension}', date_time=datetime.now().timetuple()[:6])
+                info.compress_type = compression
+                snapshot.rows = 0
+                with archive.open(info, 'w', force_zip64=True) as member:
+                    for chunk in generate(dataset, criteria, limit, snapshot):
+                        member.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                        yield sink.drain()
+                manifest['files'].append({
+                    'name': info.filename,
+                    'dataset': dataset,
+                    'mimetype': mimetype,
+                    'rows': snapshot.rows
+                })
+                yield sink.drain()
+            archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+        yield sink.drain()
+
+
+def bundle_response(args):
+    """Streaming ZIP of several datasets sharing one region/time filter (raises FilterError)"""
+    format_type = args.get('format', 'csv').lower()
+    _check_format(format_type)
+    datasets = [d.strip() for d in args.get('datasets', ','.join(EXPORT_DATASETS)).split(',') if d.strip()]
+    unknown = [d for d in datasets if d not in EXPORT_DATASETS]
+    if unknown or not datasets:
+        raise FilterError('Invalid datasets', f"datasets must be a subset of: {', '.join(EXPORT_DATASETS)}")
+    limit = parse_limit(args)  # Per dataset; unbounded by default
+
+    members = []
+    filters = {}
+    for dataset in dict.fromkeys(datasets):
+        criteria, filters[dataset] = EXPORT_DATASETS[dataset][3](args)
+        members.append((dataset, criteria))
+    manifest = {
+        'source': 'THE_WORLD API',
+        'export_date': datetime.now().isoformat(),
+        'format': format_type,
+        'limit': limit,
+        'filters': filters,
+        'files': []
+    }
+
+    response = Response(
+        stream_with_context(_bundle_stream(members, format_type, limit, manifest)),
+        mimetype='application/zip'
+    )
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename=bundle_{datetime.now().strftime("%Y%m%d")}.zip'
+    )
+    return response
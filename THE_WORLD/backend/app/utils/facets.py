@@ -0,0 +1,68 @@
+"""
+THE_WORLD - Facet Utilities
+Filter-panel metadata (counts per facet value, date and magnitude ranges)
+read from the disaster_facets rollup in one grouping-sets query
+"""
+
+from sqlalchemy import func, tuple_
+from app.database import db
+from app.models import DisasterFacet
+
+# Response key per rollup dimension, in GROUPING() bit order (most significant first)
+FACET_DIMENSIONS = (
+    ('disaster_types', DisasterFacet.disaster_type),
+    ('severities', DisasterFacet.severity),
+    ('statuses', DisasterFacet.status),
+    ('sources', DisasterFacet.source),
+)
+
+
+def _range(low, high, convert):
+    return {
+        'min': convert(low) if low is not None else None,
+        'max': convert(high) if high is not None else None
+    }
+
+
+def disaster_facets():
+    """Counts per type, severity, status and source plus overall ranges"""
+    columns = [column for _, column in FACET_DIMENSIONS]
+    rows = db.session.query(
+        *columns,
+        func.grouping(*columns).label('grouping'),
+        func.sum(DisasterFacet.event_count).label('count'),
+        func.min(DisasterFacet.first_occurred_at).label('first_occurred_at'),
+        func.max(DisasterFacet.last_occurred_at).label('last_occurred_at'),
+        func.min(DisasterFacet.min_magnitude).label('min_magnitude'),
+        func.max(DisasterFacet.max_magnitude).label('max_magnitude')
+    ).group_by(
+        func.grouping_sets(*[tuple_(column) for column in columns], tuple_())
+    ).all()
+
+    everything = (1 << len(columns)) - 1
+    facets = {key: [] for key, _ in FACET_DIMENSIONS}
+    result = {
+        'total': 0,
+        'occurred_at': _range(None, None, None),
+        'magnitude': _range(None, None, None)
+    }
+    for row in rows:
+        if row.grouping == everything:
+            result.update({
+                'total': int(row.count),
+                'occurred_at': _range(row.first_occurred_at, row.last_occurred_at, lambda v: v.isoformat()),
+                'magnitude': _range(row.min_magnitude, row.max_magnitude, float)
+            })
+            continue
+        # The one dimension grouped by this set has its GROUPING() bit clear
+        position = next(i for i in range(len(columns)) if not row.grouping & (1 << (len(columns) - 1 - i)))
+        key = FACET_DIMENSIONS[position][0]
+        facets[key].append({
+            'value': row[position] or None,  # '' is stored for a missing value
+            'count': int(row.count)
+        })
+
+    for values in facets.values():
+        values.sort(key=lambda entry: (-entry['count'], entry['value'] or ''))
+    result.update(facets)
+    return result
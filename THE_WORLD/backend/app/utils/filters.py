@@ -0,0 +1,297 @@
+"""
+THE_WORLD - Query Filter Utilities
+Shared request-argument parsing for list, export and map endpoints
+"""
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from sqlalchemy import or_, func
+from app.config import Config
+from app.models import Disaster, AQIMeasurement, City, LatestAQI
+from app.utils.helpers import parse_bbox
+
+
+class FilterError(ValueError):
+    """Invalid filter parameter; error and message are safe to return to clients"""
+
+    def __init__(self, error, message=None):
+        super().__init__(message or error)
+        self.error = error
+        self.message = message or error
+
+    def to_dict(self):
+        return {'error': self.error, 'message': self.message}
+
+
+def parse_iso_datetime(value):
+    """Parse an ISO 8601 query parameter, accepting a trailing Z"""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise FilterError('Invalid date format', 'Date must be in ISO 8601 format')
+
+
+def parse_utc_datetime(value):
+    """Parse an ISO 8601 query parameter into a naive UTC datetime.
+
+    Offsets are converted rather than dropped; values without one are
+    taken to be UTC already, like the stored timestamps.
+    """
+    parsed = parse_iso_datetime(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_limit(args):
+    """Optional positive row limit, checked before a streamed 200 is sent"""
+    value = args.get('limit')
+    if value in (None, ''):
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise FilterError('Invalid limit', 'limit must be a positive integer')
+    return limit
+
+
+def _envelope(min_lon, min_lat, max_lon, max_lat):
+    return func.ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
+
+
+def bbox_criteria(bbox, model):
+    """Criteria restricting model rows to a min_lon,min_lat,max_lon,max_lat box.
+
+    Uses ``geom && envelope`` so the GIST index on geom is used. A box whose
+    min_lon is greater than its max_lon crosses the antimeridian and is split
+    into an eastern and a western envelope.
+    """
+    try:
+        box = parse_bbox(bbox)
+    except ValueError:
+        raise FilterError('Invalid bbox format', 'Bbox must be: min_lon,min_lat,max_lon,max_lat')
+    min_lon, min_lat, max_lon, max_lat = box['min_lon'], box['min_lat'], box['max_lon'], box['max_lat']
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise FilterError('Invalid bbox', 'Longitudes must be between -180 and 180')
+    if not -90 <= min_lat <= max_lat <= 90:
+        raise FilterError('Invalid bbox', 'Latitudes must be between -90 and 90 with min_lat <= max_lat')
+
+    if min_lon <= max_lon:
+        criterion = model.geom.op('&&')(_envelope(min_lon, min_lat, max_lon, max_lat))
+    else:
+        criterion = or_(
+            model.geom.op('&&')(_envelope(min_lon, min_lat, 180, max_lat)),
+            model.geom.op('&&')(_envelope(-180, min_lat, max_lon, max_lat))
+        )
+    return [criterion], (min_lon, min_lat, max_lon, max_lat)
+
+
+def _check_ring(ring):
+    """Reject a linear ring PostGIS would fail on: it needs 4+ lon/lat positions and must be closed"""
+    if not isinstance(ring, list) or len(ring) < 4:
+        raise FilterError('Invalid geometry', 'each ring must have at least 4 positions')
+    for position in ring:
+        if (
+            not isinstance(position, list) or len(position) not in (2, 3)
+            or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in position)
+        ):
+            raise FilterError('Invalid geometry', 'positions must be [longitude, latitude] numbers')
+        lon, lat = position[0], position[1]
+        if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+            raise FilterError('Invalid geometry', 'positions must be within -180..180 longitude and -90..90 latitude')
+    if ring[0] != ring[-1]:
+        raise FilterError('Invalid geometry', 'each ring must be closed (first position equal to the last)')
+
+
+def polygon_criteria(geometry, model):
+    """Criteria restricting model rows to a GeoJSON Polygon or MultiPolygon.
+
+    Accepts a bare geometry or a Feature. The polygon is simplified in
+    PostGIS before ``ST_Intersects`` so detailed outlines stay cheap; the
+    returned hash identifies the polygon in cache keys.
+    """
+    if isinstance(geometry, dict) and geometry.get('type') == 'Feature':
+        geometry = geometry.get('geometry')
+    if not isinstance(geometry, dict) or geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+        raise FilterError('Invalid geometry', 'geometry must be a GeoJSON Polygon or MultiPolygon')
+
+    coordinates = geometry.get('coordinates')
+    polygons = [coordinates] if geometry['type'] == 'Polygon' else coordinates
+    if not isinstance(polygons, list) or not polygons:
+        raise FilterError('Invalid geometry', 'geometry has no coordinates')
+    vertices = 0
+    for polygon in polygons:
+        if not isinstance(polygon, list) or not polygon:
+            raise FilterError('Invalid geometry', 'each polygon must be a non-empty list of rings')
+        for ring in polygon:
+            vertices += len(ring) if isinstance(ring, list) else 0
+            if vertices > Config.POLYGON_MAX_VERTICES:
+                raise FilterError('Geometry too large', f'geometry may have at most {Config.POLYGON_MAX_VERTICES} vertices')
+            _check_ring(ring)
+
+    raw = json.dumps(geometry, sort_keys=True)
+    shape = func.ST_SimplifyPreserveTopology(
+        # Self-intersecting outlines are repaired rather than failing in GEOS
+        func.ST_MakeValid(func.ST_SetSRID(func.ST_GeomFromGeoJSON(raw), 4326)),
+        Config.POLYGON_SIMPLIFY_TOLERANCE
+    )
+    # ST_Intersects adds an implicit && so the GIST index still filters first
+    return [func.ST_Intersects(model.geom, shape)], hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def disaster_filters(args):
+    """Build disaster WHERE criteria from request args.
+
+    Returns (criteria, normalized) where criteria can be passed to either
+    ``Query.filter(*criteria)`` or ``select(...).where(*criteria)`` and
+    normalized is a dict of the parsed filter values (for cache keys).
+    """
+    criteria = []
+    normalized = {}
+
+    disaster_type = args.get('disaster_type')
+    if disaster_type:
+        criteria.append(Disaster.disaster_type == disaster_type)
+        normalized['disaster_type'] = disaster_type
+
+    start_date = args.get('start_date')
+    if start_date:
+        start_dt = parse_iso_datetime(start_date)
+        criteria.append(Disaster.occurred_at >= start_dt)
+        normalized['start_date'] = start_dt.isoformat()
+
+    end_date = args.get('end_date')
+    if end_date:
+        end_dt = parse_iso_datetime(end_date)
+        criteria.append(Disaster.occurred_at <= end_dt)
+        normalized['end_date'] = end_dt.isoformat()
+
+    min_magnitude = args.get('min_magnitude', type=float)
+    if min_magnitude is not None:
+        criteria.append(Disaster.magnitude >= min_magnitude)
+        normalized['min_magnitude'] = min_magnitude
+
+    max_magnitude = args.get('max_magnitude', type=float)
+    if max_magnitude is not None:
+        criteria.append(Disaster.magnitude <= max_magnitude)
+        normalized['max_magnitude'] = max_magnitude
+
+    bbox = args.get('bbox')  # min_lon,min_lat,max_lon,max_lat
+    if bbox:
+        box_criteria, normalized['bbox'] = bbox_criteria(bbox, Disaster)
+        criteria.extend(box_criteria)
+
+    return criteria, normalized
+
+
+def aqi_filters(args):
+    """Build AQI measurement WHERE criteria from request args (see disaster_filters)"""
+    criteria = []
+    normalized = {}
+
+    city_id = args.get('city_id', type=int)
+    if city_id:
+        criteria.append(AQIMeasurement.city_id == city_id)
+        normalized['city_id'] = city_id
+
+    city_name = args.get('city_name')
+    if city_name:
+        criteria.append(AQIMeasurement.city_name.ilike(f'%{city_name}%'))
+        normalized['city_name'] = city_name.lower()
+
+    start_date = args.get('start_date')
+    if start_date:
+        start_dt = parse_iso_datetime(start_date)
+        criteria.append(AQIMeasurement.measured_at >= start_dt)
+        normalized['start_date'] = start_dt.isoformat()
+
+    end_date = args.get('end_date')
+    if end_date:
+        end_dt = parse_iso_datetime(end_date)
+        criteria.append(AQIMeasurement.measured_at <= end_dt)
+        normalized['end_date'] = end_dt.isoformat()
+
+    min_aqi = args.get('min_aqi', type=int)
+    if min_aqi is not None:
+        criteria.append(AQIMeasurement.aqi_value >= min_aqi)
+        normalized['min_aqi'] = min_aqi
+
+    max_aqi = args.get('max_aqi', type=int)
+    if max_aqi is not None:
+        criteria.append(AQIMeasurement.aqi_value <= max_aqi)
+        normalized['max_aqi'] = max_aqi
+
+    bbox = args.get('bbox')
+    if bbox:
+        box_criteria, normalized['bbox'] = bbox_criteria(bbox, AQIMeasurement)
+        criteria.extend(box_criteria)
+
+    return criteria, normalized
+
+
+def latest_aqi_filters(args):
+    """Build latest_aqi WHERE criteria from request args (see disaster_filters)"""
+    criteria = []
+    normalized = {}
+
+    city_ids = args.get('city_ids')  # Comma-separated
+    if city_ids:
+        try:
+            ids = sorted(int(x.strip()) for x in city_ids.split(','))
+        except ValueError:
+            raise FilterError('Invalid city_ids', 'city_ids must be comma-separated integers')
+        criteria.append(LatestAQI.city_id.in_(ids))
+        normalized['city_ids'] = ids
+
+    min_aqi = args.get('min_aqi', type=int)
+    if min_aqi is not None:
+        criteria.append(LatestAQI.aqi_value >= min_aqi)
+        normalized['min_aqi'] = min_aqi
+
+    max_aqi = args.get('max_aqi', type=int)
+    if max_aqi is not None:
+        criteria.append(LatestAQI.aqi_value <= max_aqi)
+        normalized['max_aqi'] = max_aqi
+
+    bbox = args.get('bbox')
+    if bbox:
+        box_criteria, normalized['bbox'] = bbox_criteria(bbox, LatestAQI)
+        criteria.extend(box_criteria)
+
+    return criteria, normalized
+
+
+def city_filters(args):
+    """Build city WHERE criteria from request args (see disaster_filters)"""
+    criteria = []
+    normalized = {}
+
+    country = args.get('country')
+    if country:
+        criteria.append(func.lower(City.country).like(f'%{country.lower()}%'))
+        normalized['country'] = country.lower()
+
+    country_code = args.get('country_code')
+    if country_code:
+        criteria.append(City.country_code == country_code.upper())
+        normalized['country_code'] = country_code.upper()
+
+    search = args.get('search')
+    if search:
+        # lower(...) LIKE matches the pg_trgm GIN indexes on lower(name)/lower(country)
+        pattern = f'%{search.lower()}%'
+        criteria.append(or_(
+            func.lower(City.name).like(pattern),
+            func.lower(City.country).like(pattern)
+        ))
+        normalized['search'] = search.lower()
+
+    bbox = args.get('bbox')
+    if bbox:
+        box_criteria, normalized['bbox'] = bbox_criteria(bbox, City)
+        criteria.extend(box_criteria)
+
+    return criteria, normalized
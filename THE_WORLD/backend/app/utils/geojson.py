@@ -0,0 +1,84 @@
+"""
+THE_WORLD - GeoJSON Utilities
+FeatureCollections generated by PostGIS and streamed without Python-side parsing
+"""
+
+import json
+from sqlalchemy import select, func, literal_column
+from app.models import City, Disaster, AQIMeasurement
+from app.utils.streaming import stream_rows
+
+
+def _point_geom(model):
+    """Stored geometry, or a point built from the coordinates when missing"""
+    return func.coalesce(
+        model.geom,
+        func.ST_SetSRID(func.ST_MakePoint(model.longitude, model.latitude), 4326)
+    ).label('geom')
+
+
+def _feature_statement(columns, model, time_column, criteria, limit):
+    """SELECT one Feature JSON text per row, newest first.
+
+    ST_AsGeoJSON(record) turns every non-geometry column of the subquery
+    into a feature property, so Python only concatenates the text.
+    """
+    rows = (
+        select(*columns, _point_geom(model))
+        .where(*criteria)
+        .order_by(time_column.desc(), model.id.desc())
+    )
+    if limit:
+        rows = rows.limit(limit)
+    rows = rows.subquery('f')
+    return select(
+        func.ST_AsGeoJSON(literal_column('f.*'), 'geom', 6).label('feature')
+    ).select_from(rows).order_by(
+        rows.c[time_column.key].desc(), rows.c.id.desc()
+    )
+
+
+def disaster_features(criteria, limit=None):
+    """Feature statement for disasters (properties match Disaster.to_dict)"""
+    columns = [
+        Disaster.id, Disaster.disaster_type, Disaster.title, Disaster.description,
+        Disaster.occurred_at, Disaster.magnitude, Disaster.severity, Disaster.status,
+        Disaster.source, Disaster.source_id, Disaster.url,
+        Disaster.created_at, Disaster.updated_at, Disaster.data_fetched_at
+    ]
+    return _feature_statement(columns, Disaster, Disaster.occurred_at, criteria, limit)
+
+
+def aqi_features(criteria, limit=None):
+    """Feature statement for AQI measurements (properties match AQIMeasurement.to_dict)"""
+    columns = [
+        AQIMeasurement.id, AQIMeasurement.city_id, AQIMeasurement.city_name,
+        AQIMeasurement.measured_at, AQIMeasurement.aqi_value, AQIMeasurement.aqi_category,
+        AQIMeasurement.pm25, AQIMeasurement.pm10, AQIMeasurement.o3,
+        AQIMeasurement.no2, AQIMeasurement.co, AQIMeasurement.so2,
+        AQIMeasurement.source, AQIMeasurement.url,
+        AQIMeasurement.created_at, AQIMeasurement.updated_at
+    ]
+    return _feature_statement(columns, AQIMeasurement, AQIMeasurement.measured_at, criteria, limit)
+
+
+def city_features(criteria, limit=None):
+    """Feature statement for cities (properties match City.to_dict)"""
+    columns = [
+        City.id, City.name, City.country, City.country_code, City.population,
+        City.timezone, City.created_at, City.updated_at
+    ]
+    return _feature_statement(columns, City, City.created_at, criteria, limit)
+
+
+def feature_collection_stream(statement, metadata=None, snapshot=None):
+    """Yield a FeatureCollection chunk by chunk from a feature statement"""
+    yield '{"type":"FeatureCollection",'
+    if metadata:
+        yield f'"metadata":{json.dumps(metadata)},'
+    yield '"features":['
+    separator = ''
+    for rows in stream_rows(statement, snapshot=snapshot):
+        yield separator + ','.join(row[0] for row in rows)
+        separator = ','
+    yield ']}'
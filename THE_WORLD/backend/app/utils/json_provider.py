@@ -0,0 +1,56 @@
+"""
+THE_WORLD - JSON Provider
+orjson-backed Flask JSON provider (orjson is in requirements.txt)
+"""
+
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+# Falls back to Flask's stdlib provider if orjson is missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    """Types orjson does not serialize natively"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson.
+
+    Keys keep insertion order (the order to_dict and the row serializers
+    build them in); datetimes are written as ISO 8601 like ``isoformat()``.
+    """
+
+    sort_keys = False
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        option = self.option | (orjson.OPT_SORT_KEYS if kwargs.get('sort_keys') else 0)
+        return orjson.dumps(obj, default=_default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=self.option | orjson.OPT_APPEND_NEWLINE),
+            mimetype=self.mimetype
+        )
+
+
+def init_json(app):
+    """Use the orjson provider for jsonify and request.get_json when available"""
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
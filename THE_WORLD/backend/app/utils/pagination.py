@@ -0,0 +1,51 @@
+"""
+THE_WORLD - Pagination Utilities
+Opaque keyset (cursor) pagination over (timestamp, id) ordered queries
+"""
+
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+
+def encode_cursor(timestamp, row_id):
+    """Encode the (timestamp, id) of the last row on a page as an opaque cursor"""
+    raw = json.dumps([timestamp.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor back into (timestamp, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def paginate_keyset(query, time_column, id_column, limit, cursor=None, offset=0):
+    """Fetch one page ordered by (time, id) descending.
+
+    With a cursor the page starts right after the encoded row using a
+    row-value seek predicate, which the (time, id) index resolves without
+    scanning earlier pages. Without a cursor the legacy offset is applied.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    query = query.order_by(time_column.desc(), id_column.desc())
+
+    if cursor:
+        after_time, after_id = decode_cursor(cursor)
+        query = query.filter(tuple_(time_column, id_column) < tuple_(after_time, after_id))
+    elif offset:
+        query = query.offset(offset)
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.limit(limit + 1).all()
+    page = rows[:limit]
+    if len(rows) <= limit or not page:
+        return page, None
+
+    last = page[-1]
+    return page, encode_cursor(getattr(last, time_column.key), getattr(last, id_column.key))
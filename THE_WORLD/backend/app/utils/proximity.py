@@ -0,0 +1,55 @@
+"""
+THE_WORLD - Proximity Utilities
+Radius and nearest-neighbour lookups on geography GIST indexes
+"""
+
+from sqlalchemy import func, Float
+from app.database import db
+from app.config import Config
+from app.utils.filters import FilterError
+
+
+def parse_near_args(args):
+    """Read lat, lon, optional radius_km and k from request args"""
+    lat = args.get('lat', type=float)
+    lon = args.get('lon', type=float)
+    if lat is None or lon is None:
+        raise FilterError('Missing coordinates', 'lat and lon are required')
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise FilterError('Invalid coordinates', 'lat must be between -90 and 90 and lon between -180 and 180')
+
+    radius_km = args.get('radius_km', type=float)
+    if radius_km is not None and not 0 < radius_km <= Config.NEAR_MAX_RADIUS_KM:
+        raise FilterError('Invalid radius_km', f'radius_km must be between 0 and {Config.NEAR_MAX_RADIUS_KM}')
+
+    k = args.get('k', Config.NEAR_DEFAULT_K, type=int)
+    if not 1 <= k <= Config.NEAR_MAX_K:
+        raise FilterError('Invalid k', f'k must be between 1 and {Config.NEAR_MAX_K}')
+
+    return lat, lon, radius_km, k
+
+
+def nearest(model, criteria, lat, lon, radius_km=None, k=Config.NEAR_DEFAULT_K):
+    """The k rows nearest to (lat, lon), optionally within radius_km.
+
+    Both ST_DWithin and the ``<->`` ordering run on ``geography(geom)`` so the
+    expression GIST index answers them; the ``<->`` value is also the reported
+    distance, which keeps the results in the order they are returned.
+    Returns a list of (row, distance_km) tuples.
+    """
+    # Same expression as the idx_<table>_geog indexes
+    geog = func.geography(model.geom)
+    origin = func.geography(func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326))
+    distance = geog.op('<->', return_type=Float)(origin)
+
+    query = db.session.query(model, (distance / 1000.0).label('distance_km')).filter(
+        model.geom.isnot(None), *criteria
+    )
+    if radius_km is not None:
+        query = query.filter(func.ST_DWithin(geog, origin, radius_km * 1000.0))
+    return [(row, round(float(km), 3)) for row, km in query.order_by(distance).limit(k).all()]
+
+
+def near_response_data(results):
+    """Serialize (row, distance_km) pairs, nearest first"""
+    return [dict(row.to_dict(), distance_km=km) for row, km in results]
@@ -0,0 +1,82 @@
+"""
+THE_WORLD - Row Serializers
+Column lists plus precompiled tuple encoders producing the same dicts as
+the models' to_dict(), for list endpoints that skip ORM object loading
+"""
+
+from sqlalchemy import Numeric, DateTime
+
+from app.models import City, Disaster, AQIMeasurement, LatestAQI
+
+
+def _number(value):
+    return float(value) if value else None
+
+
+def _timestamp(value):
+    return value.isoformat() if value else None
+
+
+def _encoder(column):
+    """Per-column conversion, chosen once from the column type"""
+    if isinstance(column.type, Numeric):
+        return _number
+    if isinstance(column.type, DateTime):
+        return _timestamp
+    return None
+
+
+class RowSerializer:
+    """Columns to select and a tuple -> dict encoder for their rows.
+
+    Conversions are resolved when the serializer is built, so encoding a
+    row is a single pass over the columns that need one.
+    """
+
+    def __init__(self, *columns):
+        self.columns = columns
+        self.keys = tuple(column.key for column in columns)
+        self.converters = tuple(
+            (position, encoder)
+            for position, encoder in enumerate(_encoder(column) for column in columns)
+            if encoder is not None
+        )
+
+    def __call__(self, row):
+        values = list(row)
+        for position, encoder in self.converters:
+            values[position] = encoder(values[position])
+        return dict(zip(self.keys, values))
+
+
+disaster_rows = RowSerializer(
+    Disaster.id, Disaster.disaster_type, Disaster.title, Disaster.description,
+    Disaster.latitude, Disaster.longitude, Disaster.occurred_at, Disaster.magnitude,
+    Disaster.severity, Disaster.status, Disaster.source, Disaster.source_id, Disaster.url,
+    Disaster.created_at, Disaster.updated_at, Disaster.data_fetched_at
+)
+
+aqi_rows = RowSerializer(
+    AQIMeasurement.id, AQIMeasurement.city_id, AQIMeasurement.city_name,
+    AQIMeasurement.latitude, AQIMeasurement.longitude, AQIMeasurement.measured_at,
+    AQIMeasurement.aqi_value, AQIMeasurement.aqi_category,
+    AQIMeasurement.pm25, AQIMeasurement.pm10, AQIMeasurement.o3,
+    AQIMeasurement.no2, AQIMeasurement.co, AQIMeasurement.so2,
+    AQIMeasurement.source, AQIMeasurement.url,
+    AQIMeasurement.created_at, AQIMeasurement.updated_at
+)
+
+latest_aqi_rows = RowSerializer(
+    LatestAQI.measurement_id.label('id'), LatestAQI.city_id, LatestAQI.city_name,
+    LatestAQI.latitude, LatestAQI.longitude, LatestAQI.measured_at,
+    LatestAQI.aqi_value, LatestAQI.aqi_category,
+    LatestAQI.pm25, LatestAQI.pm10, LatestAQI.o3,
+    LatestAQI.no2, LatestAQI.co, LatestAQI.so2,
+    LatestAQI.source, LatestAQI.url,
+    LatestAQI.created_at, LatestAQI.updated_at
+)
+
+city_rows = RowSerializer(
+    City.id, City.name, City.country, City.country_code, City.latitude, City.longitude,
+    City.population, City.timezone, City.created_at, City.updated_at
+)
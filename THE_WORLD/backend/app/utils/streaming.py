@@ -0,0 +1,56 @@
+"""
+THE_WORLD - Streaming Utilities
+Server-side cursor iteration for responses that must not buffer whole tables
+"""
+
+from app.database import db
+from app.config import Config
+
+
+class Snapshot:
+    """Read-only REPEATABLE READ transaction shared by several streamed statements.
+
+    Every statement streamed through the snapshot sees the same committed
+    data; ``rows`` counts the rows yielded so far.
+    """
+
+    def __init__(self):
+        self.connection = None
+        self.rows = 0
+
+    def __enter__(self):
+        self.connection = db.engine.connect().execution_options(
+            isolation_level='REPEATABLE READ',
+            postgresql_readonly=True
+        )
+        self.connection.begin()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.connection.close()  # Rolls back the read-only transaction
+
+
+def _partitions(connection, statement, chunk_size, snapshot=None):
+    result = connection.execution_options(
+        stream_results=True,
+        max_row_buffer=chunk_size
+    ).execute(statement)
+    for rows in result.partitions(chunk_size):
+        if snapshot is not None:
+            snapshot.rows += len(rows)
+        yield rows
+
+
+def stream_rows(statement, chunk_size=None, snapshot=None):
+    """Yield lists of rows fetched in chunks from a server-side (named) cursor.
+
+    Uses its own connection (or the snapshot's) so the generator can outlive
+    the request's ORM session; wrap the consuming generator in
+    ``stream_with_context``.
+    """
+    chunk_size = chunk_size or Config.STREAM_CHUNK_SIZE
+    if snapshot is not None:
+        yield from _partitions(snapshot.connection, statement, chunk_size, snapshot)
+        return
+    with db.engine.connect() as connection:
+        yield from _partitions(connection, statement, chunk_size)
@@ -0,0 +1,118 @@
+"""
+THE_WORLD - Vector Tile Utilities
+Mapbox Vector Tiles rendered by PostGIS (ST_AsMVT) with a versioned tile cache
+"""
+
+import hashlib
+import json
+from flask import Response
+from sqlalchemy import select, func, cast, literal_column, Float, Text
+from app.database import db
+from app.config import Config
+from app.models import Disaster, AQIMeasurement, DataVersion
+from app.utils.cache import TTLCache
+from app.utils.filters import FilterError
+
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+MVT_MIMETYPE = 'application/vnd.mapbox-vector-tile'
+
+# Keyed by data version as well as filters: an ingest bumps the version,
+# so tiles rendered before it are never served after it.
+_tile_cache = TTLCache(maxsize=Config.TILE_CACHE_SIZE, ttl=Config.TILE_CACHE_TTL,
+                       max_bytes=Config.TILE_CACHE_MAX_BYTES)
+
+
+def _disaster_columns():
+    return [
+        Disaster.id,
+        Disaster.disaster_type,
+        Disaster.title,
+        cast(Disaster.magnitude, Float).label('magnitude'),
+        Disaster.severity,
+        Disaster.status,
+        Disaster.source,
+        cast(Disaster.occurred_at, Text).label('occurred_at')
+    ]
+
+
+def _aqi_columns():
+    return [
+        AQIMeasurement.id,
+        AQIMeasurement.city_id,
+        AQIMeasurement.city_name,
+        AQIMeasurement.aqi_value,
+        AQIMeasurement.aqi_category,
+        cast(AQIMeasurement.pm25, Float).label('pm25'),
+        AQIMeasurement.source,
+        cast(AQIMeasurement.measured_at, Text).label('measured_at')
+    ]
+
+
+# layer name -> (model, versioned table, tile property columns)
+TILE_LAYERS = {
+    'disasters': (Disaster, 'disasters', _disaster_columns),
+    'aqi': (AQIMeasurement, 'aqi_measurements', _aqi_columns)
+}
+
+
+def validate_tile(z, x, y):
+    """Reject tile coordinates outside the XYZ pyramid"""
+    if not 0 <= z <= Config.TILE_MAX_ZOOM:
+        raise FilterError('Invalid tile', f'Zoom must be between 0 and {Config.TILE_MAX_ZOOM}')
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise FilterError('Invalid tile', f'x and y must be between 0 and {2 ** z - 1} at zoom {z}')
+
+
+def filter_hash(filters):
+    """Stable short hash of normalized filters"""
+    raw = json.dumps(filters, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def tile_statement(layer, criteria, z, x, y):
+    """ST_AsMVT over the features intersecting tile z/x/y"""
+    model, _, columns = TILE_LAYERS[layer]
+    envelope = func.ST_TileEnvelope(z, x, y)
+
+    features = (
+        select(
+            func.ST_AsMVTGeom(
+                func.ST_Transform(model.geom, 3857), envelope, MVT_EXTENT, MVT_BUFFER, True
+            ).label('geom'),
+            *columns()
+        )
+        # && on the 4326 envelope lets the GIST index on geom pick candidates
+        .where(model.geom.op('&&')(func.ST_Transform(envelope, 4326)), *criteria)
+        .order_by(model.id)
+        .limit(Config.TILE_MAX_FEATURES)
+        .subquery('t')
+    )
+    return select(
+        func.ST_AsMVT(literal_column('t.*'), layer, MVT_EXTENT, 'geom')
+    ).select_from(features)
+
+
+def render_tile(layer, criteria, filters, z, x, y):
+    """Tile bytes for a layer, served from the cache when the data is unchanged"""
+    validate_tile(z, x, y)
+    _, table, _ = TILE_LAYERS[layer]
+    version = DataVersion.current(table)[table][0]
+    key = (layer, z, x, y, filter_hash(filters), version)
+
+    tile = _tile_cache.get(key)
+    if tile is None:
+        tile = db.session.execute(tile_statement(layer, criteria, z, x, y)).scalar()
+        tile = bytes(tile) if tile else b''
+        if len(tile) <= Config.TILE_CACHE_MAX_TILE_BYTES:
+            _tile_cache.set(key, tile)
+    return tile
+
+
+def tile_response(tile):
+    """Wrap tile bytes in a response (204 for empty tiles)"""
+    if not tile:
+        return Response(status=204)
+    response = Response(tile, mimetype=MVT_MIMETYPE)
+    response.headers['Cache-Control'] = f'public, max-age={Config.TILE_CLIENT_MAX_AGE}'
+    return response
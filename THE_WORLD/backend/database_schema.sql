@@ -4,6 +4,7 @@
 
 -- Enable PostGIS extension
 CREATE EXTENSION IF NOT EXISTS postgis;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 -- ============================================
 -- CITIES TABLE
@@ -19,12 +20,18 @@ CREATE TABLE IF NOT EXISTS cities (
     boundary GEOMETRY(POLYGON, 4326),
     population INTEGER,
     timezone VARCHAR(50),
+    geonames_id INTEGER,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- GeoNames id: upsert key for import_geonames.py (NULL for hand-entered cities)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cities_geonames_id ON cities (geonames_id);
+
 -- Create spatial index on point geometry
 CREATE INDEX IF NOT EXISTS idx_cities_geom ON cities USING GIST (geom);
+-- Geography index: ST_DWithin(geography(geom), ...) radius and <-> nearest-neighbour queries
+CREATE INDEX IF NOT EXISTS idx_cities_geog ON cities USING GIST (geography(geom));
 
 -- Create spatial index on boundary polygon
 CREATE INDEX IF NOT EXISTS idx_cities_boundary ON cities USING GIST (boundary);
@@ -33,6 +40,10 @@ CREATE INDEX IF NOT EXISTS idx_cities_boundary ON cities USING GIST (boundary);
 CREATE INDEX IF NOT EXISTS idx_cities_name ON cities (name);
 CREATE INDEX IF NOT EXISTS idx_cities_country ON cities (country);
 CREATE INDEX IF NOT EXISTS idx_cities_country_code ON cities (country_code);
+-- City search: substring/fuzzy (pg_trgm) and prefix (typeahead) matches
+CREATE INDEX IF NOT EXISTS idx_cities_name_trgm ON cities USING GIN (lower(name) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_cities_country_trgm ON cities USING GIN (lower(country) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_cities_name_prefix ON cities (lower(name) text_pattern_ops);
 
 -- ============================================
 -- DISASTERS TABLE
@@ -63,6 +74,7 @@ CREATE TABLE IF NOT EXISTS disasters (
 
 -- Create spatial index on point geometry
 CREATE INDEX IF NOT EXISTS idx_disasters_geom ON disasters USING GIST (geom);
+CREATE INDEX IF NOT EXISTS idx_disasters_geog ON disasters USING GIST (geography(geom));
 
 -- Create indexes for common queries
 CREATE INDEX IF NOT EXISTS idx_disasters_type ON disasters (disaster_type);
@@ -70,6 +82,13 @@ CREATE INDEX IF NOT EXISTS idx_disasters_occurred_at ON disasters (occurred_at);
 CREATE INDEX IF NOT EXISTS idx_disasters_source_id ON disasters (source, source_id);
 CREATE INDEX IF NOT EXISTS idx_disasters_status ON disasters (status);
 CREATE INDEX IF NOT EXISTS idx_disasters_type_date ON disasters (disaster_type, occurred_at);
+-- Keyset pagination: WHERE (occurred_at, id) < (:ts, :id) ORDER BY occurred_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_disasters_occurred_id ON disasters (occurred_at DESC, id DESC);
+
+-- Cluster cell key, computed at insert time; prefixes are grouped by zoom
+ALTER TABLE disasters ADD COLUMN IF NOT EXISTS geohash VARCHAR(12)
+    GENERATED ALWAYS AS (ST_GeoHash(geom, 12)) STORED;
+CREATE INDEX IF NOT EXISTS idx_disasters_geohash ON disasters (geohash varchar_pattern_ops);
 
 -- ============================================
 -- AQI MEASUREMENTS TABLE
@@ -100,6 +119,7 @@ CREATE TABLE IF NOT EXISTS aqi_measurements (
 
 -- Create spatial index on point geometry
 CREATE INDEX IF NOT EXISTS idx_aqi_measurements_geom ON aqi_measurements USING GIST (geom);
+CREATE INDEX IF NOT EXISTS idx_aqi_measurements_geog ON aqi_measurements USING GIST (geography(geom));
 
 -- Create indexes for common queries
 CREATE INDEX IF NOT EXISTS idx_aqi_measurements_city_id ON aqi_measurements (city_id);
@@ -108,6 +128,730 @@ CREATE INDEX IF NOT EXISTS idx_aqi_measurements_city_date ON aqi_measurements (c
 CREATE INDEX IF NOT EXISTS idx_aqi_measurements_aqi_value ON aqi_measurements (aqi_value);
 CREATE INDEX IF NOT EXISTS idx_aqi_measurements_city_time ON aqi_measurements (city_id, measured_at DESC);
 CREATE INDEX IF NOT EXISTS idx_aqi_measurements_city_name ON aqi_measurements (city_name);
+-- Keyset pagination: WHERE (measured_at, id) < (:ts, :id) ORDER BY measured_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_aqi_measurements_measured_id ON aqi_measurements (measured_at DESC, id DESC);
+
+-- ============================================
+-- LATEST AQI TABLE (latest measurement per city/station)
+-- ============================================
+CREATE TABLE IF NOT EXISTS latest_aqi (
+    station_key VARCHAR(300) PRIMARY KEY,
+    measurement_id INTEGER NOT NULL REFERENCES aqi_measurements(id) ON DELETE CASCADE,
+    city_id INTEGER REFERENCES cities(id) ON DELETE SET NULL,
+    city_name VARCHAR(255),
+    latitude DECIMAL(10, 8) NOT NULL,
+    longitude DECIMAL(11, 8) NOT NULL,
+    geom GEOMETRY(POINT, 4326),
+    measured_at TIMESTAMP NOT NULL,
+    aqi_value INTEGER,
+    aqi_category VARCHAR(50),
+    pm25 DECIMAL(8, 2),
+    pm10 DECIMAL(8, 2),
+    o3 DECIMAL(8, 2),
+    no2 DECIMAL(8, 2),
+    co DECIMAL(8, 2),
+    so2 DECIMAL(8, 2),
+    source VARCHAR(255),
+    url TEXT,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_latest_aqi_city_id ON latest_aqi (city_id);
+CREATE INDEX IF NOT EXISTS idx_latest_aqi_city_name ON latest_aqi (city_name);
+CREATE INDEX IF NOT EXISTS idx_latest_aqi_geom ON latest_aqi USING GIST (geom);
+CREATE INDEX IF NOT EXISTS idx_latest_aqi_geog ON latest_aqi USING GIST (geography(geom));
+
+ALTER TABLE latest_aqi ADD COLUMN IF NOT EXISTS geohash VARCHAR(12)
+    GENERATED ALWAYS AS (ST_GeoHash(geom, 12)) STORED;
+CREATE INDEX IF NOT EXISTS idx_latest_aqi_geohash ON latest_aqi (geohash varchar_pattern_ops);
+
+-- Station key: matched city id, else station name, else coordinates
+CREATE OR REPLACE FUNCTION latest_aqi_station_key(
+    p_city_id INTEGER, p_city_name TEXT, p_latitude NUMERIC, p_longitude NUMERIC
+)
+RETURNS TEXT AS $$
+    SELECT COALESCE(
+        'city:' || p_city_id,
+        'name:' || p_city_name,
+        'point:' || p_latitude || ',' || p_longitude
+    )
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Upsert the station's row whenever a newer measurement lands
+CREATE OR REPLACE FUNCTION upsert_latest_aqi()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO latest_aqi (
+        station_key, measurement_id, city_id, city_name, latitude, longitude, geom,
+        measured_at, aqi_value, aqi_category, pm25, pm10, o3, no2, co, so2,
+        source, url, created_at, updated_at
+    )
+    VALUES (
+        latest_aqi_station_key(NEW.city_id, NEW.city_name, NEW.latitude, NEW.longitude),
+        NEW.id, NEW.city_id, NEW.city_name, NEW.latitude, NEW.longitude, NEW.geom,
+        NEW.measured_at, NEW.aqi_value, NEW.aqi_category,
+        NEW.pm25, NEW.pm10, NEW.o3, NEW.no2, NEW.co, NEW.so2,
+        NEW.source, NEW.url, NEW.created_at, CURRENT_TIMESTAMP
+    )
+    ON CONFLICT (station_key) DO UPDATE SET
+        measurement_id = EXCLUDED.measurement_id,
+        city_id = EXCLUDED.city_id,
+        city_name = EXCLUDED.city_name,
+        latitude = EXCLUDED.latitude,
+        longitude = EXCLUDED.longitude,
+        geom = EXCLUDED.geom,
+        measured_at = EXCLUDED.measured_at,
+        aqi_value = EXCLUDED.aqi_value,
+        aqi_category = EXCLUDED.aqi_category,
+        pm25 = EXCLUDED.pm25,
+        pm10 = EXCLUDED.pm10,
+        o3 = EXCLUDED.o3,
+        no2 = EXCLUDED.no2,
+        co = EXCLUDED.co,
+        so2 = EXCLUDED.so2,
+        source = EXCLUDED.source,
+        url = EXCLUDED.url,
+        created_at = EXCLUDED.created_at,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE latest_aqi.measured_at < EXCLUDED.measured_at
+       OR latest_aqi.measurement_id = EXCLUDED.measurement_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS upsert_latest_aqi ON aqi_measurements;
+CREATE TRIGGER upsert_latest_aqi
+    AFTER INSERT OR UPDATE ON aqi_measurements
+    FOR EACH ROW EXECUTE FUNCTION upsert_latest_aqi();
+
+-- Newest measurement per station key for refresh_latest_aqi
+CREATE INDEX IF NOT EXISTS idx_aqi_measurements_station_key
+    ON aqi_measurements (latest_aqi_station_key(city_id, city_name, latitude, longitude), measured_at DESC, id DESC);
+
+-- Point the given stations at their newest remaining measurement (moving back
+-- in time if needed) and drop stations with none left
+CREATE OR REPLACE FUNCTION refresh_latest_aqi(p_station_keys TEXT[])
+RETURNS VOID AS $$
+BEGIN
+    WITH fresh AS (
+        INSERT INTO latest_aqi (
+            station_key, measurement_id, city_id, city_name, latitude, longitude, geom,
+            measured_at, aqi_value, aqi_category, pm25, pm10, o3, no2, co, so2,
+            source, url, created_at, updated_at
+        )
+        SELECT DISTINCT ON (station_key)
+            station_key, id, city_id, city_name, latitude, longitude, geom,
+            measured_at, aqi_value, aqi_category, pm25, pm10, o3, no2, co, so2,
+            source, url, created_at, CURRENT_TIMESTAMP
+        FROM (
+            SELECT latest_aqi_station_key(city_id, city_name, latitude, longitude) AS station_key, m.*
+            FROM aqi_measurements m
+        ) keyed
+        WHERE station_key = ANY(p_station_keys)
+        ORDER BY station_key, measured_at DESC, id DESC
+        ON CONFLICT (station_key) DO UPDATE SET
+            measurement_id = EXCLUDED.measurement_id,
+            city_id = EXCLUDED.city_id,
+            city_name = EXCLUDED.city_name,
+            latitude = EXCLUDED.latitude,
+            longitude = EXCLUDED.longitude,
+            geom = EXCLUDED.geom,
+            measured_at = EXCLUDED.measured_at,
+            aqi_value = EXCLUDED.aqi_value,
+            aqi_category = EXCLUDED.aqi_category,
+            pm25 = EXCLUDED.pm25,
+            pm10 = EXCLUDED.pm10,
+            o3 = EXCLUDED.o3,
+            no2 = EXCLUDED.no2,
+            co = EXCLUDED.co,
+            so2 = EXCLUDED.so2,
+            source = EXCLUDED.source,
+            url = EXCLUDED.url,
+            created_at = EXCLUDED.created_at,
+            updated_at = EXCLUDED.updated_at
+        RETURNING station_key
+    )
+    DELETE FROM latest_aqi
+    WHERE station_key = ANY(p_station_keys)
+      AND station_key NOT IN (SELECT station_key FROM fresh);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Deleting a station's newest measurement (its latest_aqi row goes with it
+-- through the FK cascade) falls back to the previous one; moving a
+-- measurement to another station or time recomputes both stations
+CREATE OR REPLACE FUNCTION latest_aqi_on_measurement_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM refresh_latest_aqi(ARRAY(
+            SELECT DISTINCT keyed.station_key
+            FROM (
+                SELECT id, latest_aqi_station_key(city_id, city_name, latitude, longitude) AS station_key
+                FROM old_rows
+            ) keyed
+            LEFT JOIN latest_aqi l ON l.station_key = keyed.station_key
+            WHERE l.station_key IS NULL OR l.measurement_id IN (SELECT id FROM old_rows)
+        ));
+    ELSE
+        PERFORM refresh_latest_aqi(ARRAY(
+            SELECT latest_aqi_station_key(o.city_id, o.city_name, o.latitude, o.longitude)
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE (n.city_id, n.city_name, n.latitude, n.longitude, n.measured_at)
+                  IS DISTINCT FROM (o.city_id, o.city_name, o.latitude, o.longitude, o.measured_at)
+            UNION
+            SELECT latest_aqi_station_key(n.city_id, n.city_name, n.latitude, n.longitude)
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE (n.city_id, n.city_name, n.latitude, n.longitude, n.measured_at)
+                  IS DISTINCT FROM (o.city_id, o.city_name, o.latitude, o.longitude, o.measured_at)
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS latest_aqi_measurements_update ON aqi_measurements;
+CREATE TRIGGER latest_aqi_measurements_update
+    AFTER UPDATE ON aqi_measurements
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION latest_aqi_on_measurement_change();
+
+DROP TRIGGER IF EXISTS latest_aqi_measurements_delete ON aqi_measurements;
+CREATE TRIGGER latest_aqi_measurements_delete
+    AFTER DELETE ON aqi_measurements
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION latest_aqi_on_measurement_change();
+
+-- ============================================
+-- FETCH JOBS TABLE (background job queue)
+-- ============================================
+CREATE TABLE IF NOT EXISTS fetch_jobs (
+    id SERIAL PRIMARY KEY,
+    job_type VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    params JSONB NOT NULL DEFAULT '{}',
+    progress JSONB,
+    result JSONB,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker_id VARCHAR(255),
+    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Workers claim the oldest runnable job with FOR UPDATE SKIP LOCKED
+CREATE INDEX IF NOT EXISTS idx_fetch_jobs_queue ON fetch_jobs (status, job_type, run_after);
+
+-- ============================================
+-- CHAT MESSAGES (chatbot conversation history)
+-- ============================================
+-- Shared by all API workers; trimmed per conversation on every append and
+-- swept for idle conversations (CHATBOT_CONVERSATION_TTL)
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id BIGSERIAL PRIMARY KEY,
+    conversation_id VARCHAR(100) NOT NULL,
+    role VARCHAR(20) NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_chat_messages_conversation ON chat_messages (conversation_id, id);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_created_at ON chat_messages (created_at);
+
+-- ============================================
+-- SCHEMA MIGRATIONS (one-time data backfills)
+-- ============================================
+-- Names of the backfills in app/schema.py MIGRATIONS already applied; a
+-- database created from this file has nothing to backfill
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    name VARCHAR(100) PRIMARY KEY,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================
+-- DATA VERSIONS (per-table change counters)
+-- ============================================
+-- Bumped by statement-level triggers on every write; used to key and
+-- invalidate count, tile and response caches
+CREATE TABLE IF NOT EXISTS data_versions (
+    table_name VARCHAR(100) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT timezone('utc', now())  -- UTC
+);
+
+CREATE OR REPLACE FUNCTION bump_data_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO data_versions (table_name, version, updated_at)
+    VALUES (TG_TABLE_NAME, 1, timezone('utc', now()))
+    ON CONFLICT (table_name) DO UPDATE
+    SET version = data_versions.version + 1,
+        updated_at = timezone('utc', now());
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS bump_cities_version ON cities;
+CREATE TRIGGER bump_cities_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON cities
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+
+DROP TRIGGER IF EXISTS bump_disasters_version ON disasters;
+CREATE TRIGGER bump_disasters_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON disasters
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+
+DROP TRIGGER IF EXISTS bump_aqi_measurements_version ON aqi_measurements;
+CREATE TRIGGER bump_aqi_measurements_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON aqi_measurements
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+
+-- ============================================
+-- POINT GEOMETRY FROM COORDINATES
+-- ============================================
+-- Spatial filters (geom && envelope, ST_Intersects, ST_DWithin) use the GIST
+-- indexes on geom, so geom is filled from latitude/longitude on every write
+CREATE OR REPLACE FUNCTION fill_point_geom()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+       AND (NEW.geom IS NULL OR TG_OP = 'UPDATE') THEN
+        NEW.geom := ST_SetSRID(ST_MakePoint(NEW.longitude, NEW.latitude), 4326);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS fill_cities_geom ON cities;
+CREATE TRIGGER fill_cities_geom
+    BEFORE INSERT OR UPDATE OF latitude, longitude ON cities
+    FOR EACH ROW EXECUTE FUNCTION fill_point_geom();
+
+DROP TRIGGER IF EXISTS fill_disasters_geom ON disasters;
+CREATE TRIGGER fill_disasters_geom
+    BEFORE INSERT OR UPDATE OF latitude, longitude ON disasters
+    FOR EACH ROW EXECUTE FUNCTION fill_point_geom();
+
+DROP TRIGGER IF EXISTS fill_aqi_measurements_geom ON aqi_measurements;
+CREATE TRIGGER fill_aqi_measurements_geom
+    BEFORE INSERT OR UPDATE OF latitude, longitude ON aqi_measurements
+    FOR EACH ROW EXECUTE FUNCTION fill_point_geom();
+
+-- ============================================
+-- DISASTER AQI IMPACT (precomputed correlation)
+-- ============================================
+-- Per disaster and station within the impact distance: AQI sums/counts over
+-- the window before and after the disaster (impact_* functions below), with
+-- averages and percent change generated from them. Maintained by the
+-- statement-level triggers below.
+CREATE TABLE IF NOT EXISTS disaster_aqi_impact (
+    disaster_id INTEGER NOT NULL REFERENCES disasters(id) ON DELETE CASCADE,
+    station_key VARCHAR(300) NOT NULL,
+    city_id INTEGER REFERENCES cities(id) ON DELETE SET NULL,
+    city_name VARCHAR(255),
+    pre_sum BIGINT NOT NULL DEFAULT 0,
+    pre_count INTEGER NOT NULL DEFAULT 0,
+    post_sum BIGINT NOT NULL DEFAULT 0,
+    post_count INTEGER NOT NULL DEFAULT 0,
+    pre_avg NUMERIC GENERATED ALWAYS AS (
+        CASE WHEN pre_count > 0 THEN pre_sum::numeric / pre_count END
+    ) STORED,
+    post_avg NUMERIC GENERATED ALWAYS AS (
+        CASE WHEN post_count > 0 THEN post_sum::numeric / post_count END
+    ) STORED,
+    change_percent NUMERIC GENERATED ALWAYS AS (
+        CASE WHEN pre_count > 0 AND pre_sum > 0 AND post_count > 0 THEN
+            (post_sum::numeric / post_count - pre_sum::numeric / pre_count)
+            / (pre_sum::numeric / pre_count) * 100
+        END
+    ) STORED,
+    peak_aqi INTEGER,
+    peak_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (disaster_id, station_key)
+);
+
+CREATE INDEX IF NOT EXISTS ix_disaster_aqi_impact_city_id ON disaster_aqi_impact (city_id);
+CREATE INDEX IF NOT EXISTS idx_disaster_aqi_impact_change ON disaster_aqi_impact (change_percent);
+CREATE INDEX IF NOT EXISTS idx_disaster_aqi_impact_peak ON disaster_aqi_impact (peak_aqi);
+
+-- Impact window and distance (IMPACT_PRE_DAYS, IMPACT_POST_DAYS and
+-- IMPACT_DISTANCE_KM in app/config.py). The values below are the defaults;
+-- the backend replaces these functions with the configured values at startup
+CREATE OR REPLACE FUNCTION impact_pre_window()
+RETURNS INTERVAL AS $$ SELECT interval '7 days' $$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION impact_post_window()
+RETURNS INTERVAL AS $$ SELECT interval '30 days' $$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION impact_distance_m()
+RETURNS DOUBLE PRECISION AS $$ SELECT 100000.0::double precision $$ LANGUAGE sql IMMUTABLE;
+
+-- Recompute every impact row of the given disasters. Upserting (then deleting
+-- stations that no longer match) keeps a concurrent impact_merge_measurements
+-- upsert of the same rows from failing with a unique violation
+CREATE OR REPLACE FUNCTION refresh_disaster_aqi_impact(p_disaster_ids INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    WITH fresh AS (
+        INSERT INTO disaster_aqi_impact (
+            disaster_id, station_key, city_id, city_name,
+            pre_sum, pre_count, post_sum, post_count, peak_aqi, peak_at, updated_at
+        )
+        SELECT
+            d.id,
+            latest_aqi_station_key(a.city_id, a.city_name, a.latitude, a.longitude),
+            MIN(a.city_id),
+            MIN(a.city_name),
+            COALESCE(SUM(a.aqi_value) FILTER (WHERE a.measured_at < d.occurred_at), 0),
+            COUNT(*) FILTER (WHERE a.measured_at < d.occurred_at),
+            COALESCE(SUM(a.aqi_value) FILTER (WHERE a.measured_at >= d.occurred_at), 0),
+            COUNT(*) FILTER (WHERE a.measured_at >= d.occurred_at),
+            MAX(a.aqi_value) FILTER (WHERE a.measured_at >= d.occurred_at),
+            (ARRAY_AGG(a.measured_at ORDER BY a.aqi_value DESC, a.measured_at)
+                FILTER (WHERE a.measured_at >= d.occurred_at))[1],
+            CURRENT_TIMESTAMP
+        FROM disasters d
+        JOIN aqi_measurements a
+            ON a.measured_at >= d.occurred_at - impact_pre_window()
+           AND a.measured_at <= d.occurred_at + impact_post_window()
+           AND ST_DWithin(geography(a.geom), geography(d.geom), impact_distance_m())
+           AND a.aqi_value IS NOT NULL
+        WHERE d.id = ANY(p_disaster_ids)
+        GROUP BY 1, 2
+        ON CONFLICT (disaster_id, station_key) DO UPDATE SET
+            city_id = EXCLUDED.city_id,
+            city_name = EXCLUDED.city_name,
+            pre_sum = EXCLUDED.pre_sum,
+            pre_count = EXCLUDED.pre_count,
+            post_sum = EXCLUDED.post_sum,
+            post_count = EXCLUDED.post_count,
+            peak_aqi = EXCLUDED.peak_aqi,
+            peak_at = EXCLUDED.peak_at,
+            updated_at = EXCLUDED.updated_at
+        RETURNING disaster_id, station_key
+    )
+    DELETE FROM disaster_aqi_impact i
+    WHERE i.disaster_id = ANY(p_disaster_ids)
+      AND NOT EXISTS (
+          SELECT 1 FROM fresh f
+          WHERE f.disaster_id = i.disaster_id AND f.station_key = i.station_key
+      );
+END;
+$$ LANGUAGE plpgsql;
+
+-- New or moved disasters are recomputed from the measurement history
+CREATE OR REPLACE FUNCTION impact_on_disaster_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_disaster_aqi_impact(ARRAY(SELECT id FROM new_rows));
+    ELSE
+        PERFORM refresh_disaster_aqi_impact(ARRAY(
+            SELECT n.id FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.occurred_at IS DISTINCT FROM o.occurred_at
+               OR n.geom IS DISTINCT FROM o.geom
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- New measurements are merged into the running sums of every disaster whose
+-- window they fall in; the peak only moves up (earliest wins ties)
+CREATE OR REPLACE FUNCTION impact_merge_measurements()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO disaster_aqi_impact AS i (
+        disaster_id, station_key, city_id, city_name,
+        pre_sum, pre_count, post_sum, post_count, peak_aqi, peak_at, updated_at
+    )
+    SELECT
+        d.id,
+        latest_aqi_station_key(a.city_id, a.city_name, a.latitude, a.longitude),
+        MIN(a.city_id),
+        MIN(a.city_name),
+        COALESCE(SUM(a.aqi_value) FILTER (WHERE a.measured_at < d.occurred_at), 0),
+        COUNT(*) FILTER (WHERE a.measured_at < d.occurred_at),
+        COALESCE(SUM(a.aqi_value) FILTER (WHERE a.measured_at >= d.occurred_at), 0),
+        COUNT(*) FILTER (WHERE a.measured_at >= d.occurred_at),
+        MAX(a.aqi_value) FILTER (WHERE a.measured_at >= d.occurred_at),
+        (ARRAY_AGG(a.measured_at ORDER BY a.aqi_value DESC, a.measured_at)
+            FILTER (WHERE a.measured_at >= d.occurred_at))[1],
+        CURRENT_TIMESTAMP
+    FROM new_rows a
+    JOIN disasters d
+        ON a.measured_at >= d.occurred_at - impact_pre_window()
+       AND a.measured_at <= d.occurred_at + impact_post_window()
+       AND ST_DWithin(geography(a.geom), geography(d.geom), impact_distance_m())
+       AND a.aqi_value IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT (disaster_id, station_key) DO UPDATE SET
+        city_id = COALESCE(i.city_id, EXCLUDED.city_id),
+        city_name = COALESCE(i.city_name, EXCLUDED.city_name),
+        pre_sum = i.pre_sum + EXCLUDED.pre_sum,
+        pre_count = i.pre_count + EXCLUDED.pre_count,
+        post_sum = i.post_sum + EXCLUDED.post_sum,
+        post_count = i.post_count + EXCLUDED.post_count,
+        peak_at = CASE
+            WHEN EXCLUDED.peak_aqi IS NOT NULL AND (
+                i.peak_aqi IS NULL
+                OR EXCLUDED.peak_aqi > i.peak_aqi
+                OR (EXCLUDED.peak_aqi = i.peak_aqi AND EXCLUDED.peak_at < i.peak_at)
+            ) THEN EXCLUDED.peak_at
+            ELSE i.peak_at
+        END,
+        peak_aqi = GREATEST(i.peak_aqi, EXCLUDED.peak_aqi),
+        updated_at = CURRENT_TIMESTAMP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Edited or deleted measurements cannot be subtracted from a peak, so the
+-- disasters they touched are recomputed instead (updates that leave the
+-- window, value, location and station key alone change nothing)
+CREATE OR REPLACE FUNCTION impact_on_measurement_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM refresh_disaster_aqi_impact(ARRAY(
+            SELECT DISTINCT d.id
+            FROM old_rows a
+            JOIN disasters d
+                ON a.measured_at >= d.occurred_at - impact_pre_window()
+               AND a.measured_at <= d.occurred_at + impact_post_window()
+               AND ST_DWithin(geography(a.geom), geography(d.geom), impact_distance_m())
+               AND a.aqi_value IS NOT NULL
+        ));
+    ELSE
+        PERFORM refresh_disaster_aqi_impact(ARRAY(
+            WITH changed AS (
+                SELECT n.id FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE (n.measured_at, n.aqi_value, n.geom, n.city_id, n.city_name, n.latitude, n.longitude)
+                      IS DISTINCT FROM (o.measured_at, o.aqi_value, o.geom, o.city_id, o.city_name, o.latitude, o.longitude)
+            )
+            SELECT d.id
+            FROM old_rows a
+            JOIN changed c ON c.id = a.id
+            JOIN disasters d
+                ON a.measured_at >= d.occurred_at - impact_pre_window()
+               AND a.measured_at <= d.occurred_at + impact_post_window()
+               AND ST_DWithin(geography(a.geom), geography(d.geom), impact_distance_m())
+               AND a.aqi_value IS NOT NULL
+            UNION
+            SELECT d.id
+            FROM new_rows a
+            JOIN changed c ON c.id = a.id
+            JOIN disasters d
+                ON a.measured_at >= d.occurred_at - impact_pre_window()
+               AND a.measured_at <= d.occurred_at + impact_post_window()
+               AND ST_DWithin(geography(a.geom), geography(d.geom), impact_distance_m())
+               AND a.aqi_value IS NOT NULL
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS impact_disasters_insert ON disasters;
+CREATE TRIGGER impact_disasters_insert
+    AFTER INSERT ON disasters
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION impact_on_disaster_change();
+
+DROP TRIGGER IF EXISTS impact_disasters_update ON disasters;
+CREATE TRIGGER impact_disasters_update
+    AFTER UPDATE ON disasters
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION impact_on_disaster_change();
+
+DROP TRIGGER IF EXISTS impact_aqi_insert ON aqi_measurements;
+CREATE TRIGGER impact_aqi_insert
+    AFTER INSERT ON aqi_measurements
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION impact_merge_measurements();
+
+DROP TRIGGER IF EXISTS impact_aqi_update ON aqi_measurements;
+CREATE TRIGGER impact_aqi_update
+    AFTER UPDATE ON aqi_measurements
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION impact_on_measurement_change();
+
+DROP TRIGGER IF EXISTS impact_aqi_delete ON aqi_measurements;
+CREATE TRIGGER impact_aqi_delete
+    AFTER DELETE ON aqi_measurements
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION impact_on_measurement_change();
+
+-- ============================================
+-- DISASTER FACETS (filter panel rollup)
+-- ============================================
+-- Counts, date range and magnitude range per type/severity/status/source
+-- combination ('' for missing values). Inserts are merged incrementally;
+-- updates of those columns and deletes recompute the affected combinations.
+CREATE TABLE IF NOT EXISTS disaster_facets (
+    facet_key VARCHAR(500) PRIMARY KEY,
+    disaster_type VARCHAR(50) NOT NULL DEFAULT '',
+    severity VARCHAR(50) NOT NULL DEFAULT '',
+    status VARCHAR(50) NOT NULL DEFAULT '',
+    source VARCHAR(255) NOT NULL DEFAULT '',
+    event_count BIGINT NOT NULL DEFAULT 0,
+    first_occurred_at TIMESTAMP,
+    last_occurred_at TIMESTAMP,
+    min_magnitude NUMERIC(10, 2),
+    max_magnitude NUMERIC(10, 2),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Text key of a facet combination (unit separator between the parts)
+CREATE OR REPLACE FUNCTION disaster_facet_key(
+    p_disaster_type TEXT, p_severity TEXT, p_status TEXT, p_source TEXT
+)
+RETURNS TEXT AS $$
+    SELECT COALESCE(p_disaster_type, '') || E'\x1f' || COALESCE(p_severity, '') || E'\x1f'
+        || COALESCE(p_status, '') || E'\x1f' || COALESCE(p_source, '')
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE INDEX IF NOT EXISTS idx_disasters_facet_key
+    ON disasters (disaster_facet_key(disaster_type, severity, status, source));
+
+-- Serialize merges and recomputes of the same combinations until commit, so a
+-- recompute never aggregates around another transaction's pending merge and
+-- then overwrites it (keys locked in order to avoid deadlocks)
+CREATE OR REPLACE FUNCTION lock_disaster_facets(p_keys TEXT[])
+RETURNS VOID AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('disaster_facets:' || facet_key))
+    FROM (SELECT DISTINCT facet_key FROM unnest(p_keys) AS facet_key ORDER BY facet_key) sorted;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recompute the given facet combinations from the disasters table. Upserting
+-- (then deleting combinations with no disasters left) keeps a concurrent
+-- facets_merge_disasters upsert of the same key from failing with a unique
+-- violation
+CREATE OR REPLACE FUNCTION refresh_disaster_facets(p_keys TEXT[])
+RETURNS VOID AS $$
+BEGIN
+    PERFORM lock_disaster_facets(p_keys);
+    WITH fresh AS (
+        INSERT INTO disaster_facets (
+            facet_key, disaster_type, severity, status, source, event_count,
+            first_occurred_at, last_occurred_at, min_magnitude, max_magnitude, updated_at
+        )
+        SELECT
+            disaster_facet_key(d.disaster_type, d.severity, d.status, d.source),
+            COALESCE(d.disaster_type, ''),
+            COALESCE(d.severity, ''),
+            COALESCE(d.status, ''),
+            COALESCE(d.source, ''),
+            COUNT(*),
+            MIN(d.occurred_at),
+            MAX(d.occurred_at),
+            MIN(d.magnitude),
+            MAX(d.magnitude),
+            CURRENT_TIMESTAMP
+        FROM disasters d
+        WHERE disaster_facet_key(d.disaster_type, d.severity, d.status, d.source) = ANY(p_keys)
+        GROUP BY 1, 2, 3, 4, 5
+        ON CONFLICT (facet_key) DO UPDATE SET
+            event_count = EXCLUDED.event_count,
+            first_occurred_at = EXCLUDED.first_occurred_at,
+            last_occurred_at = EXCLUDED.last_occurred_at,
+            min_magnitude = EXCLUDED.min_magnitude,
+            max_magnitude = EXCLUDED.max_magnitude,
+            updated_at = EXCLUDED.updated_at
+        RETURNING facet_key
+    )
+    DELETE FROM disaster_facets
+    WHERE facet_key = ANY(p_keys)
+      AND facet_key NOT IN (SELECT facet_key FROM fresh);
+END;
+$$ LANGUAGE plpgsql;
+
+-- New disasters are added to the running counts and ranges
+CREATE OR REPLACE FUNCTION facets_merge_disasters()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM lock_disaster_facets(ARRAY(
+        SELECT disaster_facet_key(disaster_type, severity, status, source) FROM new_rows
+    ));
+    INSERT INTO disaster_facets AS f (
+        facet_key, disaster_type, severity, status, source, event_count,
+        first_occurred_at, last_occurred_at, min_magnitude, max_magnitude, updated_at
+    )
+    SELECT
+        disaster_facet_key(d.disaster_type, d.severity, d.status, d.source),
+        COALESCE(d.disaster_type, ''),
+        COALESCE(d.severity, ''),
+        COALESCE(d.status, ''),
+        COALESCE(d.source, ''),
+        COUNT(*),
+        MIN(d.occurred_at),
+        MAX(d.occurred_at),
+        MIN(d.magnitude),
+        MAX(d.magnitude),
+        CURRENT_TIMESTAMP
+    FROM new_rows d
+    GROUP BY 1, 2, 3, 4, 5
+    ON CONFLICT (facet_key) DO UPDATE SET
+        event_count = f.event_count + EXCLUDED.event_count,
+        first_occurred_at = LEAST(f.first_occurred_at, EXCLUDED.first_occurred_at),
+        last_occurred_at = GREATEST(f.last_occurred_at, EXCLUDED.last_occurred_at),
+        min_magnitude = LEAST(f.min_magnitude, EXCLUDED.min_magnitude),
+        max_magnitude = GREATEST(f.max_magnitude, EXCLUDED.max_magnitude),
+        updated_at = CURRENT_TIMESTAMP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Deletes and updates of tracked columns recompute the touched combinations
+CREATE OR REPLACE FUNCTION facets_on_disaster_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM refresh_disaster_facets(ARRAY(
+            SELECT DISTINCT disaster_facet_key(disaster_type, severity, status, source) FROM old_rows
+        ));
+    ELSE
+        PERFORM refresh_disaster_facets(ARRAY(
+            SELECT disaster_facet_key(o.disaster_type, o.severity, o.status, o.source)
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE (n.disaster_type, n.severity, n.status, n.source, n.occurred_at, n.magnitude)
+                  IS DISTINCT FROM (o.disaster_type, o.severity, o.status, o.source, o.occurred_at, o.magnitude)
+            UNION
+            SELECT disaster_facet_key(n.disaster_type, n.severity, n.status, n.source)
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE (n.disaster_type, n.severity, n.status, n.source, n.occurred_at, n.magnitude)
+                  IS DISTINCT FROM (o.disaster_type, o.severity, o.status, o.source, o.occurred_at, o.magnitude)
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS facets_disasters_insert ON disasters;
+CREATE TRIGGER facets_disasters_insert
+    AFTER INSERT ON disasters
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION facets_merge_disasters();
+
+DROP TRIGGER IF EXISTS facets_disasters_update ON disasters;
+CREATE TRIGGER facets_disasters_update
+    AFTER UPDATE ON disasters
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION facets_on_disaster_change();
+
+DROP TRIGGER IF EXISTS facets_disasters_delete ON disasters;
+CREATE TRIGGER facets_disasters_delete
+    AFTER DELETE ON disasters
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION facets_on_disaster_change();
 
 -- ============================================
 -- FUNCTION: Update updated_at timestamp
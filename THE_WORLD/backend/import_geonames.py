@@ -0,0 +1,248 @@
+"""
+THE_WORLD - GeoNames Gazetteer Import
+Bulk loads a GeoNames dump (cities500/1000/5000/15000.txt or allCountries.txt,
+plain or zipped) into the cities table with COPY, upserting on geonames_id
+
+Usage:
+    python import_geonames.py cities500.zip [--country-info countryInfo.txt]
+        [--min-population 0] [--countries US,GB] [--chunk-size 50000]
+        [--defer-indexes | --no-defer-indexes]
+"""
+
+import argparse
+import io
+import logging
+import os
+import time
+import zipfile
+from contextlib import contextmanager
+
+from app.config import Config
+from worker import create_worker_app
+
+logger = logging.getLogger('import_geonames')
+
+# GeoNames "geoname" table columns used by the import
+GEONAMEID, NAME, LATITUDE, LONGITUDE, FEATURE_CLASS, COUNTRY_CODE, POPULATION, TIMEZONE = 0, 1, 4, 5, 6, 8, 14, 17
+
+STAGING_COLUMNS = ('geonames_id', 'name', 'country', 'country_code', 'latitude', 'longitude', 'population', 'timezone')
+
+# Rows of one chunk; ON COMMIT DELETE ROWS empties it after every upsert
+STAGING_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS cities_import (
+        geonames_id INTEGER PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        country VARCHAR(100) NOT NULL,
+        country_code VARCHAR(2),
+        latitude NUMERIC(10, 8) NOT NULL,
+        longitude NUMERIC(11, 8) NOT NULL,
+        population INTEGER,
+        timezone VARCHAR(50)
+    ) ON COMMIT DELETE ROWS
+"""
+
+# geom is built here rather than per row in Python; unchanged cities are
+# skipped so a re-run only writes what GeoNames changed
+UPSERT_SQL = """
+    INSERT INTO cities (geonames_id, name, country, country_code, latitude, longitude,
+                        geom, population, timezone)
+    SELECT geonames_id, name, country, country_code, latitude, longitude,
+           ST_SetSRID(ST_MakePoint(longitude, latitude), 4326), population, timezone
+    FROM cities_import
+    ON CONFLICT (geonames_id) DO UPDATE SET
+        name = EXCLUDED.name,
+        country = EXCLUDED.country,
+        country_code = EXCLUDED.country_code,
+        latitude = EXCLUDED.latitude,
+        longitude = EXCLUDED.longitude,
+        geom = EXCLUDED.geom,
+        population = EXCLUDED.population,
+        timezone = EXCLUDED.timezone,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE (cities.name, cities.country, cities.country_code, cities.latitude,
+           cities.longitude, cities.population, cities.timezone)
+          IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.country, EXCLUDED.country_code, EXCLUDED.latitude,
+                            EXCLUDED.longitude, EXCLUDED.population, EXCLUDED.timezone)
+"""
+
+# Secondary indexes dropped during a bulk load; the primary key and the
+# geonames_id upsert key (both unique) are kept
+DEFERRABLE_INDEXES_SQL = """
+    SELECT i.relname, pg_get_indexdef(x.indexrelid)
+    FROM pg_index x
+    JOIN pg_class i ON i.oid = x.indexrelid
+    WHERE x.indrelid = 'cities'::regclass AND NOT x.indisunique
+"""
+
+
+@contextmanager
+def open_dump(path):
+    """Text stream of a GeoNames dump, reading the .txt member of a .zip directly"""
+    if not path.endswith('.zip'):
+        with open(path, encoding='utf-8', newline='\n') as lines:
+            yield lines
+        return
+    with zipfile.ZipFile(path) as archive:
+        member = next(name for name in archive.namelist() if name.endswith('.txt') and 'readme' not in name.lower())
+        with io.TextIOWrapper(archive.open(member), encoding='utf-8', newline='\n') as lines:
+            yield lines
+
+
+def load_country_names(path):
+    """ISO code -> country name from countryInfo.txt (empty if not available)"""
+    if not path or not os.path.exists(path):
+        return {}
+    names = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) > 4:
+                names[fields[0]] = fields[4]
+    return names
+
+
+def _copy_value(value):
+    """Escape a value for COPY text format"""
+    if value is None or value == '':
+        return '\\N'
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def parse_chunks(lines, country_names, chunk_size, min_population=0, countries=None):
+    """Yield (COPY text buffer, row count) per chunk of populated places"""
+    buffer = io.StringIO()
+    count = 0
+    for line in lines:
+        fields = line.rstrip('\n').split('\t')
+        if len(fields) < 19 or fields[FEATURE_CLASS] != 'P':
+            continue  # allCountries.txt also holds non-populated features
+        country_code = fields[COUNTRY_CODE]
+        if countries and country_code not in countries:
+            continue
+        population = int(fields[POPULATION] or 0)
+        if population < min_population:
+            continue
+
+        row = (
+            fields[GEONAMEID],
+            fields[NAME][:255],
+            country_names.get(country_code, country_code)[:100] or 'Unknown',
+            country_code[:2],
+            fields[LATITUDE],
+            fields[LONGITUDE],
+            str(population) if population else None,
+            fields[TIMEZONE][:50]
+        )
+        buffer.write('\t'.join(_copy_value(value) for value in row) + '\n')
+        count += 1
+        if count >= chunk_size:
+            buffer.seek(0)
+            yield buffer, count
+            buffer = io.StringIO()
+            count = 0
+    if count:
+        buffer.seek(0)
+        yield buffer, count
+
+
+def drop_indexes(connection):
+    """Drop the deferrable indexes, returning their definitions"""
+    with connection.cursor() as cursor:
+        cursor.execute(DEFERRABLE_INDEXES_SQL)
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+    connection.commit()
+    return indexes
+
+
+def rebuild_indexes(connection, indexes):
+    """Recreate dropped indexes, then refresh planner statistics"""
+    with connection.cursor() as cursor:
+        cursor.execute("SET maintenance_work_mem = '512MB'")
+        for name, definition in indexes:
+            started = time.monotonic()
+            cursor.execute(definition)
+            logger.info(f"Rebuilt {name} in {time.monotonic() - started:.1f}s")
+        cursor.execute('ANALYZE cities')
+    connection.commit()
+
+
+def import_geonames(connection, path, country_names, chunk_size, min_population=0,
+                    countries=None, defer_indexes=None):
+    """Load a dump chunk by chunk; returns (rows read, rows inserted or changed)"""
+    with connection.cursor() as cursor:
+        cursor.execute(STAGING_DDL)
+        if defer_indexes is None:
+            # Initial seeding: building indexes once beats maintaining them per row
+            cursor.execute('SELECT NOT EXISTS (SELECT 1 FROM cities)')
+            defer_indexes = cursor.fetchone()[0]
+    connection.commit()
+
+    indexes = drop_indexes(connection) if defer_indexes else []
+    read = written = 0
+    started = time.monotonic()
+    try:
+        with open_dump(path) as lines:
+            for buffer, count in parse_chunks(lines, country_names, chunk_size, min_population, countries):
+                with connection.cursor() as cursor:
+                    cursor.copy_expert(
+                        f"COPY cities_import ({', '.join(STAGING_COLUMNS)}) FROM STDIN", buffer
+                    )
+                    cursor.execute(UPSERT_SQL)
+                    written += cursor.rowcount
+                connection.commit()
+                read += count
+                logger.info(f"{read} places read, {written} written ({read / (time.monotonic() - started):.0f}/s)")
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        if indexes:
+            rebuild_indexes(connection, indexes)
+    return read, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import a GeoNames dump into the cities table')
+    parser.add_argument('path', help='GeoNames dump (.txt or .zip), e.g. cities500.zip or allCountries.zip')
+    parser.add_argument('--country-info', default=None,
+                        help='countryInfo.txt for country names (default: next to the dump)')
+    parser.add_argument('--min-population', type=int, default=0,
+                        help='Skip places with a smaller population')
+    parser.add_argument('--countries', default=None,
+                        help='Comma-separated ISO country codes to import (default: all)')
+    parser.add_argument('--chunk-size', type=int, default=Config.GEONAMES_CHUNK_SIZE,
+                        help='Rows per COPY + upsert transaction')
+    parser.add_argument('--defer-indexes', action=argparse.BooleanOptionalAction, default=None,
+                        help='Drop secondary indexes during the load and rebuild them after '
+                             '(default: only when cities is empty)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+
+    country_info = args.country_info or os.path.join(os.path.dirname(os.path.abspath(args.path)), 'countryInfo.txt')
+    country_names = load_country_names(country_info)
+    if not country_names:
+        logger.warning("No countryInfo.txt found; country names will be ISO codes")
+    countries = {c.strip().upper() for c in args.countries.split(',')} if args.countries else None
+
+    app = create_worker_app()
+    with app.app_context():
+        from app.database import db
+
+        connection = db.engine.raw_connection()
+        try:
+            read, written = import_geonames(
+                connection, args.path, country_names, max(1, args.chunk_size),
+                args.min_population, countries, args.defer_indexes
+            )
+        finally:
+            connection.close()
+    logger.info(f"Done: {read} places read, {written} cities inserted or updated")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+THE_WORLD - Background Job Worker
+Executes queued fetch jobs outside the API server processes
+
+Usage:
+    python worker.py [--concurrency 2] [--types disasters,aqi]
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+from app.config import Config, config
+from app.database import init_db
+
+logger = logging.getLogger('worker')
+
+
+class Worker:
+    """Polls the fetch_jobs table and runs jobs on a bounded thread pool"""
+
+    def __init__(self, app, concurrency, job_types=None):
+        self.app = app
+        self.concurrency = concurrency
+        self.job_types = job_types
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.stopping = threading.Event()
+
+    def stop(self, *_):
+        logger.info("Shutdown requested, finishing running jobs")
+        self.stopping.set()
+
+    def run(self):
+        from app.services.job_queue import job_queue
+
+        logger.info(f"Worker {self.worker_id} started (concurrency={self.concurrency})")
+        last_stale_check = 0
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job') as pool:
+            while not self.stopping.is_set():
+                if time.monotonic() - last_stale_check > Config.JOB_STALE_TIMEOUT / 3:
+                    with self.app.app_context():
+                        requeued = job_queue.requeue_stale()
+                    if requeued:
+                        logger.warning(f"Requeued {requeued} stale jobs")
+                    last_stale_check = time.monotonic()
+
+                # Only claim when a thread is free, so jobs never wait in-process
+                if not self.slots.acquire(timeout=Config.JOB_POLL_INTERVAL):
+                    continue
+
+                with self.app.app_context():
+                    job = job_queue.claim(self.worker_id, self.job_types)
+                    job_id = job.id if job else None
+
+                if job_id is None:
+                    self.slots.release()
+                    self.stopping.wait(Config.JOB_POLL_INTERVAL)
+                    continue
+
+                logger.info(f"Claimed job {job_id}")
+                pool.submit(self._execute, job_id)
+
+    def _execute(self, job_id):
+        from app.services.job_queue import job_queue
+
+        try:
+            with self.app.app_context():
+                job_queue.run(job_queue.get(job_id), self.worker_id)
+        except Exception as e:
+            logger.error(f"Unhandled error running job {job_id}: {e}", exc_info=True)
+        finally:
+            self.slots.release()
+
+
+def create_worker_app(config_name=None):
+    """Minimal Flask app for database access (no blueprints, no CORS)"""
+    app = Flask(__name__)
+    config_name = config_name or os.getenv('FLASK_ENV', 'development')
+    app.config.from_object(config[config_name])
+    init_db(app)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run THE_WORLD background fetch jobs')
+    parser.add_argument('--concurrency', type=int, default=Config.JOB_WORKER_CONCURRENCY,
+                        help='Maximum jobs run at once by this process')
+    parser.add_argument('--types', default=None,
+                        help='Comma-separated job types to run (default: all)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+
+    app = create_worker_app()
+    job_types = [t.strip() for t in args.types.split(',')] if args.types else None
+    worker = Worker(app, concurrency=max(1, args.concurrency), job_types=job_types)
+
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()
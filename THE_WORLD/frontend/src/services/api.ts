@@ -33,12 +33,23 @@ api.interceptors.response.use(
   }
 );
 
+// Vector tile URL template ({z}/{x}/{y} are filled in by the map library)
+const tileUrl = (layer: string, params?: Record<string, any>) => {
+  const query = params ? `?${new URLSearchParams(params).toString()}` : '';
+  return `${API_BASE_URL}/${layer}/tiles/{z}/{x}/{y}.mvt${query}`;
+};
+
 // Disasters API
 export const disastersAPI = {
   getAll: (params?: any) => api.get('/disasters', { params }),
   getById: (id: number) => api.get(`/disasters/${id}`),
   getGeoJSON: (params?: any) => api.get('/disasters/geojson', { params }),
   getTypes: () => api.get('/disasters/types'),
+  getFacets: () => api.get('/disasters/facets'),
+  getWithin: (geometry: any, params?: any) => api.post('/disasters/within', { geometry }, { params }),
+  getNear: (params: { lat: number; lon: number; radius_km?: number; k?: number; [key: string]: any }) =>
+    api.get('/disasters/near', { params }),
+  tileUrl: (params?: Record<string, any>) => tileUrl('disasters', params),
 };
 
 // AQI API
@@ -46,12 +57,20 @@ export const aqiAPI = {
   getAll: (params?: any) => api.get('/aqi', { params }),
   getLatest: (params?: any) => api.get('/aqi/latest', { params }),
   getGeoJSON: (params?: any) => api.get('/aqi/geojson', { params }),
+  getWithin: (geometry: any, params?: any) => api.post('/aqi/within', { geometry }, { params }),
+  getNear: (params: { lat: number; lon: number; radius_km?: number; k?: number; [key: string]: any }) =>
+    api.get('/aqi/near', { params }),
+  tileUrl: (params?: Record<string, any>) => tileUrl('aqi', params),
 };
 
 // Cities API
 export const citiesAPI = {
   getAll: (params?: any) => api.get('/cities', { params }),
   getById: (id: number) => api.get(`/cities/${id}`),
+  autocomplete: (params: { q: string; limit?: number; country_code?: string }) =>
+    api.get('/cities/autocomplete', { params }),
+  getNear: (params: { lat: number; lon: number; radius_km?: number; k?: number; [key: string]: any }) =>
+    api.get('/cities/near', { params }),
 };
 
 // Comparison API
@@ -65,6 +84,8 @@ export const comparisonAPI = {
 // Correlation API
 export const correlationAPI = {
   getDisasterAQI: (params?: any) => api.get('/correlation/disaster-aqi', { params }),
+  getLagged: (params: { city_ids: string; start_date?: string; end_date?: string; max_lag_hours?: number; [key: string]: any }) =>
+    api.get('/correlation/lagged', { params }),
 };
 
 // Download API
@@ -73,6 +94,8 @@ export const downloadAPI = {
     api.get('/download/disasters', { params, responseType: 'blob' }),
   aqi: (params: { format: string; [key: string]: any }) => 
     api.get('/download/aqi', { params, responseType: 'blob' }),
+  bundle: (params: { format: string; datasets?: string; [key: string]: any }) =>
+    api.get('/download/bundle', { params, responseType: 'blob' }),
 };
 
 // Chatbot API